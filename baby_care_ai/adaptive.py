@@ -0,0 +1,153 @@
+# adaptive capture rate: capture static scenes less often, changing scenes more often
+import threading
+import time
+import logging
+
+from baby_care_ai import metrics
+from baby_care_ai.blink.bktree import hamming
+from baby_care_ai.storage import camera_name
+
+MIN_INTERVAL = 60  # seconds between captures while the scene changes
+# Seconds between captures of a static scene; the fixed COLLECT_INTERVAL, so
+# no camera is captured less often than without adaptive capture
+MAX_INTERVAL = 3 * 60
+CHANGE_THRESHOLD = 6  # Hamming bits between consecutive frames that count as a change
+BACKOFF = 1.5  # interval growth per unchanged frame
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveCaptureRate:
+    """
+    Per-camera capture intervals driven by how much each new frame changed.
+
+    Every frame's 64-bit average hash is compared with that camera's previous
+    one. A change of more than `threshold` bits drops the camera back to its
+    minimum interval; an unchanged scene stretches the interval by `backoff`
+    per frame up to its maximum. A collection job that runs every `tick`
+    seconds asks `claim_due` which cameras to capture, so a sleeping baby is
+    photographed every few minutes while movement is followed at the minimum
+    interval.
+
+    Cameras are named by their folder name (`camera_folder_name`). A camera
+    that fails to capture is retried after its minimum interval.
+
+    Example:
+        rate = AdaptiveCaptureRate(60, 600, intervals={"nursery": (30, 300)})
+        for camera in rate.claim_due(cameras):
+            rate.observe(camera, capture_hash(camera))
+    """
+
+    def __init__(
+        self,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        threshold: int = CHANGE_THRESHOLD,
+        backoff: float = BACKOFF,
+        intervals: dict = None,
+        clock=time.monotonic,
+        logger: logging.Logger = None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.backoff = backoff
+        self.intervals = intervals or {}
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self._state = {}  # camera -> [interval, next capture time, last hash, claimed at]
+        self._lock = threading.Lock()
+
+    def limits(self, camera: str) -> tuple:
+        """(minimum, maximum) interval for a camera."""
+        return self.intervals.get(camera, (self.min_interval, self.max_interval))
+
+    @property
+    def tick(self) -> float:
+        """How often a collection job should ask for due cameras."""
+        return min([self.min_interval] + [low for low, _ in self.intervals.values()])
+
+    def interval(self, camera: str) -> float:
+        """The camera's current capture interval."""
+        state = self._state.get(camera)
+        return state[0] if state else self.limits(camera)[0]
+
+    def claim_due(self, cameras) -> list:
+        """
+        The cameras whose next capture is due, in the order given.
+
+        Cameras seen for the first time are due, and so are cameras due
+        within half a `tick`, so a job running every `tick` seconds does not
+        skip a whole tick for a capture that is a moment early. Claimed
+        cameras are not due again for their minimum interval, so a capture
+        that never reports back through `observe` is retried then.
+        """
+        now = self.clock()
+        horizon = now + self.tick / 2
+        due = []
+        with self._lock:
+            for camera in cameras:
+                state = self._state.get(camera)
+                if state is None:
+                    state = self._state[camera] = [
+                        self.limits(camera)[0],
+                        now,
+                        None,
+                        None,
+                    ]
+                if state[1] <= horizon:
+                    state[1] = now + self.limits(camera)[0]
+                    state[3] = now
+                    due.append(camera)
+        return due
+
+    def observe(self, camera: str, img_hash: str) -> float:
+        """
+        Record a camera's new frame and schedule its next capture.
+
+        Args:
+            camera (str): The camera folder name.
+            img_hash (str): The frame's hex average hash, or None if it could
+                not be decoded (treated as a change).
+
+        Returns:
+            float: Seconds until the camera's next capture.
+        """
+        low, high = self.limits(camera)
+        with self._lock:
+            state = self._state.setdefault(camera, [low, self.clock(), None, None])
+            previous = state[2]
+            changed = (
+                img_hash is None
+                or previous is None
+                or hamming(int(img_hash, 16), int(previous, 16)) > self.threshold
+            )
+            if changed:
+                state[0] = low
+            else:
+                state[0] = min(high, max(low, state[0] * self.backoff))
+            # Counted from when the capture was claimed, not when it finished
+            started = state[3] if state[3] is not None else self.clock()
+            state[1] = started + state[0]
+            state[2] = img_hash
+            state[3] = None
+            interval = state[0]
+        if changed and previous is not None:
+            metrics.counter(
+                "scene_changes_total", "Frames that differed from the previous one"
+            ).inc(camera=camera)
+        metrics.gauge(
+            "capture_interval_seconds", "Current adaptive capture interval"
+        ).set(interval, camera=camera)
+        self.logger.debug(
+            f"{camera}: {'changed' if changed else 'static'} scene, next capture in {interval:.0f}s"
+        )
+        return interval
+
+    def observe_paths(self, paths: list) -> None:
+        """Hash saved captures (draft-mode decode) and observe each under its camera folder."""
+        from baby_care_ai.blink.dedup import batch_average_hashes
+
+        hashes = batch_average_hashes(paths, logger=self.logger)
+        for path in sorted(paths):
+            self.observe(camera_name(path), hashes.get(path))
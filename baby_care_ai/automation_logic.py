@@ -1,104 +1,411 @@
-import time
-import datetime
 import logging
 import os
-from baby_care_ai.blink.collect import collect_images
-from baby_care_ai.blink.dedup import find_most_recent_images, deduplicate_images
+import threading
+import time
+from baby_care_ai import metrics
+from baby_care_ai.adaptive import AdaptiveCaptureRate
+from baby_care_ai.blink.collect import BlinkCollector
+from baby_care_ai.blink.dedup import (
+    find_most_recent_images,
+    deduplicate_images,
+    deduplicate_captures,
+)
+from baby_care_ai.catalog import CaptureCatalog
+from baby_care_ai.cluster import CollectionWorker, Coordinator
+from baby_care_ai.compaction import Compactor, compact_captures, release_originals
+from baby_care_ai.config import load_config
+from baby_care_ai.health import HealthRegistry
 from baby_care_ai.gooogle_drive.drive_utils import (
-    sync_to_google_drive,
     authenticate_drive,
+    photo_folder_id,
+    reconcile_manifest,
+    upload_packs,
 )
-from baby_care_ai.rpi.collect import rpi_images
-from dotenv import load_dotenv
+from baby_care_ai.gooogle_drive.incremental import IncrementalSync
+from baby_care_ai.gooogle_drive.upload_queue import DurableUploadQueue
+from baby_care_ai.pack import pack_captures
+from baby_care_ai.pipeline import CapturePipeline
+from baby_care_ai.rpi.collect import rpi_images, RPiCapturePool
+from baby_care_ai.retention import enforce_retention
+from baby_care_ai.scheduler import Scheduler
+from baby_care_ai.storage import camera_folder_name
 
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("automation.log"), logging.StreamHandler()],
-)
 logger = logging.getLogger(__name__)
 
 COLLECT_INTERVAL = 3 * 60  # 3 minutes
 SYNC_INTERVAL = 0.5 * 60  # 30 minutes
-IMAGE_DIR = os.getenv("OUTPUT_FOLDER")
+RECONCILE_INTERVAL = 24 * 60 * 60  # re-list Drive once a day to catch drift
+METRICS_SNAPSHOT_INTERVAL = 60  # seconds between JSON snapshots
+# Everything else comes from the environment, see `Config` and .env_example.
+# CAPTURE_MODE "files": collectors write images and the incremental syncer
+# uploads them; "pipeline": frames are hashed and deduped in memory, written
+# once and uploaded from memory. With ADAPTIVE_CAPTURE, the collection jobs
+# run every minimum interval instead and capture only the cameras whose
+# adaptive interval has passed. UPLOAD_MODE "archive" uploads nothing per
+# capture: the dedup job appends kept captures to their day's pack and the
+# sync job uploads the packs of finished days. CLUSTER_ROLE "coordinator"
+# replaces the collection jobs with a server that shards the cameras across
+# "worker" processes (`run_worker`) and saves the frames they send.
+# Every device gets CAPTURE_DEADLINE seconds per capture, and devices that
+# keep failing are skipped by the `HealthRegistry` circuit breakers, whose
+# state is served as JSON on the metrics port at /health.
 
 
-def main():
-    last_sync_time = 0
+def device_health(config) -> HealthRegistry:
+    """The circuit breakers shared by the Blink collector and the Pi pool."""
+    return HealthRegistry(
+        failure_threshold=config.breaker_failures,
+        cooloff=config.breaker_cooloff,
+        max_cooloff=config.breaker_max_cooloff,
+        logger=logger,
+    )
 
+
+def main():
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler("automation.log"), logging.StreamHandler()],
+    )
+    config = load_config()
+    if config.cluster_role == "worker":
+        run_worker(config)
+        return
+    image_dir = config.require("output_folder")
     logger.info("Starting Baby Care AI Automation...")
     logger.info(f"Collection interval: {COLLECT_INTERVAL}s")
     logger.info(f"Sync interval: {SYNC_INTERVAL}s")
-    logger.info(f"Output folder: {IMAGE_DIR}")
+    logger.info(f"Output folder: {image_dir}")
+    health = device_health(config)
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = metrics.serve(
+            config.metrics_port, logger=logger, pages={"/health": health.status}
+        )
     logger.info("Initializing Google Drive authentication...")
     driver = authenticate_drive(logger=logger)
-    while True:
-        current_time = time.time()
-
-        # 1. Collect images
-        logger.info("Step 1: Collecting images from Blink cameras...")
-        try:
-            collect_images()
-            logger.info("Blink collection successful.")
-        except Exception as e:
-            logger.error(f"Error during Blink collection: {e}", exc_info=True)
-
-        # Collect images from Raspberry Pi cameras
-        logger.info("Step 1b: Collecting images from Raspberry Pi cameras...")
-        try:
-            rpi_images(logger=logger)
-            logger.info("Raspberry Pi collection successful.")
-        except Exception as e:
-            logger.error(f"Error during Raspberry Pi collection: {e}", exc_info=True)
-
-        # 2. Every 1 hour, dedup and sync
-        if current_time - last_sync_time >= SYNC_INTERVAL:
-            logger.info("Step 2: Starting hourly maintenance (Dedup & Sync)...")
-            try:
-                # Deduplicate
-                logger.info("Running deduplication...")
-                recent_images = find_most_recent_images(IMAGE_DIR)
-                deduplicate_images(recent_images, logger=logger)
-
-                # Sync to Google Drive
-                logger.info("Syncing to Google Drive...")
-                driver = sync_to_google_drive(drive=driver, logger=logger)
-
-                # Clean up old images
-                logger.info("Cleaning up images older than today...")
-                today = datetime.date.today()
-                for root, dirs, files in os.walk(IMAGE_DIR):
-                    for file in files:
-                        if file.endswith(".jpg"):
-                            date_str = file[:8]
-                            try:
-                                file_date = datetime.datetime.strptime(
-                                    date_str, "%Y%m%d"
-                                ).date()
-                                if file_date < today:
-                                    file_path = os.path.join(root, file)
-                                    os.remove(file_path)
-                                    logger.info(f"Removed old image: {file_path}")
-                            except ValueError:
-                                logger.warning(
-                                    f"Could not parse date from filename: {file}"
-                                )
-
-                last_sync_time = current_time
-                logger.info("Hourly maintenance complete.")
-            except Exception as e:
-                logger.error(f"Error during maintenance: {e}", exc_info=True)
-
-        # Calculate time to wait until next collection
-        elapsed = time.time() - current_time
-        sleep_time = max(0, COLLECT_INTERVAL - elapsed)
-
-        logger.info(f"Waiting {sleep_time:.1f}s for next cycle...")
-        time.sleep(sleep_time)
+    catalog = CaptureCatalog(image_dir)
+    catalog.import_tree(image_dir, logger=logger)
+    coordinator = blink_collector = rpi_pool = None
+    if config.cluster_role != "coordinator":
+        blink_collector = BlinkCollector(
+            timeout=config.capture_deadline,
+            catalog=catalog,
+            health=health,
+            logger=logger,
+        )
+        rpi_pool = RPiCapturePool(
+            stream=True,
+            catalog=catalog,
+            health=health,
+            deadline=config.capture_deadline,
+            logger=logger,
+        )
+    compactor = None
+    if config.compact_format:
+        compactor = Compactor(
+            config.compact_format,
+            quality=config.compact_quality,
+            max_dimension=config.compact_max_dimension,
+            workers=config.compact_workers,
+            logger=logger,
+        )
+    rate = None
+    if config.adaptive_capture:
+        rate = AdaptiveCaptureRate(
+            config.capture_min_interval,
+            config.capture_max_interval,
+            threshold=config.capture_change_threshold,
+            intervals=config.capture_intervals,
+            logger=logger,
+        )
+        logger.info(
+            f"Adaptive capture: every {config.capture_min_interval:.0f}-"
+            f"{config.capture_max_interval:.0f}s per camera"
+        )
+    archive = config.upload_mode == "archive"
+    if archive:
+        logger.info("Upload mode: daily archive packs")
+    syncer = None
+    if config.capture_mode == "pipeline":
+        logger.info("Capture mode: in-memory pipeline")
+        # Without a drive the pipeline only writes, the packs are uploaded instead
+        syncer = CapturePipeline(
+            None if archive else driver,
+            catalog=catalog,
+            output_folder=image_dir,
+            threshold=config.dedup_threshold,
+            upload_workers=config.upload_workers,
+            rate=rate,
+            logger=logger,
+        )
+    elif not archive:
+        syncer = IncrementalSync(
+            driver,
+            catalog,
+            workers=config.upload_workers,
+            dedup_threshold=config.dedup_threshold,
+            compactor=compactor,
+            logger=logger,
+        )
+    if syncer is not None:
+        syncer.start()
+    upload_queue = None
+    if not archive:
+        # Uploads that the syncer could not finish wait here through Drive outages
+        upload_queue = DurableUploadQueue(
+            image_dir,
+            driver,
+            manifest=catalog,
+            drain_rate=config.upload_drain_rate,
+            max_attempts=config.upload_max_attempts,
+            logger=logger,
+        )
+        upload_queue.start()
+    if config.cluster_role == "coordinator":
+
+        def receive(camera, timestamp, data):
+            if config.capture_mode == "pipeline":
+                syncer.submit(camera, data, timestamp)
+                return None
+            path = coordinator.save(camera, timestamp, data)
+            if path is not None and syncer is not None:
+                syncer.notify(path)
+            return path
+
+        coordinator = Coordinator(
+            config.cluster_host,
+            config.cluster_port,
+            output_folder=image_dir,
+            catalog=catalog,
+            sink=receive,
+            token=config.cluster_token,
+            logger=logger,
+        ).start()
+
+    def collect_blink():
+        camera_names = None  # every camera until the session has listed them
+        if rate is not None and blink_collector.cameras:
+            folders = {
+                camera_folder_name(name): name for name in blink_collector.cameras
+            }
+            camera_names = [folders[folder] for folder in rate.claim_due(folders)]
+            if not camera_names:
+                return
+        logger.info("Collecting images from Blink cameras...")
+        if config.capture_mode == "pipeline":
+            syncer.collect_blink(blink_collector, camera_names)
+        else:
+            paths = blink_collector.collect(camera_names)
+            if syncer is not None:
+                for path in paths:
+                    syncer.notify(path)
+            if rate is not None:
+                rate.observe_paths(paths)
+        logger.info("Blink collection successful.")
+
+    def collect_rpi():
+        devices = None
+        if rate is not None:
+            folders = {
+                camera_folder_name(settings["name"]): device_num
+                for device_num, settings in rpi_pool.devices.items()
+            }
+            devices = [folders[folder] for folder in rate.claim_due(folders)]
+            if not devices:
+                return
+        logger.info("Collecting images from Raspberry Pi cameras...")
+        if config.capture_mode == "pipeline":
+            syncer.collect_rpi(rpi_pool, devices)
+        else:
+            paths = [
+                result["path"]
+                for result in rpi_images(
+                    logger=logger, pool=rpi_pool, devices=devices
+                ).values()
+                if result.get("path")
+            ]
+            if syncer is not None:
+                for path in paths:
+                    syncer.notify(path)
+            if rate is not None:
+                rate.observe_paths(paths)
+        logger.info("Raspberry Pi collection successful.")
+
+    # Jobs run concurrently, so compaction runs in the dedup job, right after it
+    def compact():
+        logger.info("Compacting captures before upload...")
+        compact_captures(catalog, compactor, upload_queue=upload_queue, logger=logger)
+        # Originals of captures uploaded since the last pass
+        release_originals(image_dir, catalog, logger=logger)
+
+    def dedup():
+        logger.info("Running deduplication...")
+        if config.dedup_strategy == "average_hash":
+            deduplicate_captures(
+                catalog,
+                threshold=config.dedup_threshold,
+                hash_engine="batch",
+                workers=config.dedup_workers,
+                logger=logger,
+            )
+        else:
+            recent_images = find_most_recent_images(image_dir)
+            deduplicate_images(
+                recent_images,
+                logger=logger,
+                threshold=config.dedup_threshold,
+                hash_engine="batch",
+                workers=config.dedup_workers,
+                strategy=config.dedup_strategy,
+            )
+            # Record the survivors as kept, so compaction picks them up
+            catalog.mark_kept(
+                {
+                    path: None
+                    for paths in recent_images.values()
+                    for path in paths
+                    if os.path.exists(path)
+                }
+            )
+        if compactor is not None:
+            compact()
+        if archive:
+            if config.dedup_strategy == "average_hash":
+                pack_captures(image_dir, catalog=catalog, logger=logger)
+            else:
+                # The catalog has no hashes from this strategy, so pack every image left
+                pack_captures(image_dir, manifest=catalog, logger=logger)
+
+    # Safety net for the incremental uploads: queue every capture dedup kept
+    # that is still not uploaded a collection interval after it was recorded
+    def sync():
+        if archive:
+            parent_id = photo_folder_id(driver, catalog, logger=logger)
+            if parent_id:
+                upload_packs(
+                    parent_id,
+                    driver,
+                    image_dir,
+                    catalog,
+                    workers=config.upload_workers,
+                    logger=logger,
+                )
+            return
+        pending = catalog.pending_uploads(
+            recorded_before=time.time() - COLLECT_INTERVAL, kept_only=True
+        )
+        logger.info(
+            f"Queueing {len(pending)} pending uploads ({len(upload_queue)} queued)"
+        )
+        upload_queue.put_many(pending)
+
+    def reconcile():
+        logger.info("Reconciling upload manifest with Google Drive...")
+        reconcile_manifest(catalog, drive=driver, logger=logger)
+
+    def retention():
+        logger.info(f"Expiring images older than {config.retention_days} day(s)...")
+        max_bytes = (
+            int(config.retention_max_gb * 2**30) if config.retention_max_gb else None
+        )
+        enforce_retention(
+            image_dir,
+            keep_days=config.retention_days,
+            catalog=catalog,
+            upload_queue=upload_queue,
+            max_bytes=max_bytes,
+            logger=logger,
+        )
+
+    def snapshot_metrics():
+        metrics.REGISTRY.write_snapshot(config.metrics_snapshot_path)
+
+    # Dedup (with compaction and packing), sync and retention all rewrite or
+    # delete files in the day folders, so they take turns
+    day_folders = threading.Lock()
+    scheduler = Scheduler(logger=logger)
+    jitter = config.collect_jitter
+    collect_interval = rate.tick if rate is not None else COLLECT_INTERVAL
+    if coordinator is None:
+        scheduler.add_job(
+            "collect-blink", collect_blink, collect_interval, jitter=jitter
+        )
+        scheduler.add_job("collect-rpi", collect_rpi, collect_interval, jitter=jitter)
+    scheduler.add_job("dedup", dedup, SYNC_INTERVAL, lock=day_folders)
+    scheduler.add_job(
+        "sync", sync, SYNC_INTERVAL, missed_policy="coalesce", lock=day_folders
+    )
+    scheduler.add_job("reconcile", reconcile, RECONCILE_INTERVAL, run_immediately=False)
+    scheduler.add_job(
+        "retention", retention, SYNC_INTERVAL, run_immediately=False, lock=day_folders
+    )
+    if config.metrics_snapshot_path:
+        scheduler.add_job("metrics", snapshot_metrics, METRICS_SNAPSHOT_INTERVAL)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        logger.info("Stopping Baby Care AI Automation...")
+    finally:
+        if syncer is not None:
+            syncer.stop()
+        if upload_queue is not None:
+            upload_queue.stop()
+        if coordinator is not None:
+            coordinator.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if rpi_pool is not None:
+            rpi_pool.close()
+        if blink_collector is not None:
+            blink_collector.close()
+        catalog.close()
+
+
+def run_worker(config):
+    """
+    Capture the cameras the coordinator assigns to this host until interrupted.
+
+    Pis come from this host's RPI_DEVICE_* settings and Blink cameras from
+    its CONFIG_JSON_PATH session, if set.
+    """
+    url = config.cluster_url or f"http://127.0.0.1:{config.cluster_port}"
+    logger.info(f"Starting collection worker for coordinator {url}...")
+    health = device_health(config)
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = metrics.serve(
+            config.metrics_port, logger=logger, pages={"/health": health.status}
+        )
+    rpi_pool = RPiCapturePool(
+        stream=True, health=health, deadline=config.capture_deadline, logger=logger
+    )
+    blink_collector = None
+    if config.blink_config_path:
+        blink_collector = BlinkCollector(
+            timeout=config.capture_deadline, health=health, logger=logger
+        )
+    worker = CollectionWorker(
+        url,
+        rpi_pool=rpi_pool,
+        blink_collector=blink_collector,
+        worker_id=config.cluster_worker_id,
+        interval=COLLECT_INTERVAL,
+        token=config.cluster_token,
+        logger=logger,
+    )
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info("Stopping collection worker...")
+    finally:
+        worker.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        rpi_pool.close()
+        if blink_collector is not None:
+            blink_collector.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+# BK-tree over 64-bit perceptual hashes for Hamming-distance near-duplicate search
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes packed as integers."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree keyed by Hamming distance.
+
+    Each node stores a hash and its children by distance to that hash, so a
+    query within `threshold` only descends into children whose edge distance
+    lies in [d - threshold, d + threshold] (triangle inequality). For the
+    small thresholds used in dedup this visits a small fraction of the tree.
+
+    Example:
+        tree = BKTree()
+        tree.add(0x8F3C00FF00FF0011, "a.jpg")
+        tree.find_within(0x8F3C00FF00FF0013, 2)  # -> (1, 0x8F3C..., "a.jpg")
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value: int, payload=None) -> None:
+        node = [value, payload, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def _walk(self, value: int, threshold: int):
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_value, payload, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= threshold:
+                yield distance, node_value, payload
+            for edge, child in children.items():
+                if distance - threshold <= edge <= distance + threshold:
+                    stack.append(child)
+
+    def search(self, value: int, threshold: int) -> list:
+        """
+        Find every stored hash within `threshold` bits of `value`.
+
+        Returns:
+            list: (distance, hash, payload) tuples sorted by distance.
+        """
+        return sorted(self._walk(value, threshold), key=lambda match: match[0])
+
+    def find_within(self, value: int, threshold: int):
+        """Return the first (distance, hash, payload) within `threshold`, or None."""
+        return next(self._walk(value, threshold), None)
@@ -3,31 +3,256 @@ import asyncio
 import os
 import logging
 import datetime
-import re
-from aiohttp import ClientSession
-from blinkpy.blinkpy import Blink
-from blinkpy.auth import Auth
-from blinkpy.helpers.util import json_load
-from dotenv import load_dotenv
+from baby_care_ai import metrics
+from baby_care_ai.config import load_config
+from baby_care_ai.storage import camera_folder_name, capture_path
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# blinkpy and aiohttp are imported when a session is first started, so
+# importing this module stays cheap for callers that only build paths
 
-# Load environment variables from .env file in the repo root
-load_dotenv()
+MAX_CONCURRENCY = 4  # cameras snapped / downloaded at the same time
+SNAP_TIMEOUT = 30  # seconds allowed per camera for snap_picture / image_to_file
 
-config_json_path = os.getenv("CONFIG_JSON_PATH")
-output_folder = os.getenv("OUTPUT_FOLDER")
 
-assert config_json_path is not None, (
-    "CONFIG_JSON_PATH environment variable must be set."
-)
-assert output_folder is not None, "OUTPUT_FOLDER environment variable must be set."
+def _count_capture(name: str) -> None:
+    metrics.counter("captures_total", "Images captured").inc(
+        source="blink", camera=name
+    )
 
 
-async def collect(camera_names: list[str] = None):
+def camera_image_path(name: str, timestamp: str = None) -> str:
+    """
+    Build the local image path for a camera, creating its day folder if needed.
+
+    Args:
+        name (str): The camera name as reported by Blink.
+        timestamp (str): Optional "%Y%m%d_%H%M%S" timestamp. Defaults to now.
+
+    Returns:
+        str: The path the camera's image should be written to
+            (OUTPUT_FOLDER/<camera>/<YYYYMMDD>/<timestamp>.jpg).
+    """
+    if timestamp is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_folder = load_config().require("output_folder")
+    return capture_path(output_folder, camera_folder_name(name), timestamp)
+
+
+def _allowed(cameras: dict, health) -> dict:
+    """The cameras whose circuit lets them be captured this cycle."""
+    if health is None:
+        return cameras
+    return {
+        name: camera
+        for name, camera in cameras.items()
+        if health.allow(f"blink:{name}")
+    }
+
+
+def _record(health, name: str, error: str = None) -> None:
+    if health is None:
+        return
+    if error is None:
+        health.record_success(f"blink:{name}")
+    else:
+        health.record_failure(f"blink:{name}", error)
+
+
+async def snap_sequential(
+    blink,
+    cameras: dict,
+    timeout: float = SNAP_TIMEOUT,
+    health=None,
+    logger: logging.Logger = None,
+) -> list:
+    """
+    Snap and save each camera one after another, refreshing after every snapshot.
+
+    A camera whose snapshot, refresh or download fails or exceeds `timeout`
+    is skipped and the next camera is captured.
+
+    Args:
+        blink: A started Blink instance.
+        cameras (dict): Camera names mapped to Blink camera objects.
+        timeout (float): Seconds allowed per camera for each of snap, refresh
+            and download.
+        health (HealthRegistry): Optional registry; cameras with an open
+            circuit are skipped.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        list: Paths of the images that were written.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    saved = []
+    for name, camera in _allowed(cameras, health).items():
+        logger.info(f"Collecting image from camera: {name}")
+        image_path = camera_image_path(name)
+        try:
+            with metrics.span("blink_snapshot", camera=name):
+                # Take a new picture with the camera
+                await asyncio.wait_for(camera.snap_picture(), timeout)
+            with metrics.span("blink_refresh"):
+                await asyncio.wait_for(
+                    blink.refresh(), timeout
+                )  # Get new information from server
+            with metrics.span("blink_download", camera=name):
+                await asyncio.wait_for(camera.image_to_file(image_path), timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = str(e)
+        else:
+            _count_capture(name)
+            _record(health, name)
+            saved.append(image_path)
+            continue
+        logger.error(f"Error collecting {name}: {error}")
+        metrics.counter("capture_failures_total", "Failed captures").inc(
+            source="blink", camera=name
+        )
+        _record(health, name, error)
+    return saved
+
+
+async def download_image(camera) -> bytes:
+    """Fetch a camera's latest thumbnail into memory, as `image_to_file` would."""
+    response = await camera.get_media()
+    if not response or response.status != 200:
+        status = response.status if response else None
+        raise RuntimeError(f"Cannot download image, response {status}")
+    return await response.read()
+
+
+async def snap_concurrent(
+    blink,
+    cameras: dict,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = SNAP_TIMEOUT,
+    logger: logging.Logger = None,
+    in_memory: bool = False,
+    health=None,
+) -> list:
+    """
+    Snap all cameras at once, run a single refresh, then save every image concurrently.
+
+    A camera whose snapshot or download fails or exceeds `timeout` is skipped
+    without holding up the others. With a `health` registry, results are
+    recorded under `blink:<name>` and cameras with an open circuit are not
+    snapped at all.
+
+    Args:
+        blink: A started Blink instance.
+        cameras (dict): Camera names mapped to Blink camera objects.
+        max_concurrency (int): Maximum number of in-flight camera requests.
+        timeout (float): Seconds allowed per camera for each of snap and download.
+        logger (logging.Logger): Optional logger for output.
+        in_memory (bool): Keep the downloaded images in memory instead of writing files.
+        health (HealthRegistry): Optional registry tracking each camera's failures.
+
+    Returns:
+        list: Paths of the images that were written, or with `in_memory`
+            (camera folder name, timestamp, JPEG bytes) tuples.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    cameras = _allowed(cameras, health)
+
+    async def _run(name, action, coro_fn):
+        async with semaphore:
+            try:
+                with metrics.span(f"blink_{action}", camera=name):
+                    await asyncio.wait_for(coro_fn(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                error = f"timed out after {timeout}s during {action}"
+            except Exception as e:
+                error = f"error during {action}: {e}"
+            logger.error(f"{name}: {error}")
+            metrics.counter("capture_failures_total", "Failed captures").inc(
+                source="blink", camera=name
+            )
+            _record(health, name, error)
+            return False
+
+    logger.info(f"Snapping {len(cameras)} cameras concurrently")
+    snapped = await asyncio.gather(
+        *(
+            _run(name, "snapshot", camera.snap_picture)
+            for name, camera in cameras.items()
+        )
+    )
+    ready = [name for name, ok in zip(cameras, snapped) if ok]
+    if not ready:
+        return []
+
+    try:
+        with metrics.span("blink_refresh"):
+            # One batched refresh for every camera
+            await asyncio.wait_for(blink.refresh(force=True), timeout)
+    except Exception as e:
+        # An account-wide failure, not any one camera's: no thumbnails this cycle.
+        # Every snapped camera still gets a result, or a half-open probe would
+        # stay in flight and its camera would never be allowed again
+        logger.error(f"Blink refresh failed, skipping this cycle's downloads: {e!r}")
+        for name in ready:
+            _record(health, name, f"refresh failed: {e!r}")
+        return []
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if in_memory:
+        images = {}
+
+        async def _download(name):
+            images[name] = await download_image(cameras[name])
+
+        fetched = await asyncio.gather(
+            *(_run(name, "download", lambda n=name: _download(n)) for name in ready)
+        )
+        frames = [
+            (camera_folder_name(name), timestamp, images[name])
+            for name, ok in zip(ready, fetched)
+            if ok
+        ]
+        for name, ok in zip(ready, fetched):
+            if ok:
+                _count_capture(name)
+                _record(health, name)
+        return frames
+
+    paths = {name: camera_image_path(name, timestamp) for name in ready}
+    written = await asyncio.gather(
+        *(
+            _run(
+                name,
+                "download",
+                lambda c=cameras[name], p=paths[name]: c.image_to_file(p),
+            )
+            for name in ready
+        )
+    )
+    for name, ok in zip(ready, written):
+        if ok:
+            _count_capture(name)
+            _record(health, name)
+    return [paths[name] for name, ok in zip(ready, written) if ok]
+
+
+async def collect(
+    camera_names: list[str] = None,
+    concurrent: bool = False,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = SNAP_TIMEOUT,
+):
+    from blinkpy.auth import Auth
+    from blinkpy.blinkpy import Blink
+    from blinkpy.helpers.util import json_load
+
+    config = load_config()
+    output_folder = config.require("output_folder")
+    config_json_path = config.require("blink_config_path")
     # Create output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.mkdir(output_folder)
@@ -45,34 +270,199 @@ async def collect(camera_names: list[str] = None):
     # if camera_name is None, save all images; otherwise, save image from the specified cameras
     if camera_names is not None:
         logging.info(f"Collecting images from cameras: {camera_names}")
-        for name in camera_names:
-            camera = blink.cameras[name]
-            await camera.snap_picture()
-            await blink.refresh()  # Get new information from server
-            processed_name = re.sub(r"_+", "_", name.lower().replace(" ", "_"))
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            camera_folder = os.path.join(output_folder, processed_name)
-            if not os.path.exists(camera_folder):
-                os.mkdir(camera_folder)
-            await camera.image_to_file(os.path.join(camera_folder, f"{timestamp}.jpg"))
+        cameras = {name: blink.cameras[name] for name in camera_names}
     else:
-        # Take pictures from all cameras and save to designated folder
-        for name, camera in blink.cameras.items():
-            logging.info(f"Collecting image from camera: {name}")
-            camera = blink.cameras[name]
-            await camera.snap_picture()  # Take a new picture with the camera
-            await blink.refresh()  # Get new information from server
-            processed_name = re.sub(r"_+", "_", name.lower().replace(" ", "_"))
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            camera_folder = os.path.join(output_folder, processed_name)
-            if not os.path.exists(camera_folder):
-                os.mkdir(camera_folder)
-            await camera.image_to_file(os.path.join(camera_folder, f"{timestamp}.jpg"))
+        cameras = dict(blink.cameras.items())
+
+    if concurrent:
+        return await snap_concurrent(
+            blink, cameras, max_concurrency=max_concurrency, timeout=timeout
+        )
+    return await snap_sequential(blink, cameras, timeout=timeout)
+
+
+class BlinkCollector:
+    """
+    Long-lived Blink session reused across collection cycles.
+
+    Owns its own event loop, aiohttp session and camera registry so that the
+    login handshake and camera discovery happen once instead of every cycle.
+    Tokens are refreshed only when they expire, and refreshed tokens are
+    written back to `CONFIG_JSON_PATH` while the cameras are being captured.
+    Saved images are recorded in `catalog` (a `CaptureCatalog`) when given,
+    and every camera's result in `health` (a `HealthRegistry`).
+
+    Example:
+        with BlinkCollector() as collector:
+            collector.collect()
+    """
+
+    def __init__(
+        self,
+        config_path: str = None,
+        concurrent: bool = True,
+        max_concurrency: int = MAX_CONCURRENCY,
+        timeout: float = SNAP_TIMEOUT,
+        catalog=None,
+        health=None,
+        logger: logging.Logger = None,
+    ):
+        self.config_path = config_path or load_config().require("blink_config_path")
+        self.catalog = catalog
+        self.health = health
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.blink = None
+        self.cameras = {}
+        self._saved_login = None
+
+    async def _start(self):
+        """Log in, discover cameras and remember the persisted token state."""
+        from aiohttp import ClientSession
+        from blinkpy.auth import Auth
+        from blinkpy.blinkpy import Blink
+        from blinkpy.helpers.util import json_load
+
+        if self.session is not None:
+            await self.session.close()
+        self.session = ClientSession()
+        self.blink = Blink(session=self.session)
+        if os.path.exists(self.config_path):
+            self.blink.auth = Auth(
+                await json_load(self.config_path), session=self.session
+            )
+        try:
+            await self.blink.start()
+        except:  # if blink.auth is invalid or expired  # noqa: E722
+            await self.blink.prompt_2fa()
+            await self.blink.save(self.config_path)
+        self.cameras = dict(self.blink.cameras.items())
+        self._saved_login = dict(self.blink.auth.login_attributes)
+        self.logger.info(f"Blink session started with cameras: {list(self.cameras)}")
+
+    async def _ensure_session(self):
+        """Start the session on first use and re-authenticate only on token expiry."""
+        from blinkpy.auth import LoginError, TokenRefreshFailed
+
+        if self.blink is None:
+            await self._start()
+            return
+        if not self.blink.auth.need_refresh():
+            return
+        self.logger.info("Blink token expired, refreshing...")
+        try:
+            await self.blink.auth.refresh_tokens(refresh=True)
+        except (LoginError, TokenRefreshFailed) as e:
+            self.logger.warning(f"Token refresh failed ({e}), logging in again...")
+            await self._start()
+
+    async def _persist_tokens(self):
+        """Write refreshed tokens back to the config file if they changed."""
+        login = dict(self.blink.auth.login_attributes)
+        if login != self._saved_login:
+            await self.blink.save(self.config_path)
+            self._saved_login = login
+            self.logger.info("Persisted refreshed Blink tokens")
+
+    async def _collect(
+        self, camera_names: list[str] = None, in_memory: bool = False
+    ) -> list:
+        output_folder = load_config().require("output_folder")
+        if not os.path.exists(output_folder):
+            os.mkdir(output_folder)
+        await self._ensure_session()
+        persist = asyncio.ensure_future(self._persist_tokens())
+
+        self.cameras = dict(self.blink.cameras.items())
+        if camera_names is not None:
+            cameras = {name: self.cameras[name] for name in camera_names}
+        else:
+            cameras = self.cameras
+
+        try:
+            if self.concurrent or in_memory:
+                saved = await snap_concurrent(
+                    self.blink,
+                    cameras,
+                    max_concurrency=self.max_concurrency,
+                    timeout=self.timeout,
+                    logger=self.logger,
+                    in_memory=in_memory,
+                    health=self.health,
+                )
+            else:
+                saved = await snap_sequential(
+                    self.blink,
+                    cameras,
+                    timeout=self.timeout,
+                    health=self.health,
+                    logger=self.logger,
+                )
+        finally:
+            try:
+                await persist
+            except Exception as e:
+                self.logger.error(f"Error persisting Blink tokens: {e}")
+        if self.catalog is not None and not in_memory:
+            self.catalog.record_captures(saved)
+        return saved
+
+    def collect(self, camera_names: list[str] = None, in_memory: bool = False) -> list:
+        """
+        Run one collection cycle on the persistent session.
+
+        Args:
+            camera_names (list[str]): Cameras to capture. Defaults to all cameras.
+            in_memory (bool): Return the images instead of writing them
+                (see `snap_concurrent`).
+
+        Returns:
+            list: Paths of the images that were written, or with `in_memory`
+                (camera folder name, timestamp, JPEG bytes) tuples.
+        """
+        return self.loop.run_until_complete(self._collect(camera_names, in_memory))
+
+    def camera_names(self) -> list:
+        """Names of the account's cameras, starting the session if needed."""
+        self.loop.run_until_complete(self._ensure_session())
+        return list(self.cameras)
+
+    def close(self) -> None:
+        """Close the aiohttp session and the event loop."""
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+            self.session = None
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
-def collect_images(camera_names: list[str] = None):
-    asyncio.run(collect(camera_names=camera_names))
+def collect_images(
+    camera_names: list[str] = None,
+    concurrent: bool = False,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = SNAP_TIMEOUT,
+):
+    return asyncio.run(
+        collect(
+            camera_names=camera_names,
+            concurrent=concurrent,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+        )
+    )
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
     collect_images()
@@ -1,21 +1,33 @@
 # this utils.py would clean up near-duplicate image files daily basis
-from dotenv import load_dotenv
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import os
-from PIL import Image
-import imagehash
-from PIL import Image
-import imagehash
 import logging
+import time
+from baby_care_ai import metrics
+from baby_care_ai.blink.hash_index import HashIndex
+from baby_care_ai.blink.bktree import BKTree
+from baby_care_ai.config import load_config
+from baby_care_ai.storage import image_days, image_files
 
 logger = logging.getLogger(__name__)
-load_dotenv()
-image_dir = os.getenv("OUTPUT_FOLDER")
+
+HASH_CHUNK_SIZE = 256  # images per worker task when hashing in parallel
+# Starting the pool costs about 0.5 s and inline hashing about 0.5 ms per
+# 320x240 image, so smaller batches are hashed faster in this process
+POOL_MIN_IMAGES = 2000
+# Jobs run on scheduler threads; forking a threaded process can copy held
+# logging/SQLite/HTTP locks into the workers, so they start from a fork server
+POOL_START_METHOD = "forkserver"
 
 
 def find_most_recent_images(image_dir: str) -> dict:
     """
     Find all image files from the most recent date in each subfolder under the specified image directory.
 
+    Reads the newest day folder of each camera, plus any images still saved
+    directly in the camera folder from before the date-partitioned layout.
+
     Args:
         image_dir (str): The path to the directory containing subfolders of images.
 
@@ -28,77 +40,372 @@ def find_most_recent_images(image_dir: str) -> dict:
     for subfolder_name in os.listdir(image_dir):
         subfolder_path = os.path.join(image_dir, subfolder_name)
         if os.path.isdir(subfolder_path):
-            # List all image files in the subfolder
-            image_files = [
-                f
-                for f in os.listdir(subfolder_path)
-                if f.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp"))
-            ]
-            if image_files:
-                # Extract dates from filenames (first 8 characters)
-                dates = []
-                for f in image_files:
-                    try:
-                        date_str = f[:8]
-                        date = int(date_str)
-                        dates.append((date, f))
-                    except ValueError:
-                        continue  # Skip files that don't start with a valid date
-
-                if dates:
-                    # Find the most recent date
-                    max_date = max(dates, key=lambda x: x[0])[0]
-                    # Collect all files with that date
-                    recent_files = [
-                        os.path.join(subfolder_path, f)
-                        for date, f in dates
-                        if date == max_date
-                    ]
+            # YYYYMMDD names sort like dates; skip day folders with no images yet
+            for day in sorted(image_days(subfolder_path), reverse=True):
+                recent_files = image_files(subfolder_path, day=day)
+                if recent_files:
                     recent_images[subfolder_name] = recent_files
+                    break
 
     return recent_images
 
 
-def deduplicate_images(recent_images: dict, logger: logging.Logger = None) -> None:
+def average_hashes(image_paths: list, logger: logging.Logger = None) -> dict:
+    """
+    Compute the average hash of each image.
+
+    Args:
+        image_paths (list): Paths of the images to hash.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        dict: Image paths mapped to hex hash strings. Unreadable images are
+            logged and omitted.
+    """
+    from PIL import Image
+    import imagehash
+
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    hashes = {}
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as img:
+                hashes[image_path] = str(imagehash.average_hash(img))
+        except Exception as e:
+            logger.error(f"Error processing {image_path}: {e}")
+    return hashes
+
+
+def batch_average_hashes(image_paths: list, logger: logging.Logger = None) -> dict:
+    """`batch_hash.batch_average_hashes`, loading NumPy only when first used."""
+    from baby_care_ai.blink import batch_hash
+
+    return batch_hash.batch_average_hashes(image_paths, logger=logger)
+
+
+# hash engine name -> (HashIndex table, hash function)
+HASH_ENGINES = {
+    "imagehash": ("average_hash", average_hashes),
+    "batch": ("average_hash_draft", batch_average_hashes),
+}
+
+
+def _hash_chunk(hash_engine: str, image_paths: list) -> dict:
+    """Worker-process entry point: hash one chunk and return only {path: hex hash}."""
+    return HASH_ENGINES[hash_engine][1](image_paths)
+
+
+def compute_hashes(
+    image_paths: list,
+    hash_engine: str = "imagehash",
+    workers: int = 1,
+    chunk_size: int = HASH_CHUNK_SIZE,
+    logger: logging.Logger = None,
+) -> dict:
+    """
+    Hash images in this process or fanned out over a process pool.
+
+    Args:
+        image_paths (list): Paths of the images to hash, from any number of folders.
+        hash_engine (str): A key of `HASH_ENGINES`.
+        workers (int): Number of worker processes, capped at the CPU count.
+            Fewer than `POOL_MIN_IMAGES` images, or 1 worker, hash in this process.
+        chunk_size (int): Images per worker task, so large folders are split too.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        dict: Image paths mapped to hex hash strings. Unreadable images are omitted.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    start = time.perf_counter()
+    workers = min(workers, os.cpu_count() or 1)
+    if workers <= 1 or len(image_paths) < max(POOL_MIN_IMAGES, chunk_size + 1):
+        hashes = HASH_ENGINES[hash_engine][1](image_paths, logger=logger)
+    else:
+        chunks = [
+            image_paths[i : i + chunk_size]
+            for i in range(0, len(image_paths), chunk_size)
+        ]
+        logger.info(
+            f"Hashing {len(image_paths)} images in {len(chunks)} chunks "
+            f"on {workers} workers"
+        )
+        hashes = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(POOL_START_METHOD),
+        ) as executor:
+            for result in executor.map(
+                _hash_chunk, [hash_engine] * len(chunks), chunks
+            ):
+                hashes.update(result)
+    elapsed = time.perf_counter() - start
+    metrics.histogram("dedup_hash_seconds", "Duration of dedup hashing passes").observe(
+        elapsed, engine=hash_engine
+    )
+    metrics.counter("dedup_hashed_total", "Images hashed for dedup").inc(
+        len(image_paths), engine=hash_engine
+    )
+    if image_paths and elapsed > 0:
+        metrics.gauge(
+            "dedup_hash_rate", "Images hashed per second in the last pass"
+        ).set(len(image_paths) / elapsed, engine=hash_engine)
+    return hashes
+
+
+def find_duplicates(hashes: list, threshold: int = 0) -> list:
+    """
+    Greedily mark images whose hash is within `threshold` bits of an earlier kept image.
+
+    Images are visited in order; each one is either a duplicate of an image
+    already kept or becomes a kept image itself. Exact matches use a set,
+    larger thresholds a `BKTree`, so neither is quadratic in the image count.
+
+    Args:
+        hashes (list): (image_path, hash as int) pairs in capture order.
+        threshold (int): Maximum Hamming distance for two images to count as duplicates.
+
+    Returns:
+        list: Paths of the duplicate images.
+    """
+    duplicates = []
+    if threshold <= 0:
+        seen = set()
+        for image_path, img_hash in hashes:
+            if img_hash in seen:
+                duplicates.append(image_path)
+            else:
+                seen.add(img_hash)
+        return duplicates
+
+    tree = BKTree()
+    for image_path, img_hash in hashes:
+        if tree.find_within(img_hash, threshold) is not None:
+            duplicates.append(image_path)
+        else:
+            tree.add(img_hash, image_path)
+    return duplicates
+
+
+def deduplicate_images(
+    recent_images: dict,
+    logger: logging.Logger = None,
+    use_index: bool = True,
+    threshold: int = 0,
+    hash_engine: str = "imagehash",
+    workers: int = 1,
+    strategy: str = "average_hash",
+    embedding_threshold: float = None,
+) -> None:
     """
     Remove near-duplicate images within each subfolder's list of recent images based on their perceptual hashes.
 
     Args:
         recent_images (dict): A dictionary with subfolder names as keys and lists of image file paths as values.
         logger (logging.Logger): Optional logger for output. Defaults to module logger.
+        use_index (bool): Reuse hashes from each folder's on-disk `HashIndex`
+            and only hash new files.
+        threshold (int): Maximum Hamming distance between 64-bit hashes for two images
+            to count as duplicates. 0 only removes exact hash matches.
+        hash_engine (str): "imagehash" decodes each image at full size and
+            hashes it with `imagehash.average_hash`; "batch" uses the
+            reduced-size JPEG decode and NumPy batch engine in `batch_hash`.
+        workers (int): Number of processes used to hash new images across all folders.
+        strategy (str): "average_hash" compares perceptual hashes; "embedding" compares
+            vision-model embeddings by cosine similarity
+            (see `baby_care_ai.models.utils`).
+        embedding_threshold (float): Cosine similarity at or above which images are
+            duplicates under the "embedding" strategy. Defaults to
+            `EMBEDDING_THRESHOLD`.
     """
     if logger is None:
         logger = logging.getLogger(__name__)
+    if strategy == "embedding":
+        _deduplicate_by_embedding(recent_images, embedding_threshold, logger)
+        return
+    if strategy != "average_hash":
+        raise ValueError(f"Unknown dedup strategy: {strategy}")
+    if hash_engine not in HASH_ENGINES:
+        raise ValueError(f"Unknown hash engine: {hash_engine}")
+    hash_name = HASH_ENGINES[hash_engine][0]
     total_found = 0
     total_removed = 0
 
+    # Look up every folder's cached hashes first so new images from all
+    # folders can be hashed together
+    pending = {}
     for folder, image_paths in recent_images.items():
-        seen_hashes = {}
-        to_remove = []
         total_found += len(image_paths)
+        if not image_paths:
+            continue
+        if use_index:
+            index = HashIndex(os.path.dirname(image_paths[0]), hash_name=hash_name)
+            hashes, missing = index.lookup(image_paths, logger=logger)
+        else:
+            index, hashes, missing = None, {}, dict.fromkeys(image_paths)
+        pending[folder] = (index, hashes, missing)
 
-        for image_path in image_paths:
-            # Calculate the hash of the image
-            try:
-                img = Image.open(image_path)
-                img_hash = imagehash.average_hash(img)
-            except Exception as e:
-                logger.error(f"Error processing {image_path}: {e}")
-                continue
+    computed = compute_hashes(
+        [path for _, _, missing in pending.values() for path in missing],
+        hash_engine=hash_engine,
+        workers=workers,
+        logger=logger,
+    )
 
-            # Check if the hash has been seen before
-            if img_hash in seen_hashes:
-                # If it has, mark for removal
-                to_remove.append(image_path)
-                logger.info(f"Removed near-duplicate image: {image_path}")
-            else:
-                # If not, add the hash to the dictionary
-                seen_hashes[img_hash] = image_path
+    for folder, (index, hashes, missing) in pending.items():
+        image_paths = recent_images[folder]
+        new_hashes = {path: computed[path] for path in missing if path in computed}
+        hashes.update(new_hashes)
+        if index is not None:
+            index.store(missing, new_hashes)
+
+        to_remove = find_duplicates(
+            [
+                (image_path, int(hashes[image_path], 16))
+                for image_path in image_paths
+                if image_path in hashes
+            ],
+            threshold=threshold,
+        )
 
         # Remove the duplicates from the list and delete the files
         for path in to_remove:
             os.remove(path)
-        recent_images[folder] = [path for path in image_paths if path not in to_remove]
+            logger.info(f"Removed near-duplicate image: {path}")
+        removed = set(to_remove)
+        recent_images[folder] = [path for path in image_paths if path not in removed]
+        total_removed += len(to_remove)
+        if index is not None:
+            index.evict(keep=recent_images[folder])
+            index.close()
+
+    total_survived = total_found - total_removed
+    logger.info(f"Total images found: {total_found}")
+    logger.info(f"Total images removed: {total_removed}")
+    logger.info(f"Total images survived: {total_survived}")
+
+
+def deduplicate_captures(
+    catalog,
+    threshold: int = 0,
+    hash_engine: str = "batch",
+    workers: int = 1,
+    logger: logging.Logger = None,
+) -> int:
+    """
+    Remove duplicates among the captures a `CaptureCatalog` has not checked yet.
+
+    Only new captures are hashed; they are compared with each other and with
+    the hashes the catalog already holds for captures kept earlier the same
+    day, so a pass costs time proportional to what was captured since the
+    last one. New captures are claimed in the catalog for the whole pass:
+    those another job has claimed are left for the next pass, and captures
+    already uploaded are kept, never removed.
+
+    Args:
+        catalog (CaptureCatalog): The capture catalog.
+        threshold (int): Maximum Hamming distance for two images to count as duplicates.
+        hash_engine (str): A key of `HASH_ENGINES`.
+        workers (int): Number of processes used to hash new images.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        int: Number of images removed.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    groups = catalog.new_captures()
+    new_paths = [path for paths in groups.values() for path in paths]
+    if not new_paths:
+        return 0
+    # Captures another job is uploading or compacting are left for the next pass
+    claimed = catalog.claim(new_paths)
+    try:
+        free = set(claimed)
+        # Captures uploaded before this pass are on Drive: kept, never removed
+        uploaded = {path for path in claimed if catalog.drive_id(path) is not None}
+        computed = compute_hashes(
+            claimed, hash_engine=hash_engine, workers=workers, logger=logger
+        )
+        vanished = {
+            path
+            for path in claimed
+            if path not in computed and not os.path.exists(path)
+        }
+        catalog.forget(list(vanished))
+
+        total_removed = 0
+        for (camera, day), paths in groups.items():
+            paths = [path for path in paths if path in free]
+            if not paths:
+                continue
+            kept = catalog.kept_hashes(camera, day)
+            kept.update(
+                {
+                    path: computed[path]
+                    for path in paths
+                    if path in uploaded and path in computed
+                }
+            )
+            new_hashes = {
+                path: computed[path]
+                for path in paths
+                if path in computed and path not in uploaded
+            }
+            # Earlier kept captures go first so only new ones can be duplicates
+            to_remove = set(
+                find_duplicates(
+                    [(path, int(h, 16)) for path, h in kept.items()]
+                    + [(path, int(h, 16)) for path, h in new_hashes.items()],
+                    threshold=threshold,
+                )
+            ).intersection(new_hashes)
+            for path in to_remove:
+                os.remove(path)
+                logger.info(f"Removed near-duplicate image: {path}")
+            catalog.mark_duplicates(dict.fromkeys(to_remove))
+            # Unreadable images are kept without a hash rather than retried every pass
+            catalog.mark_kept(
+                {
+                    path: computed.get(path)
+                    for path in paths
+                    if path not in to_remove and path not in vanished
+                }
+            )
+            total_removed += len(to_remove)
+    finally:
+        catalog.release(claimed)
+
+    metrics.counter("dedup_removed_total", "Images removed as duplicates").inc(
+        total_removed
+    )
+    logger.info(
+        f"Checked {len(claimed)} new captures, removed {total_removed} duplicates"
+    )
+    return total_removed
+
+
+def _deduplicate_by_embedding(
+    recent_images: dict, threshold: float, logger: logging.Logger
+) -> None:
+    from baby_care_ai.models.utils import EMBEDDING_THRESHOLD, find_embedding_duplicates
+
+    if threshold is None:
+        threshold = EMBEDDING_THRESHOLD
+    total_found = 0
+    total_removed = 0
+    for folder, image_paths in recent_images.items():
+        total_found += len(image_paths)
+        to_remove = find_embedding_duplicates(
+            image_paths, threshold=threshold, logger=logger
+        )
+        for path in to_remove:
+            os.remove(path)
+            logger.info(f"Removed near-duplicate image: {path}")
+        removed = set(to_remove)
+        recent_images[folder] = [path for path in image_paths if path not in removed]
         total_removed += len(to_remove)
 
     total_survived = total_found - total_removed
@@ -113,7 +420,7 @@ if __name__ == "__main__":
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
-    recent_images = find_most_recent_images(image_dir)
+    recent_images = find_most_recent_images(load_config().require("output_folder"))
     deduplicate_images(recent_images)
     for folder, images in recent_images.items():
         logger.info(f"Unique images from latest date in {folder}: {images}")
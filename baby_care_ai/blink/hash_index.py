@@ -0,0 +1,160 @@
+# persistent perceptual-hash cache so dedup only hashes new files
+import os
+import sqlite3
+import time
+import logging
+
+INDEX_FILENAME = ".hash_index.sqlite"
+MAX_AGE_DAYS = 2  # entries not refreshed for this long are evicted
+
+logger = logging.getLogger(__name__)
+
+
+class HashIndex:
+    """
+    On-disk perceptual-hash index for one camera folder.
+
+    Entries are keyed by path and validated against the file's mtime and size,
+    so a hash is reused only while the file is unchanged. The index lives in
+    the camera folder as `.hash_index.sqlite`, with one table per `hash_name`
+    so hashes from different hash functions are never mixed.
+
+    Example:
+        with HashIndex(camera_folder) as index:
+            hashes = index.get_or_compute(paths, hash_fn)
+            index.evict(keep=hashes.keys())
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        hash_name: str = "average_hash",
+        max_age_days: float = MAX_AGE_DAYS,
+    ):
+        assert hash_name.isidentifier(), f"Invalid hash name: {hash_name}"
+        self.folder = folder
+        self.table = hash_name
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.conn = sqlite3.connect(os.path.join(folder, INDEX_FILENAME))
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+            "hash TEXT, indexed_at REAL)"
+        )
+
+    def lookup(self, image_paths: list, logger: logging.Logger = None) -> tuple:
+        """
+        Split `image_paths` into indexed hashes and files that still need hashing.
+
+        Args:
+            image_paths (list): Paths of the images to look up.
+            logger (logging.Logger): Optional logger for output.
+
+        Returns:
+            tuple: ({path: hex hash} for unchanged files, {path: (mtime_ns, size)} for the rest).
+                Files that cannot be stat'ed are logged and left out of both.
+        """
+        if logger is None:
+            logger = logging.getLogger(__name__)
+        cached = {
+            path: (mtime_ns, size, img_hash)
+            for path, mtime_ns, size, img_hash in self.conn.execute(
+                f"SELECT path, mtime_ns, size, hash FROM {self.table}"
+            )
+        }
+        hashes = {}
+        missing = {}
+        for path in image_paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                logger.error(f"Error processing {path}: {e}")
+                continue
+            entry = cached.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                hashes[path] = entry[2]
+            else:
+                missing[path] = (stat.st_mtime_ns, stat.st_size)
+        logger.info(
+            f"Hash index {self.folder}: {len(hashes)} cached, {len(missing)} to hash"
+        )
+        return hashes, missing
+
+    def entries(self) -> dict:
+        """Every indexed {path: hex hash}, without checking the files."""
+        return dict(self.conn.execute(f"SELECT path, hash FROM {self.table}"))
+
+    def store(self, missing: dict, computed: dict) -> None:
+        """
+        Record newly computed hashes.
+
+        Args:
+            missing (dict): The {path: (mtime_ns, size)} returned by `lookup`.
+            computed (dict): {path: hex hash} for the files that were hashed.
+        """
+        now = time.time()
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)",
+            [
+                (path, *missing[path], img_hash, now)
+                for path, img_hash in computed.items()
+                if path in missing
+            ],
+        )
+        self.conn.commit()
+
+    def get_or_compute(
+        self, image_paths: list, hash_fn, logger: logging.Logger = None
+    ) -> dict:
+        """
+        Return hashes for `image_paths`, hashing only files missing from the index.
+
+        Args:
+            image_paths (list): Paths of the images to hash.
+            hash_fn: Callable mapping a list of paths to {path: hex hash}.
+                Paths it cannot hash are left out of its result.
+            logger (logging.Logger): Optional logger for output.
+
+        Returns:
+            dict: Image paths mapped to hex hash strings. Unreadable files are omitted.
+        """
+        hashes, missing = self.lookup(image_paths, logger=logger)
+        if missing:
+            computed = hash_fn(list(missing))
+            self.store(missing, computed)
+            hashes.update(computed)
+        return hashes
+
+    def evict(self, keep=None) -> int:
+        """
+        Drop entries for files outside `keep`, deleted files and aged-out entries.
+
+        Args:
+            keep: Optional iterable of paths to retain; any other entry is evicted.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        keep = set(keep) if keep is not None else None
+        cutoff = time.time() - self.max_age
+        stale = [
+            (path,)
+            for path, indexed_at in self.conn.execute(
+                f"SELECT path, indexed_at FROM {self.table}"
+            )
+            if (keep is not None and path not in keep)
+            or indexed_at < cutoff
+            or not os.path.exists(path)
+        ]
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE path = ?", stale)
+        self.conn.commit()
+        return len(stale)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,341 @@
+# one indexed catalog of captures, shared by collect, dedup, sync and retention
+import os
+import time
+import logging
+
+from baby_care_ai.gooogle_drive.manifest import UploadManifest
+from baby_care_ai.storage import (
+    DAY_LENGTH,
+    camera_folders,
+    camera_name,
+    image_files,
+    migrate_flat_layout,
+)
+
+# dedup status of a capture
+NEW = "new"  # not checked for duplicates yet
+KEPT = "kept"
+DUPLICATE = "duplicate"  # file removed as a duplicate of `duplicate_of`
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureCatalog(UploadManifest):
+    """
+    Catalog of every local capture: camera, timestamp, size, hash, dedup
+    status, and upload status as the Drive file ID.
+
+    Collectors record each image as they save it, so dedup, sync and
+    retention query the catalog instead of scanning directories, and each
+    maintenance pass only touches captures that changed since the last one.
+    It lives in the same SQLite file as `UploadManifest`, so it can be passed
+    anywhere a manifest is expected and `reconcile` keeps both in step.
+
+    Example:
+        catalog = CaptureCatalog(output_folder)
+        catalog.import_tree(output_folder)  # once, for images saved before
+        catalog.record_captures(collector.collect())
+    """
+
+    def __init__(self, folder: str):
+        super().__init__(folder)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS captures ("
+                "path TEXT PRIMARY KEY, camera TEXT, name TEXT, day TEXT, "
+                "size INTEGER, hash TEXT, status TEXT, duplicate_of TEXT, "
+                "drive_id TEXT, recorded_at REAL, original_size INTEGER)"
+            )
+            columns = {
+                row[1] for row in self.conn.execute("PRAGMA table_info(captures)")
+            }
+            if "original_size" not in columns:  # catalogs created before compaction
+                self.conn.execute(
+                    "ALTER TABLE captures ADD COLUMN original_size INTEGER"
+                )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS captures_camera_day ON captures (camera, day)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS captures_camera_name ON captures (camera, name)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS captures_new ON captures (name) "
+                f"WHERE status = '{NEW}'"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS captures_pending ON captures (name) "
+                f"WHERE drive_id IS NULL AND status != '{DUPLICATE}'"
+            )
+
+    def record_captures(self, paths: list, hashes: dict = None) -> None:
+        """
+        Record newly saved images; paths already in the catalog are left as they are.
+
+        Args:
+            paths (list): Paths of the saved images.
+            hashes (dict): Optional paths mapped to hex hashes for images that
+                were already checked for duplicates; these are recorded as kept.
+        """
+        hashes = hashes or {}
+        now = time.time()
+        rows = []
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            name = os.path.basename(path)
+            img_hash = hashes.get(path)
+            status = KEPT if path in hashes else NEW
+            rows.append(
+                (
+                    path,
+                    camera_name(path),
+                    name,
+                    name[:DAY_LENGTH],
+                    size,
+                    img_hash,
+                    status,
+                    None,
+                    None,
+                    now,
+                )
+            )
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO captures (path, camera, name, day, size, hash, "
+                "status, duplicate_of, drive_id, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Images uploaded before they were catalogued keep their Drive ID
+            self.conn.executemany(
+                "UPDATE captures SET drive_id = (SELECT drive_id FROM uploads "
+                "WHERE room = ? AND name = ?) WHERE path = ? AND drive_id IS NULL",
+                [(row[1], row[2], row[0]) for row in rows],
+            )
+
+    def record_uploads(self, uploads: list, checksums: dict = None) -> None:
+        super().record_uploads(uploads, checksums)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE captures SET drive_id = ? WHERE camera = ? AND name = ?",
+                [
+                    (drive_id, room, os.path.basename(path))
+                    for room, path, drive_id in uploads
+                ],
+            )
+
+    def reconcile(self, drive, parent_folder_id: str, **kwargs) -> dict:
+        counts = super().reconcile(drive, parent_folder_id, **kwargs)
+        # Re-derive upload status from the corrected manifest
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE captures SET drive_id = (SELECT u.drive_id FROM uploads u "
+                "WHERE u.room = captures.camera AND u.name = captures.name)"
+            )
+        return counts
+
+    def import_tree(self, root: str, logger: logging.Logger = None) -> int:
+        """
+        Record images already on disk that are missing from the catalog.
+
+        This is the one full scan, for archives that predate the catalog;
+        images saved flat in a camera folder are moved into day folders first.
+
+        Returns:
+            int: Number of captures added.
+        """
+        if logger is None:
+            logger = logging.getLogger(__name__)
+        migrate_flat_layout(root, logger=logger)
+        with self._lock:
+            known = {path for (path,) in self.conn.execute("SELECT path FROM captures")}
+        paths = [
+            path
+            for folder in camera_folders(root)
+            for path in image_files(folder)
+            if path not in known
+        ]
+        self.record_captures(paths)
+        if paths:
+            logger.info(f"Added {len(paths)} existing images to the capture catalog")
+        return len(paths)
+
+    def new_captures(self) -> dict:
+        """Captures not yet checked for duplicates, as {(camera, day): [paths in capture order]}."""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT camera, day, path FROM captures WHERE status = '{NEW}' ORDER BY name"
+            ).fetchall()
+        groups = {}
+        for camera, day, path in rows:
+            groups.setdefault((camera, day), []).append(path)
+        return groups
+
+    def kept_hashes(self, camera: str, day: str) -> dict:
+        """Hex hashes of the captures already kept for a camera and day."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, hash FROM captures "
+                "WHERE camera = ? AND day = ? AND status = ? AND hash IS NOT NULL",
+                (camera, day, KEPT),
+            )
+            return dict(rows.fetchall())
+
+    def kept_paths(self, camera: str, day: str) -> list:
+        """Every capture kept for a camera and day, hashed or not, in capture order."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path FROM captures WHERE camera = ? AND day = ? AND status = ? "
+                "ORDER BY name",
+                (camera, day, KEPT),
+            )
+            return [path for (path,) in rows]
+
+    def mark_kept(self, hashes: dict) -> None:
+        """Store hashes for captures that survived dedup; a None hash keeps the stored one."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE captures SET status = ?, hash = COALESCE(?, hash) WHERE path = ?",
+                [(KEPT, img_hash, path) for path, img_hash in hashes.items()],
+            )
+
+    def mark_duplicates(self, duplicates: dict) -> None:
+        """
+        Record captures removed as duplicates.
+
+        Args:
+            duplicates (dict): Duplicate paths mapped to the kept path they match
+                (or None when unknown).
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE captures SET status = ?, duplicate_of = ? WHERE path = ?",
+                [(DUPLICATE, kept, path) for path, kept in duplicates.items()],
+            )
+
+    def forget(self, paths: list) -> None:
+        """Drop captures whose files no longer exist."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM captures WHERE path = ?", [(path,) for path in paths]
+            )
+
+    def pending_uploads(
+        self, recorded_before: float = None, kept_only: bool = False
+    ) -> list:
+        """
+        Captures that still need uploading, oldest first.
+
+        Args:
+            recorded_before (float): Only captures recorded before this Unix
+                time, to leave fresh ones to the uploader already handling them.
+            kept_only (bool): Only captures dedup has kept, leaving the ones it
+                has not checked yet, which it may still remove.
+
+        Returns:
+            list: (camera, path) tuples for captures that are not duplicates
+                and have no Drive file ID yet.
+        """
+        status = f"status = '{KEPT}'" if kept_only else f"status != '{DUPLICATE}'"
+        with self._lock:
+            return self.conn.execute(
+                "SELECT camera, path FROM captures "
+                f"WHERE drive_id IS NULL AND {status} "
+                "AND recorded_at <= ? ORDER BY name",
+                (recorded_before if recorded_before is not None else float("inf"),),
+            ).fetchall()
+
+    def uncompacted(self) -> list:
+        """
+        Kept captures that are neither uploaded nor compacted yet, oldest first.
+
+        Returns:
+            list: (camera, path) tuples.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT camera, path FROM captures WHERE status = ? "
+                "AND drive_id IS NULL AND original_size IS NULL ORDER BY name",
+                (KEPT,),
+            ).fetchall()
+
+    def compacted(self, paths: list) -> set:
+        """
+        The paths in `paths` that need no compaction any more.
+
+        That is captures already compacted, or checked and left as they
+        were, and files that are gone, e.g. moved aside by a compaction
+        that changed their extension.
+        """
+        done = set()
+        with self._lock:
+            for path in paths:
+                row = self.conn.execute(
+                    "SELECT 1 FROM captures WHERE path = ? AND original_size IS NOT NULL",
+                    (path,),
+                ).fetchone()
+                if row is not None or not os.path.exists(path):
+                    done.add(path)
+        return done
+
+    def record_compacted(self, paths: dict) -> None:
+        """
+        Record compacted captures under their new path and size.
+
+        Args:
+            paths (dict): Old paths mapped to the paths after compaction; a
+                capture left as it was maps to itself.
+        """
+        rows = []
+        for old_path, path in paths.items():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            rows.append((path, os.path.basename(path), size, old_path))
+        with self._lock, self.conn:
+            # The size before compaction is kept, so the bytes saved can be summed
+            self.conn.executemany(
+                "UPDATE captures SET path = ?, name = ?, original_size = size, "
+                "size = COALESCE(?, size) WHERE path = ?",
+                rows,
+            )
+
+    def drive_id(self, path: str) -> str:
+        """Drive file ID of an uploaded capture, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT drive_id FROM captures WHERE path = ?", (path,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def partitions(self) -> list:
+        """
+        Every (day, camera) in the catalog, with the size of its images still on disk.
+
+        Returns:
+            list: (day, camera, bytes) tuples sorted oldest day first.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT day, camera, SUM(CASE WHEN status = ? THEN 0 ELSE size END) "
+                "FROM captures GROUP BY day, camera ORDER BY day, camera",
+                (DUPLICATE,),
+            ).fetchall()
+
+    def forget_day(self, camera: str, day: str, keep: set = None) -> None:
+        """Drop a camera's captures for an expired day, except the names in `keep`."""
+        keep = keep or set()
+        with self._lock, self.conn:
+            paths = [
+                (path,)
+                for path, name in self.conn.execute(
+                    "SELECT path, name FROM captures WHERE camera = ? AND day = ?",
+                    (camera, day),
+                )
+                if name not in keep
+            ]
+            self.conn.executemany("DELETE FROM captures WHERE path = ?", paths)
@@ -0,0 +1,592 @@
+# distributed collection: a coordinator shards cameras across worker hosts over HTTP
+import hashlib
+import hmac
+import json
+import os
+import re
+import socket
+import threading
+import time
+import datetime
+import logging
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from baby_care_ai import metrics
+from baby_care_ai.config import load_config
+from baby_care_ai.storage import camera_folder_name, capture_path
+
+CLUSTER_PORT = 9110
+HEARTBEAT_INTERVAL = 5.0  # seconds between worker heartbeats
+HEARTBEAT_TIMEOUT = 15.0  # a worker silent for this long is dead and its cameras move
+REQUEST_TIMEOUT = 10.0  # seconds allowed per request to the coordinator
+COLLECT_INTERVAL = 3 * 60
+MAX_FRAME_BYTES = 32 * 1024 * 1024
+TOKEN_HEADER = "X-Cluster-Token"
+TIMESTAMP_PATTERN = re.compile(r"^\d{8}_\d{6}$")
+
+logger = logging.getLogger(__name__)
+
+
+def _score(worker: str, camera: str) -> int:
+    digest = hashlib.blake2b(f"{worker}\0{camera}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_cameras(workers: dict) -> dict:
+    """
+    Give every camera to exactly one of the workers that can reach it.
+
+    Rendezvous hashing with bounded load: each camera goes to the capable
+    worker with the highest hash of (worker, camera) that holds fewer than
+    its even share of the cameras, so shards stay balanced and a worker
+    joining or leaving moves few cameras besides its own. A camera only
+    full workers can reach still goes to the best of them.
+
+    Args:
+        workers (dict): Worker IDs mapped to the camera keys they can reach.
+
+    Returns:
+        dict: Worker IDs mapped to sorted lists of the camera keys they own.
+    """
+    capable = {}
+    for worker, cameras in workers.items():
+        for camera in cameras:
+            capable.setdefault(camera, []).append(worker)
+    share = -(-len(capable) // max(1, len(workers)))  # ceiling division
+    assignment = {worker: [] for worker in workers}
+    for camera in sorted(capable):
+        ranked = sorted(
+            capable[camera], key=lambda worker: _score(worker, camera), reverse=True
+        )
+        owner = next((w for w in ranked if len(assignment[w]) < share), ranked[0])
+        assignment[owner].append(camera)
+    return assignment
+
+
+class Coordinator:
+    """
+    Shard cameras across collection workers and gather their frames in one output tree.
+
+    Workers `POST /register` with the cameras they can reach (`blink:<name>`
+    and `rpi:<device number>` keys), then `POST /heartbeat` every few
+    seconds and get their current cameras back. A worker that misses
+    heartbeats for `heartbeat_timeout` seconds is dropped and its cameras
+    are reassigned to the remaining workers that can reach them. Frames
+    arrive as `POST /frames?worker=&camera=&timestamp=` with the JPEG as the
+    body and are handed to `sink`; `GET /status` lists workers and
+    assignments.
+
+    With a `token`, every request must carry it in the `X-Cluster-Token`
+    header.
+
+    Example:
+        coordinator = Coordinator(port=9110, catalog=catalog).start()
+        ...
+        coordinator.stop()
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = CLUSTER_PORT,
+        output_folder: str = None,
+        catalog=None,
+        sink=None,
+        token: str = None,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        clock=time.monotonic,
+        logger: logging.Logger = None,
+    ):
+        self.host = host
+        self.port = port
+        self.output_folder = output_folder or load_config().require("output_folder")
+        self.catalog = catalog
+        self.sink = sink or self.save
+        self.token = token
+        self.heartbeat_timeout = heartbeat_timeout
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.workers = {}  # worker ID -> {"cameras": [...], "seen": clock time}
+        self.assignment = {}
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    @property
+    def url(self) -> str:
+        host, port = (
+            self._server.server_address[:2] if self._server else (self.host, self.port)
+        )
+        return f"http://{host}:{port}"
+
+    def start(self) -> "Coordinator":
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _handler_class(self))
+        self._server.daemon_threads = True
+        metrics.gauge("cluster_workers", "Live collection workers").set_function(
+            lambda: len(self.workers)
+        )
+        self._threads = [
+            threading.Thread(
+                target=self._server.serve_forever, name="cluster-http", daemon=True
+            ),
+            threading.Thread(
+                target=self._reap_loop, name="cluster-reaper", daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.logger.info(f"Cluster coordinator listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def _rebalance(self) -> None:
+        """Recompute the assignment; call with the lock held."""
+        assignment = assign_cameras(
+            {w: state["cameras"] for w, state in self.workers.items()}
+        )
+        if assignment != self.assignment:
+            self.assignment = assignment
+            self.generation += 1
+            metrics.counter("cluster_rebalances_total", "Camera reassignments").inc()
+            self.logger.info(
+                f"Cluster assignment {self.generation}: "
+                + ", ".join(f"{w}={len(c)}" for w, c in sorted(assignment.items()))
+            )
+
+    def register(self, worker: str, cameras: list) -> dict:
+        """Add or refresh a worker and its reachable cameras; returns its assignment."""
+        with self._lock:
+            self.workers[worker] = {
+                "cameras": sorted(set(cameras)),
+                "seen": self.clock(),
+            }
+            self._rebalance()
+            return self._assignment_of(worker)
+
+    def heartbeat(self, worker: str) -> dict:
+        """
+        Record that a worker is alive.
+
+        Returns:
+            dict: Its assignment, or None if the worker is unknown (never
+                registered, or dropped as dead) and must register again.
+        """
+        with self._lock:
+            state = self.workers.get(worker)
+            if state is None:
+                return None
+            state["seen"] = self.clock()
+            return self._assignment_of(worker)
+
+    def _assignment_of(self, worker: str) -> dict:
+        return {
+            "cameras": self.assignment.get(worker, []),
+            "generation": self.generation,
+        }
+
+    def reap(self) -> list:
+        """Drop workers whose heartbeats stopped and reassign their cameras. Returns their IDs."""
+        now = self.clock()
+        with self._lock:
+            dead = [
+                worker
+                for worker, state in self.workers.items()
+                if now - state["seen"] > self.heartbeat_timeout
+            ]
+            for worker in dead:
+                del self.workers[worker]
+                self.logger.warning(
+                    f"Worker {worker} missed its heartbeats, reassigning its cameras"
+                )
+            if dead:
+                self._rebalance()
+        return dead
+
+    def _reap_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_timeout / 3):
+            self.reap()
+
+    def is_worker(self, worker: str) -> bool:
+        with self._lock:
+            return worker in self.workers
+
+    def status(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "workers": {
+                    worker: {
+                        "cameras": self.assignment.get(worker, []),
+                        "reachable": state["cameras"],
+                        "last_seen": round(now - state["seen"], 1),
+                    }
+                    for worker, state in self.workers.items()
+                },
+            }
+
+    def save(self, camera: str, timestamp: str, data: bytes) -> str:
+        """
+        Write a frame into the output tree and record it in the catalog.
+
+        Returns:
+            str: The new image path, or None if that camera already has an
+                image for this second (e.g. sent by two workers during a
+                rebalance).
+        """
+        path = capture_path(self.output_folder, camera, timestamp)
+        try:
+            with open(path, "xb") as f:
+                f.write(data)
+        except FileExistsError:
+            self.logger.debug(f"Skipped duplicate frame {path}")
+            return None
+        if self.catalog is not None:
+            self.catalog.record_captures([path])
+        return path
+
+    def receive(self, worker: str, camera: str, timestamp: str, data: bytes):
+        metrics.counter("cluster_frames_total", "Frames received from workers").inc(
+            worker=worker
+        )
+        return self.sink(camera, timestamp, data)
+
+
+def _valid_camera(camera: str) -> bool:
+    return (
+        bool(camera)
+        and camera == camera_folder_name(camera)
+        and not camera.startswith(".")
+        and "/" not in camera
+        and os.sep not in camera
+    )
+
+
+def _handler_class(coordinator: Coordinator):
+    from http.server import BaseHTTPRequestHandler
+
+    class ClusterHandler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: dict = None) -> None:
+            body = json.dumps(payload if payload is not None else {}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if coordinator.token is None:
+                return True
+            supplied = self.headers.get(TOKEN_HEADER, "")
+            if hmac.compare_digest(supplied.encode(), coordinator.token.encode()):
+                return True
+            self._reply(403, {"error": "bad token"})
+            return False
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_FRAME_BYTES:
+                raise ValueError(f"body of {length} bytes is too large")
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if urlsplit(self.path).path == "/status":
+                self._reply(200, coordinator.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            url = urlsplit(self.path)
+            try:
+                body = self._body()
+                if url.path == "/register":
+                    request = json.loads(body)
+                    self._reply(
+                        200, coordinator.register(request["worker"], request["cameras"])
+                    )
+                elif url.path == "/heartbeat":
+                    assignment = coordinator.heartbeat(json.loads(body)["worker"])
+                    if assignment is None:
+                        self._reply(404, {"error": "unknown worker, register again"})
+                    else:
+                        self._reply(200, assignment)
+                elif url.path == "/frames":
+                    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    worker, camera = query.get("worker"), query.get("camera", "")
+                    timestamp = query.get("timestamp", "")
+                    if not coordinator.is_worker(worker):
+                        self._reply(404, {"error": "unknown worker, register again"})
+                    elif not _valid_camera(camera) or not TIMESTAMP_PATTERN.match(
+                        timestamp
+                    ):
+                        self._reply(400, {"error": "bad camera or timestamp"})
+                    else:
+                        path = coordinator.receive(worker, camera, timestamp, body)
+                        self._reply(200, {"path": path})
+                else:
+                    self._reply(404, {"error": "not found"})
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+            except Exception as e:
+                coordinator.logger.error(f"Cluster request {url.path} failed: {e}")
+                self._reply(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass  # every heartbeat and frame would flood automation.log
+
+    return ClusterHandler
+
+
+class CoordinatorError(Exception):
+    """A request to the coordinator failed or was refused."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CollectionWorker:
+    """
+    Capture the cameras a `Coordinator` assigns to this host and send it the frames.
+
+    The worker registers every camera it can reach: the Blink cameras of
+    `blink_collector` and the Pis of `rpi_pool`. A heartbeat thread keeps
+    the registration alive and picks up reassignments; each cycle captures
+    only the assigned cameras, in memory, and posts every frame to the
+    coordinator, so nothing is written on the worker. A worker the
+    coordinator no longer knows (after a restart, or a missed heartbeat
+    window) registers again.
+
+    The reachable cameras are listed on the capture thread, since the
+    Blink collector's event loop must not be driven from two threads, and
+    cached for the heartbeat thread. A capture cycle that finds a
+    different set of cameras registers the worker again.
+
+    Example:
+        worker = CollectionWorker("http://10.0.0.2:9110", rpi_pool=pool)
+        worker.run()  # until stop()
+    """
+
+    def __init__(
+        self,
+        coordinator_url: str,
+        rpi_pool=None,
+        blink_collector=None,
+        worker_id: str = None,
+        interval: float = COLLECT_INTERVAL,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        token: str = None,
+        timeout: float = REQUEST_TIMEOUT,
+        logger: logging.Logger = None,
+    ):
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.rpi_pool = rpi_pool
+        self.blink_collector = blink_collector
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.interval = interval
+        self.heartbeat_interval = heartbeat_interval
+        self.token = token
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.assigned = []
+        self.generation = None
+        self.registered = False
+        self.reachable = None  # sorted camera keys, listed on the capture thread
+        self.stats = {"captured": 0, "sent": 0, "dropped": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def _request(
+        self, path: str, payload: dict = None, data: bytes = None, params: dict = None
+    ):
+        from urllib.error import HTTPError, URLError
+        from urllib.request import Request, urlopen
+
+        url = self.coordinator_url + path + (f"?{urlencode(params)}" if params else "")
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        elif data is not None:
+            headers["Content-Type"] = "image/jpeg"
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        try:
+            with urlopen(
+                Request(url, data=data, headers=headers), timeout=self.timeout
+            ) as response:
+                return json.loads(response.read() or b"{}")
+        except HTTPError as e:
+            raise CoordinatorError(f"{path}: HTTP {e.code}", e.code) from e
+        except (URLError, OSError) as e:
+            raise CoordinatorError(f"{path}: {e}") from e
+
+    def cameras(self) -> dict:
+        """
+        Every camera this host can reach, as camera keys mapped to folder names.
+
+        Call it from the capture thread only; `refresh_cameras` caches the
+        keys for registration.
+        """
+        cameras = {}
+        if self.rpi_pool is not None:
+            for device_num, settings in self.rpi_pool.devices.items():
+                cameras[f"rpi:{device_num}"] = camera_folder_name(settings["name"])
+        if self.blink_collector is not None:
+            for name in self.blink_collector.camera_names():
+                cameras[f"blink:{name}"] = camera_folder_name(name)
+        return cameras
+
+    def _update(self, assignment: dict) -> None:
+        with self._lock:
+            if assignment["generation"] != self.generation:
+                self.logger.info(
+                    f"Worker {self.worker_id} now owns {len(assignment['cameras'])} cameras: "
+                    f"{assignment['cameras']}"
+                )
+            self.assigned = assignment["cameras"]
+            self.generation = assignment["generation"]
+
+    def refresh_cameras(self) -> None:
+        """List the reachable cameras again; a changed set is registered on the next heartbeat."""
+        try:
+            reachable = sorted(self.cameras())
+        except Exception as e:
+            if self.reachable is None:
+                raise
+            self.logger.warning(f"Could not list cameras, keeping the last list: {e}")
+            return
+        if self.reachable is not None and reachable != self.reachable:
+            self.logger.info(f"Worker {self.worker_id} can now reach {reachable}")
+            self.registered = False
+        self.reachable = reachable
+
+    def register(self) -> None:
+        if self.reachable is None:
+            self.refresh_cameras()
+        assignment = self._request(
+            "/register", {"worker": self.worker_id, "cameras": self.reachable}
+        )
+        self.registered = True
+        self._update(assignment)
+
+    def heartbeat(self) -> None:
+        """Send one heartbeat, registering again if the coordinator has forgotten this worker."""
+        try:
+            if not self.registered:
+                self.register()
+                return
+            self._update(self._request("/heartbeat", {"worker": self.worker_id}))
+        except CoordinatorError as e:
+            if e.status == 404:
+                self.registered = False
+                self.register()
+            else:
+                raise
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                # Whatever went wrong, the next heartbeat must still be sent
+                self.logger.warning(f"Heartbeat to {self.coordinator_url} failed: {e}")
+
+    def _send(self, camera: str, timestamp: str, data: bytes) -> bool:
+        try:
+            self._request(
+                "/frames",
+                data=data,
+                params={
+                    "worker": self.worker_id,
+                    "camera": camera,
+                    "timestamp": timestamp,
+                },
+            )
+        except CoordinatorError as e:
+            if e.status == 404:
+                self.registered = False  # re-register on the next heartbeat
+            self.logger.error(f"Could not send {camera} frame {timestamp}: {e}")
+            metrics.counter(
+                "cluster_frames_dropped_total", "Frames a worker could not send"
+            ).inc()
+            self.stats["dropped"] += 1
+            return False
+        self.stats["sent"] += 1
+        return True
+
+    def capture_once(self) -> int:
+        """
+        Capture every assigned camera once and send the frames.
+
+        Returns:
+            int: Number of frames the coordinator accepted.
+        """
+        self.refresh_cameras()
+        with self._lock:
+            assigned = list(self.assigned)
+        devices = [key.split(":", 1)[1] for key in assigned if key.startswith("rpi:")]
+        blink_names = [
+            key.split(":", 1)[1] for key in assigned if key.startswith("blink:")
+        ]
+        frames = []
+        if devices and self.rpi_pool is not None:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            for device_num, result in self.rpi_pool.capture_all(
+                in_memory=True, devices=devices
+            ).items():
+                if result.get("data"):
+                    name = camera_folder_name(self.rpi_pool.devices[device_num]["name"])
+                    frames.append((name, timestamp, result["data"]))
+        if blink_names and self.blink_collector is not None:
+            frames += self.blink_collector.collect(blink_names, in_memory=True)
+        self.stats["captured"] += len(frames)
+        return sum(self._send(*frame) for frame in frames)
+
+    def start(self) -> None:
+        """Register (retrying until the coordinator answers) and start heartbeating."""
+        self.refresh_cameras()
+        while not self._stop.is_set():
+            try:
+                self.register()
+                break
+            except CoordinatorError as e:
+                self.logger.warning(f"Cannot register with {self.coordinator_url}: {e}")
+                self._stop.wait(self.heartbeat_interval)
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="cluster-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def run(self) -> None:
+        """Capture the assigned cameras every `interval` seconds until `stop` is called."""
+        self.start()
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                sent = self.capture_once()
+                self.logger.info(f"Worker {self.worker_id} sent {sent} frames")
+            except Exception as e:
+                self.logger.error(f"Capture cycle failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
@@ -0,0 +1,346 @@
+# pre-upload compaction: re-encode captures smaller, keep originals until uploaded
+import glob
+import os
+import tempfile
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from io import BytesIO
+
+from baby_care_ai import metrics
+from baby_care_ai.storage import DAY_LENGTH, camera_folders, day_folders
+
+# format name -> (PIL format, file extension)
+FORMATS = {"jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+QUALITY = 80
+MAX_DIMENSION = 1920  # longest side in pixels; 0 keeps the captured size
+CHUNK_SIZE = 16  # images per worker task
+ORIGINALS_FOLDER = ".originals"  # per day folder, holds originals until uploaded
+POOL_START_METHOD = "forkserver"  # never fork the threaded automation process
+
+logger = logging.getLogger(__name__)
+
+
+def encode(
+    source,
+    image_format: str = "jpeg",
+    quality: int = QUALITY,
+    max_dimension: int = MAX_DIMENSION,
+) -> bytes:
+    """
+    Re-encode an image, shrunk to fit `max_dimension` and without EXIF.
+
+    Args:
+        source: A path or file object.
+        image_format (str): A key of `FORMATS`.
+        quality (int): Encoder quality, 1-100.
+        max_dimension (int): Longest side of the result; 0 keeps the size.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format = FORMATS[image_format][0]
+    with Image.open(source) as image:
+        if max_dimension and image.format == "JPEG":
+            # Decode at a reduced scale straight away when shrinking
+            image.draft("RGB", (max_dimension, max_dimension))
+        # Bake the EXIF orientation into the pixels, since EXIF is not written
+        image = ImageOps.exif_transpose(image)
+        if max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        options = {"quality": quality}
+        if pil_format == "JPEG":
+            options.update(optimize=True, progressive=True)
+        else:
+            options["method"] = 4
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def original_path(path: str) -> str:
+    """Where the original of a capture is kept until it is uploaded."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, ORIGINALS_FOLDER, name)
+
+
+def _compact_chunk(
+    image_paths: list, image_format: str, quality: int, max_dimension: int
+) -> dict:
+    """
+    Worker-process entry point: encode one chunk next to the originals.
+
+    Returns:
+        dict: Paths mapped to (temporary path or None, size, original size, error).
+            No temporary file is written when the result would not be smaller.
+    """
+    results = {}
+    for path in image_paths:
+        try:
+            original_size = os.path.getsize(path)
+            data = encode(path, image_format, quality, max_dimension)
+        except Exception as e:
+            results[path] = (None, 0, 0, str(e))
+            continue
+        if len(data) >= original_size:
+            results[path] = (None, original_size, original_size, None)
+            continue
+        folder, name = os.path.split(path)
+        # A name no other compaction can pick, even of the same capture
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{name}.", suffix=".compact", dir=folder
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        results[path] = (tmp_path, len(data), original_size, None)
+    return results
+
+
+class Compactor:
+    """
+    Re-encode captures before upload to cut bandwidth, Drive storage and sync time.
+
+    Each image is shrunk to fit `max_dimension`, stripped of EXIF and saved
+    as an optimized JPEG or a WebP at `quality`, across a process pool. The
+    compacted image takes the capture's place (with a `.webp` extension for
+    WebP) and the original moves to the day folder's `.originals/` folder
+    until `discard_originals` or `release_originals` sees it uploaded.
+    Images that would not get smaller are left as they are.
+
+    Example:
+        compactor = Compactor("webp", quality=75, workers=4)
+        paths = list(compactor.compact(paths).values())
+        # ... upload paths ...
+        compactor.discard_originals(uploaded)
+    """
+
+    def __init__(
+        self,
+        image_format: str = "jpeg",
+        quality: int = QUALITY,
+        max_dimension: int = MAX_DIMENSION,
+        workers: int = 1,
+        chunk_size: int = CHUNK_SIZE,
+        logger: logging.Logger = None,
+    ):
+        if image_format not in FORMATS:
+            raise ValueError(
+                f"Unknown compaction format {image_format!r}, expected one of {sorted(FORMATS)}"
+            )
+        self.image_format = image_format
+        self.extension = FORMATS[image_format][1]
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _encode_all(self, image_paths: list) -> dict:
+        args = (self.image_format, self.quality, self.max_dimension)
+        if self.workers <= 1 or len(image_paths) <= self.chunk_size:
+            return _compact_chunk(image_paths, *args)
+        chunks = [
+            image_paths[i : i + self.chunk_size]
+            for i in range(0, len(image_paths), self.chunk_size)
+        ]
+        results = {}
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(POOL_START_METHOD),
+        ) as executor:
+            futures = [
+                executor.submit(_compact_chunk, chunk, *args) for chunk in chunks
+            ]
+            for future in futures:
+                results.update(future.result())
+        return results
+
+    def _replace(self, path: str, tmp_path: str) -> str:
+        """Move the original aside and put the compacted image in its place."""
+        target = os.path.splitext(path)[0] + self.extension
+        kept = original_path(path)
+        os.makedirs(os.path.dirname(kept), exist_ok=True)
+        os.replace(path, kept)
+        os.replace(tmp_path, target)
+        return target
+
+    def compact(self, image_paths: list) -> dict:
+        """
+        Compact images in place.
+
+        Returns:
+            dict: Every readable path mapped to the capture's path afterwards,
+                which differs when the format changes the extension.
+                Unreadable images are logged and omitted.
+        """
+        if not image_paths:
+            return {}
+        start = time.perf_counter()
+        results = self._encode_all(list(image_paths))
+        compacted, saved, before = {}, 0, 0
+        counts = {"compacted": 0, "skipped": 0, "failed": 0}
+        for path, (tmp_path, size, original_size, error) in results.items():
+            if error is not None:
+                self.logger.error(f"Error compacting {path}: {error}")
+                counts["failed"] += 1
+                continue
+            before += original_size
+            if tmp_path is None:
+                compacted[path] = path
+                counts["skipped"] += 1
+                continue
+            try:
+                compacted[path] = self._replace(path, tmp_path)
+            except OSError as e:
+                # e.g. the capture was removed while it was being encoded
+                self.logger.error(
+                    f"Error replacing {path} with its compacted copy: {e}"
+                )
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                counts["failed"] += 1
+                continue
+            saved += original_size - size
+            counts["compacted"] += 1
+        elapsed = time.perf_counter() - start
+
+        for outcome, count in counts.items():
+            metrics.counter("compaction_images_total", "Images through compaction").inc(
+                count, outcome=outcome, format=self.image_format
+            )
+        metrics.counter(
+            "compaction_bytes_saved_total", "Bytes saved by compaction"
+        ).inc(saved)
+        metrics.histogram(
+            "compaction_seconds", "Duration of compaction passes"
+        ).observe(elapsed)
+        rate = len(results) / elapsed if elapsed > 0 else 0.0
+        metrics.gauge(
+            "compaction_rate", "Images encoded per second in the last pass"
+        ).set(rate)
+        self.logger.info(
+            f"Compacted {counts['compacted']} of {len(results)} images to {self.image_format}, "
+            f"saved {saved / 2**20:.1f} MiB of {before / 2**20:.1f} MiB "
+            f"({rate:.1f} images/s, {counts['failed']} failed)"
+        )
+        return compacted
+
+    def discard_originals(self, image_paths: list) -> int:
+        """
+        Delete the originals of captures that are now uploaded.
+
+        Returns:
+            int: Bytes freed.
+        """
+        return _discard_originals(image_paths, self.logger)
+
+
+def _discard_originals(image_paths: list, logger: logging.Logger) -> int:
+    freed = 0
+    for path in image_paths:
+        folder, name = os.path.split(path)
+        stem = os.path.splitext(name)[0]
+        # The original may have had another extension than the compacted capture
+        pattern = os.path.join(folder, ORIGINALS_FOLDER, glob.escape(stem) + ".*")
+        for kept in glob.glob(pattern):
+            freed += os.path.getsize(kept)
+            os.remove(kept)
+            logger.debug(f"Removed original of uploaded capture: {kept}")
+    return freed
+
+
+def compact_captures(
+    catalog,
+    compactor: Compactor,
+    upload_queue=None,
+    logger: logging.Logger = None,
+) -> dict:
+    """
+    Compact the kept captures a `CaptureCatalog` has neither uploaded nor compacted yet.
+
+    This is the stage between dedup and sync: it picks up whatever the
+    incremental syncer did not compact and upload itself. Captures are
+    claimed in the catalog first and checked again once claimed, so a
+    capture the syncer is compacting, or has just compacted, is left alone.
+
+    Args:
+        catalog (CaptureCatalog): The capture catalog; new paths and sizes are recorded in it.
+        compactor (Compactor): The encoder settings and process pool size.
+        upload_queue (DurableUploadQueue): Optional queue; captures already
+            waiting in it are left alone, since it uploads them by path.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        dict: Old paths mapped to the paths after compaction.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    candidates = catalog.uncompacted()
+    if upload_queue is not None:
+        queued = {}
+        for camera, path in candidates:
+            if camera not in queued:
+                queued[camera] = upload_queue.queued_names(camera)
+        candidates = [
+            (camera, path)
+            for camera, path in candidates
+            if os.path.basename(path) not in queued[camera]
+        ]
+    claimed = catalog.claim([path for _, path in candidates])
+    try:
+        done = catalog.compacted(claimed)
+        paths = [path for path in claimed if path not in done]
+        if not paths:
+            return {}
+        compacted = compactor.compact(paths)
+        # Unreadable or vanished captures are recorded as they are, not retried every pass
+        catalog.record_compacted({path: compacted.get(path, path) for path in paths})
+    finally:
+        catalog.release(claimed)
+    return compacted
+
+
+def release_originals(root: str, manifest, logger: logging.Logger = None) -> int:
+    """
+    Delete every kept original whose compacted capture the manifest records as uploaded.
+
+    A safety net for `Compactor.discard_originals`, e.g. for captures that
+    the durable upload queue uploaded later.
+
+    Args:
+        root (str): The output folder.
+        manifest (UploadManifest): Upload records, e.g. the `CaptureCatalog`.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        int: Bytes freed.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    uploaded = []
+    for camera_folder in camera_folders(root):
+        names = None
+        for day in day_folders(camera_folder):
+            folder = os.path.join(camera_folder, day)
+            originals = os.path.join(folder, ORIGINALS_FOLDER)
+            if not os.path.isdir(originals):
+                continue
+            if names is None:
+                names = manifest.uploaded_names(os.path.basename(camera_folder))
+            stems = {os.path.splitext(name)[0] for name in os.listdir(originals)}
+            uploaded += [
+                os.path.join(folder, name)
+                for name in names
+                if name[:DAY_LENGTH] == day and os.path.splitext(name)[0] in stems
+            ]
+    freed = _discard_originals(uploaded, logger)
+    if freed:
+        logger.info(
+            f"Removed {len(uploaded)} originals of uploaded captures ({freed / 2**20:.1f} MiB)"
+        )
+    return freed
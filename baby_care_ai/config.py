@@ -0,0 +1,155 @@
+# typed runtime configuration, read once from the environment and .env
+import os
+import threading
+import logging
+from dataclasses import dataclass, field, fields
+
+RPI_DEVICE_PREFIX = "RPI_DEVICE_"
+
+logger = logging.getLogger(__name__)
+
+
+def _env(name: str, default=None, parse=str):
+    return field(default=default, metadata={"env": name, "parse": parse})
+
+
+def _optional_float(value: str):
+    return float(value) if value else None
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _intervals(value: str) -> dict:
+    """Parse "camera=min:max,..." into {camera: (min seconds, max seconds)}."""
+    intervals = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        camera, _, limits = item.partition("=")
+        low, _, high = limits.partition(":")
+        intervals[camera.strip()] = (float(low), float(high))
+    return intervals
+
+
+def rpi_device_configs(environ) -> dict:
+    """
+    Group `RPI_DEVICE_<n>_<PARAM>` variables by device number.
+
+    Returns:
+        dict: Device numbers mapped to {PARAM: value}.
+    """
+    devices = {}
+    for key, value in environ.items():
+        if key.startswith(RPI_DEVICE_PREFIX):
+            parts = key.split("_")
+            devices.setdefault(parts[2], {})["_".join(parts[3:])] = value
+    return devices
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Every setting read from the environment, parsed and typed.
+
+    Each field names the variable it comes from; see `.env_example` for
+    what they mean. Settings a command cannot run without are checked with
+    `require` when that command first needs them, not at import time.
+    """
+
+    output_folder: str = _env("OUTPUT_FOLDER")
+    blink_config_path: str = _env("CONFIG_JSON_PATH")
+    drive_credentials_path: str = _env("GOOGLE_DRIVE_CREDENTIALS_PATH")
+    drive_photo_folder_name: str = _env("GOOGLE_DRIVE_PHOTO_FOLDER_NAME")
+    dedup_threshold: int = _env("DEDUP_THRESHOLD", 0, int)
+    dedup_workers: int = _env("DEDUP_WORKERS", os.cpu_count() or 1, int)
+    dedup_strategy: str = _env("DEDUP_STRATEGY", "average_hash")
+    upload_workers: int = _env("UPLOAD_WORKERS", 4, int)
+    upload_drain_rate: float = _env("UPLOAD_DRAIN_RATE", 5.0, float)
+    upload_max_attempts: int = _env("UPLOAD_MAX_ATTEMPTS", 20, int)
+    upload_mode: str = _env("UPLOAD_MODE", "files", lambda value: value.lower())
+    retention_days: int = _env("RETENTION_DAYS", 1, int)
+    retention_max_gb: float = _env("RETENTION_MAX_GB", None, _optional_float)
+    compact_format: str = _env(
+        "COMPACT_FORMAT", None, lambda value: value.lower() or None
+    )
+    compact_quality: int = _env("COMPACT_QUALITY", 80, int)
+    compact_max_dimension: int = _env("COMPACT_MAX_DIMENSION", 1920, int)
+    compact_workers: int = _env("COMPACT_WORKERS", os.cpu_count() or 1, int)
+    capture_mode: str = _env("CAPTURE_MODE", "files")
+    collect_jitter: float = _env("COLLECT_JITTER", 5.0, float)
+    adaptive_capture: bool = _env("ADAPTIVE_CAPTURE", False, _flag)
+    capture_min_interval: float = _env("CAPTURE_MIN_INTERVAL", 60.0, float)
+    capture_max_interval: float = _env("CAPTURE_MAX_INTERVAL", 180.0, float)
+    capture_change_threshold: int = _env("CAPTURE_CHANGE_THRESHOLD", 6, int)
+    capture_intervals: dict = _env("CAPTURE_INTERVALS", None, _intervals)
+    capture_deadline: float = _env("CAPTURE_DEADLINE", 30.0, float)
+    breaker_failures: int = _env("BREAKER_FAILURES", 3, int)
+    breaker_cooloff: float = _env("BREAKER_COOLOFF", 60.0, float)
+    breaker_max_cooloff: float = _env("BREAKER_MAX_COOLOFF", 1800.0, float)
+    cluster_role: str = _env("CLUSTER_ROLE", None, lambda value: value.lower() or None)
+    cluster_host: str = _env("CLUSTER_HOST", "127.0.0.1")
+    cluster_port: int = _env("CLUSTER_PORT", 9110, int)
+    cluster_url: str = _env("CLUSTER_URL")
+    cluster_token: str = _env("CLUSTER_TOKEN")
+    cluster_worker_id: str = _env("CLUSTER_WORKER_ID")
+    metrics_port: int = _env("METRICS_PORT", 9108, int)
+    metrics_snapshot_path: str = _env("METRICS_SNAPSHOT_PATH", "metrics.json")
+    rpi_devices: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls, environ=None) -> "Config":
+        """
+        Build a config from `environ` (defaults to `os.environ`).
+
+        Raises:
+            ValueError: If a variable is set but cannot be parsed.
+        """
+        if environ is None:
+            environ = os.environ
+        values = {}
+        for f in fields(cls):
+            name = f.metadata.get("env")
+            if name is None or name not in environ:
+                continue
+            try:
+                values[f.name] = f.metadata["parse"](environ[name])
+            except ValueError as e:
+                raise ValueError(
+                    f"Invalid value for {name}: {environ[name]!r} ({e})"
+                ) from e
+        return cls(rpi_devices=rpi_device_configs(environ), **values)
+
+    def require(self, name: str):
+        """
+        Return a setting, raising if it is not set.
+
+        Raises:
+            ValueError: Naming the environment variable to set.
+        """
+        value = getattr(self, name)
+        if value is None:
+            env = next(f.metadata["env"] for f in fields(self) if f.name == name)
+            raise ValueError(f"{env} environment variable must be set.")
+        return value
+
+
+_config = None
+_lock = threading.Lock()
+
+
+def load_config(reload: bool = False) -> Config:
+    """
+    The process-wide config, read from `.env` and the environment on first use.
+
+    Args:
+        reload (bool): Read the environment again, e.g. after changing it in tests.
+    """
+    global _config
+    if _config is None or reload:
+        with _lock:
+            if _config is None or reload:
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                _config = Config.from_env()
+    return _config
@@ -1,14 +1,42 @@
 # %%
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
-from pydrive2.settings import LoadSettingsFile
-from dotenv import load_dotenv
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from io import BytesIO
+from typing import TYPE_CHECKING
+from baby_care_ai import metrics
+from baby_care_ai.config import load_config
+from baby_care_ai.gooogle_drive.manifest import UploadManifest
+from baby_care_ai.pack import index_path, pack_lock, pack_path
+from baby_care_ai.storage import camera_folders, day_folders, image_files
+import datetime
 import os
+import random
+import threading
+import time
 import logging
 
-load_dotenv()
+# PyDrive2 and googleapiclient are imported by the functions that call them,
+# so callers that never touch Drive do not pay for the Google client stack
+if TYPE_CHECKING:
+    from pydrive2.drive import GoogleDrive
+
 logger = logging.getLogger(__name__)
 
+UPLOAD_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds; doubled on every retry of the same request
+BACKOFF_MAX = 60.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024  # files above this are uploaded in chunks
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # must be a multiple of 256 KiB
+PACK_CHUNK_SIZE = 32 * 1024 * 1024  # day packs go up in few large chunks
+PACK_DELAY = datetime.timedelta(
+    hours=1
+)  # a day's pack is uploaded this long after midnight
+
 
 def authenticate_drive(logger=logger) -> GoogleDrive:
     """
@@ -16,7 +44,11 @@ def authenticate_drive(logger=logger) -> GoogleDrive:
     Uses a persistent token file to allow for silent refreshing of access tokens,
     enabling non-interactive automation for long periods.
     """
-    drive_credentials_path = os.getenv("GOOGLE_DRIVE_CREDENTIALS_PATH")
+    from pydrive2.auth import GoogleAuth
+    from pydrive2.drive import GoogleDrive
+    from pydrive2.settings import LoadSettingsFile
+
+    drive_credentials_path = load_config().require("drive_credentials_path")
     # This is where we store the user's specific tokens/session
     token_file = os.path.join(
         os.path.dirname(drive_credentials_path), "google_drive_token.json"
@@ -103,12 +135,421 @@ def find_folder_id(
         return ""
 
 
+class RateLimiter:
+    """
+    Adaptive request pacing shared by all upload workers.
+
+    Every request waits for its slot; a rate-limit response doubles the
+    spacing between requests (at most once per `cooldown`, since in-flight
+    requests from every worker tend to be rejected together) and each
+    success shrinks it again, so the pool settles just under Drive's quota
+    instead of hammering it with retries.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.0,
+        max_interval: float = 10.0,
+        cooldown: float = 1.0,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cooldown = cooldown
+        self.interval = min_interval
+        self._next_slot = 0.0
+        self._last_throttle = float("-inf")
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def throttled(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_throttle < self.cooldown:
+                return
+            self._last_throttle = now
+            self.interval = min(self.max_interval, max(self.interval * 2, 0.02))
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.interval = self.interval * 0.98
+            if self.interval < max(self.min_interval, 0.001):
+                self.interval = self.min_interval
+
+
+def _http_error_of(error: Exception):
+    """The `HttpError` behind an error raised by a Drive request, or None."""
+    from googleapiclient.errors import HttpError
+    from pydrive2.files import ApiRequestError
+
+    if isinstance(error, ApiRequestError):
+        return error.args[0]
+    if isinstance(error, HttpError):
+        return error
+    return None
+
+
+def _is_transport_error(error: Exception) -> bool:
+    """True for a network failure a retry may get past, e.g. a dropped connection."""
+    import ssl
+
+    import httplib2
+
+    if isinstance(error, ssl.SSLCertVerificationError):
+        return False
+    return isinstance(
+        error,
+        (ConnectionError, TimeoutError, ssl.SSLError, httplib2.ServerNotFoundError),
+    )
+
+
+def _retry_reason(error: Exception):
+    """Return (retryable, rate_limited) for an error raised by a Drive request."""
+    http_error = _http_error_of(error)
+    if http_error is None:
+        return _is_transport_error(error), False
+    status = http_error.resp.status
+    rate_limited = status == 429 or (
+        status == 403 and any(r in str(http_error) for r in RATE_LIMIT_REASONS)
+    )
+    return rate_limited or status in RETRYABLE_STATUSES, rate_limited
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    True if Drive rejected the request in a way retrying cannot fix.
+
+    That is an HTTP error that `_retry_reason` does not retry, such as a
+    400 or a 404. A 401 is not permanent, since the credentials may be
+    refreshed, and neither is an error without an HTTP response, such as a
+    network failure.
+    """
+    http_error = _http_error_of(error)
+    if http_error is None or http_error.resp.status == 401:
+        return False
+    return not _retry_reason(error)[0]
+
+
+def _backoff(
+    error: Exception,
+    attempt: int,
+    limiter: RateLimiter,
+    description: str,
+    logger: logging.Logger,
+) -> None:
+    """Sleep before retrying `description`, or re-raise `error` if not retryable."""
+    retryable, rate_limited = _retry_reason(error)
+    if not retryable or attempt >= MAX_RETRIES:
+        raise error
+    if rate_limited:
+        limiter.throttled()
+    metrics.counter("drive_retries_total", "Drive requests retried").inc(
+        reason="rate_limit" if rate_limited else "error"
+    )
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.5)
+    logger.warning(
+        f"{description} failed ({error}), "
+        f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s"
+    )
+    time.sleep(delay)
+
+
+def _resumable_upload(
+    drive: GoogleDrive,
+    filepath: str,
+    metadata: dict,
+    limiter: RateLimiter,
+    logger: logging.Logger,
+    data: bytes = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> str:
+    """Upload a large file in chunks, retrying each chunk and resuming after it."""
+    import ssl
+
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+    if drive.auth.service is None:
+        drive.auth.Authorize()
+    if not getattr(drive.auth.thread_local, "http", None):
+        drive.auth.thread_local.http = drive.auth.Get_Http_Object()
+    http = drive.auth.thread_local.http
+    if data is not None:
+        media = MediaIoBaseUpload(
+            BytesIO(data), "image/jpeg", resumable=True, chunksize=chunk_size
+        )
+    else:
+        media = MediaFileUpload(filepath, resumable=True, chunksize=chunk_size)
+    request = drive.auth.service.files().insert(
+        body=metadata, media_body=media, supportsAllDrives=True
+    )
+    response = None
+    attempt = 0
+    while response is None:
+        limiter.wait()
+        try:
+            _, response = request.next_chunk(http=http)
+            limiter.succeeded()
+            attempt = 0
+        except (
+            HttpError,
+            ConnectionError,
+            TimeoutError,
+            ssl.SSLError,
+            httplib2.ServerNotFoundError,
+        ) as e:
+            # The request keeps its upload session, so a retry resumes this chunk
+            _backoff(e, attempt, limiter, f"Chunk of {filepath}", logger)
+            attempt += 1
+    return response["id"]
+
+
+def upload_file(
+    drive: GoogleDrive,
+    filepath: str,
+    parent_id: str,
+    title: str = None,
+    limiter: RateLimiter = None,
+    logger: logging.Logger = None,
+    data: bytes = None,
+    resumable: bool = False,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> str:
+    """
+    Upload one file, retrying 429/5xx responses and network failures with
+    exponential backoff.
+
+    Files larger than `RESUMABLE_THRESHOLD`, or any file when `resumable` is
+    set, are sent as a resumable upload in `chunk_size` chunks so a failure
+    only re-sends the current chunk.
+    Safe to call from several threads: PyDrive2 gives each thread its own
+    HTTP connection.
+
+    Args:
+        drive: An authenticated Google Drive instance.
+        filepath: Path of the local file.
+        parent_id: ID of the Drive folder to upload into.
+        title: Drive file name. Defaults to the local file name.
+        limiter: Optional `RateLimiter` shared with other workers.
+        data: The file's contents when already in memory; the file is then
+            not read back from disk.
+        resumable: Always use a resumable upload.
+        chunk_size: Bytes per resumable chunk, a multiple of 256 KiB.
+
+    Returns:
+        str: The ID of the uploaded Drive file.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if limiter is None:
+        limiter = RateLimiter()
+    if title is None:
+        title = os.path.basename(filepath)
+    metadata = {"title": title, "parents": [{"id": parent_id}]}
+
+    size = len(data) if data is not None else os.path.getsize(filepath)
+    with metrics.span("drive_upload"):
+        drive_id = _upload(
+            drive,
+            filepath,
+            metadata,
+            size,
+            limiter,
+            logger,
+            data,
+            resumable,
+            chunk_size,
+        )
+    metrics.counter("drive_uploads_total", "Files uploaded to Drive").inc()
+    metrics.counter("drive_uploaded_bytes_total", "Bytes uploaded to Drive").inc(size)
+    return drive_id
+
+
+def _upload(
+    drive: GoogleDrive,
+    filepath: str,
+    metadata: dict,
+    size: int,
+    limiter: RateLimiter,
+    logger: logging.Logger,
+    data: bytes = None,
+    resumable: bool = False,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> str:
+    if resumable or size > RESUMABLE_THRESHOLD:
+        return _resumable_upload(
+            drive, filepath, metadata, limiter, logger, data=data, chunk_size=chunk_size
+        )
+
+    title = metadata["title"]
+    attempt = 0
+    while True:
+        limiter.wait()
+        try:
+            file_drive = drive.CreateFile(dict(metadata))
+            if data is not None:
+                file_drive["mimeType"] = "image/jpeg"
+                file_drive.content = BytesIO(data)
+            else:
+                file_drive.SetContentFile(filepath)
+            file_drive.Upload()
+            limiter.succeeded()
+            return file_drive["id"]
+        except Exception as e:
+            _backoff(e, attempt, limiter, f"Upload of {title}", logger)
+            attempt += 1
+
+
+def upload_many(
+    drive: GoogleDrive,
+    jobs: list,
+    workers: int = UPLOAD_WORKERS,
+    logger: logging.Logger = None,
+    resumable: bool = False,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> dict:
+    """
+    Upload files concurrently on a bounded thread pool.
+
+    Args:
+        drive: An authenticated Google Drive instance.
+        jobs: (filepath, parent_id) pairs.
+        workers: Maximum number of uploads in flight.
+        resumable, chunk_size: Passed on to `upload_file`.
+
+    Returns:
+        dict: Local paths mapped to Drive file IDs for the uploads that succeeded.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    limiter = RateLimiter()
+    uploaded = {}
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="drive-upload"
+    ) as executor:
+        futures = {
+            executor.submit(
+                upload_file,
+                drive,
+                filepath,
+                parent_id,
+                limiter=limiter,
+                logger=logger,
+                resumable=resumable,
+                chunk_size=chunk_size,
+            ): filepath
+            for filepath, parent_id in jobs
+        }
+        for future in as_completed(futures):
+            filepath = futures[future]
+            try:
+                uploaded[filepath] = future.result()
+                logger.info(f"Uploaded {os.path.basename(filepath)}")
+            except Exception as e:
+                logger.error(f"Failed to upload {filepath}: {e}")
+    return uploaded
+
+
+def room_folder_id(
+    drive: GoogleDrive,
+    folder_id: str,
+    room_name: str,
+    manifest: UploadManifest = None,
+    logger: logging.Logger = None,
+) -> str:
+    """
+    Find the Drive subfolder for a room, creating it if it doesn't exist.
+
+    The ID is served from and cached in `manifest` when one is given.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if manifest is not None:
+        cached = manifest.folder_id(room_name)
+        if cached is None:
+            cached = room_folder_id(drive, folder_id, room_name, logger=logger)
+            manifest.set_folder_id(room_name, cached)
+        return cached
+
+    q = (
+        f"'{folder_id}' in parents and title='{room_name}' "
+        "and mimeType='application/vnd.google-apps.folder'"
+    )
+    subfolder_list = drive.ListFile({"q": q}).GetList()
+
+    if subfolder_list:
+        logger.info(f"Found existing {room_name} subfolder")
+        return subfolder_list[0]["id"]
+
+    # Create the subfolder if it doesn't exist
+    subfolder = drive.CreateFile(
+        {
+            "title": room_name,
+            "mimeType": "application/vnd.google-apps.folder",
+            "parents": [{"id": folder_id}],
+        }
+    )
+    subfolder.Upload()
+    logger.info(f"Created '{room_name}' subfolder")
+    return subfolder["id"]
+
+
+def _upload_claimed(
+    drive: GoogleDrive,
+    manifest: UploadManifest,
+    jobs: list,
+    rooms: dict,
+    workers: int,
+    logger: logging.Logger,
+) -> dict:
+    """
+    Upload and record `jobs`, leaving out files another job claimed or uploaded
+    meanwhile.
+
+    The incremental syncer, the upload queue and the full sync all upload
+    files the manifest does not record yet, so each file is claimed in the
+    manifest until its upload is recorded.
+
+    Returns:
+        dict: Local paths mapped to Drive file IDs for the uploads that succeeded.
+    """
+    claimed = manifest.claim([path for path, _ in jobs])
+    try:
+        free = set(claimed)
+        jobs = [
+            (path, parent_id)
+            for path, parent_id in jobs
+            if path in free
+            and not manifest.is_uploaded(rooms[path], os.path.basename(path))
+        ]
+        if not jobs:
+            logger.info("No new files to upload")
+            return {}
+        logger.info(f"Uploading {len(jobs)} files with {workers} workers...")
+        uploaded = upload_many(drive, jobs, workers=workers, logger=logger)
+        manifest.record_uploads(
+            [(rooms[path], path, drive_id) for path, drive_id in uploaded.items()]
+        )
+    finally:
+        manifest.release(claimed)
+    return uploaded
+
+
 def upload_files(
     folder_id: str,
     drive: GoogleDrive = None,
     local_folder: str = None,
     subfolder_names: list[str] = None,
     logger: logging.Logger = None,
+    workers: int = UPLOAD_WORKERS,
+    manifest: UploadManifest = None,
 ) -> None:
     """
     Sync local image files to Google Drive, organizing them into subfolders.
@@ -116,13 +557,19 @@ def upload_files(
     Args:
         drive: An authenticated Google Drive instance.
         folder_id: The ID of the parent folder in Google Drive.
-        local_folder: Path to the local folder containing subfolders with images.
+        local_folder: Path to the local folder containing one subfolder per
+            camera, with images in day folders (or directly, for older captures).
         subfolder_names: List of subfolder names to sync.
+        workers: Number of concurrent uploads.
+        manifest: Optional `UploadManifest`. When given, room folder IDs and the
+            set of already-uploaded files come from it instead of Drive listings,
+            every finished upload is recorded in it, and files another job
+            has claimed in it are skipped.
     """
     if logger is None:
         logger = logging.getLogger(__name__)
     if local_folder is None:
-        local_folder = os.getenv("OUTPUT_FOLDER")
+        local_folder = load_config().require("output_folder")
     if subfolder_names is None:
         subfolder_names = [
             name
@@ -136,83 +583,223 @@ def upload_files(
         drive = authenticate_drive(logger=logger)
 
     # Iterate through each subfolder
+    jobs = []
+    rooms = {}
     for room_name in subfolder_names:
         folder_name = local_folder + f"/{room_name}"
 
         # Check if subfolder exists in Google Drive
-        q = f"'{folder_id}' in parents and title='{room_name}' and mimeType='application/vnd.google-apps.folder'"
-        subfolder_list = drive.ListFile({"q": q}).GetList()
+        subfolder_id = room_folder_id(drive, folder_id, room_name, manifest, logger)
 
-        if subfolder_list:
-            subfolder_id = subfolder_list[0]["id"]
-            logger.info(f"Found existing {room_name} subfolder")
+        # Get list of files in local folder and existing files in Google Drive
+        files = image_files(folder_name)
+        if manifest is not None:
+            existing_titles = manifest.uploaded_names(room_name)
         else:
-            # Create the subfolder if it doesn't exist
-            subfolder = drive.CreateFile(
-                {
-                    "title": room_name,
-                    "mimeType": "application/vnd.google-apps.folder",
-                    "parents": [{"id": folder_id}],
-                }
+            existing_files = drive.ListFile(
+                {"q": f"'{subfolder_id}' in parents"}
+            ).GetList()
+            existing_titles = {file["title"] for file in existing_files}
+
+        # Queue image files that don't already exist
+        for filepath in files:
+            filename = os.path.basename(filepath)
+            if filename not in existing_titles:
+                jobs.append((filepath, subfolder_id))
+                rooms[filepath] = room_name
+            elif manifest is None:
+                logger.info(f"Skipped {filename} (already exists)")
+
+    if manifest is not None:
+        _upload_claimed(drive, manifest, jobs, rooms, workers, logger)
+    elif jobs:
+        logger.info(f"Uploading {len(jobs)} files with {workers} workers...")
+        upload_many(drive, jobs, workers=workers, logger=logger)
+    else:
+        logger.info("No new files to upload")
+
+
+def upload_pending(
+    folder_id: str,
+    drive: GoogleDrive,
+    catalog,
+    logger: logging.Logger = None,
+    workers: int = UPLOAD_WORKERS,
+) -> None:
+    """
+    Upload every capture a `CaptureCatalog` has no Drive file ID for.
+
+    Unlike `upload_files`, no local folder is listed: the pending captures
+    come from one indexed query. Captures another job has claimed in the
+    catalog are skipped.
+
+    Args:
+        folder_id: The ID of the parent folder in Google Drive.
+        drive: An authenticated Google Drive instance.
+        catalog: The `CaptureCatalog`; finished uploads are recorded in it.
+        workers: Number of concurrent uploads.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    jobs, rooms, room_ids, vanished = [], {}, {}, []
+    for room_name, filepath in catalog.pending_uploads():
+        if not os.path.exists(filepath):
+            vanished.append(filepath)
+            continue
+        if room_name not in room_ids:
+            room_ids[room_name] = room_folder_id(
+                drive, folder_id, room_name, catalog, logger
             )
-            subfolder.Upload()
-            subfolder_id = subfolder["id"]
-            logger.info(f"Created '{room_name}' subfolder")
+        jobs.append((filepath, room_ids[room_name]))
+        rooms[filepath] = room_name
+    catalog.forget(vanished)
+    _upload_claimed(drive, catalog, jobs, rooms, workers, logger)
 
-        # Get list of files in local folder and existing files in Google Drive
-        files = os.listdir(folder_name)
-        existing_files = drive.ListFile({"q": f"'{subfolder_id}' in parents"}).GetList()
-        existing_titles = {file["title"] for file in existing_files}
-
-        # Upload image files that don't already exist
-        for filename in files:
-            if filename.lower().endswith((".jpg", ".png", ".jpeg", ".gif", ".bmp")):
-                filepath = os.path.join(folder_name, filename)
-                if filename not in existing_titles:
-                    file_drive = drive.CreateFile(
-                        {"title": filename, "parents": [{"id": subfolder_id}]}
-                    )
-                    file_drive.SetContentFile(filepath)
-                    file_drive.Upload()
-                    logger.info(f"Uploaded {filename}")
-                elif filename in existing_titles:
-                    logger.info(f"Skipped {filename} (already exists)")
+
+def upload_packs(
+    folder_id: str,
+    drive: GoogleDrive,
+    root: str,
+    manifest: UploadManifest,
+    closed_before: str = None,
+    logger: logging.Logger = None,
+    workers: int = UPLOAD_WORKERS,
+    chunk_size: int = PACK_CHUNK_SIZE,
+) -> dict:
+    """
+    Upload the day packs (and their index sidecars) of finished days.
+
+    Each pack goes up once, as a resumable upload in `chunk_size` chunks,
+    instead of one request per image. Only days before `closed_before` are
+    uploaded, since a pack that is still growing would have to be sent again.
+    Each pack's `pack_lock` is held until its upload is recorded, so
+    `pack_captures` cannot append to it in the meantime.
+
+    Args:
+        folder_id: The ID of the parent folder in Google Drive.
+        drive: An authenticated Google Drive instance.
+        root: The output folder holding one folder per camera.
+        manifest: The `UploadManifest`; packs already in it are skipped and
+            finished uploads are recorded in it, under the pack's file name.
+        closed_before: A YYYYMMDD day; defaults to the day it was
+            `PACK_DELAY` ago, so the last captures of a day are packed first.
+        workers: Number of concurrent uploads.
+        chunk_size: Bytes per resumable chunk, a multiple of 256 KiB.
+
+    Returns:
+        dict: Local paths mapped to Drive file IDs for the uploads that succeeded.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if closed_before is None:
+        closed_before = (datetime.datetime.now() - PACK_DELAY).strftime("%Y%m%d")
+    jobs, rooms, packs = [], {}, set()
+    for camera_folder in camera_folders(root):
+        room_name = os.path.basename(camera_folder)
+        uploaded_names = None
+        for day in day_folders(camera_folder):
+            path = pack_path(os.path.join(camera_folder, day))
+            if day >= closed_before or not os.path.exists(path):
+                continue
+            if uploaded_names is None:
+                uploaded_names = manifest.uploaded_names(room_name)
+            for filepath in (path, index_path(path)):
+                if os.path.basename(filepath) not in uploaded_names:
+                    jobs.append(filepath)
+                    rooms[filepath] = room_name
+                    packs.add(path)
+
+    if not jobs:
+        logger.info("No new packs to upload")
+        return {}
+    room_ids = {
+        room_name: room_folder_id(drive, folder_id, room_name, manifest, logger)
+        for room_name in set(rooms.values())
+    }
+    logger.info(f"Uploading {len(jobs)} pack files with {workers} workers...")
+    with ExitStack() as locks:
+        for path in sorted(packs):
+            locks.enter_context(pack_lock(path))
+        uploaded = upload_many(
+            drive,
+            [(filepath, room_ids[rooms[filepath]]) for filepath in jobs],
+            workers=workers,
+            logger=logger,
+            resumable=True,
+            chunk_size=chunk_size,
+        )
+        manifest.record_uploads(
+            [(rooms[path], path, drive_id) for path, drive_id in uploaded.items()]
+        )
+    return uploaded
+
+
+def photo_folder_id(
+    drive: GoogleDrive, manifest: UploadManifest = None, logger: logging.Logger = None
+) -> str:
+    """
+    ID of the GOOGLE_DRIVE_PHOTO_FOLDER_NAME folder, cached in `manifest` when given.
+
+    Returns:
+        str: The folder ID, or an empty string if the folder does not exist.
+    """
+    google_drive_folder_name = load_config().require("drive_photo_folder_name")
+    parent_key = f"/{google_drive_folder_name}"
+    parent_folder_id = manifest.folder_id(parent_key) if manifest is not None else None
+    if parent_folder_id is None:
+        parent_folder_id = find_folder_id(
+            google_drive_folder_name, drive, logger=logger
+        )
+        if parent_folder_id and manifest is not None:
+            manifest.set_folder_id(parent_key, parent_folder_id)
+    return parent_folder_id
 
 
 # %%
 def sync_to_google_drive(
-    drive: GoogleDrive = None, logger: logging.Logger = None
+    drive: GoogleDrive = None,
+    logger: logging.Logger = None,
+    workers: int = UPLOAD_WORKERS,
+    manifest: UploadManifest = None,
+    catalog=None,
 ) -> None:
     """
     Sync local image files to Google Drive.
 
     Args:
         drive: An authenticated Google Drive instance.
+        workers: Number of concurrent uploads.
+        manifest: Optional `UploadManifest` used instead of listing Drive folders.
+        catalog: Optional `CaptureCatalog`; when given, pending uploads come
+            from it instead of listing the local folders.
     """
     if logger is None:
         logger = logging.getLogger(__name__)
     if drive is None:
         drive = authenticate_drive(logger=logger)
-    local_folder = os.getenv("OUTPUT_FOLDER")
-    # list the name of all subfolders in the local_folder
-    subfolder_names = [
-        name
-        for name in os.listdir(local_folder)
-        if os.path.isdir(os.path.join(local_folder, name))
-    ]
-    google_drive_folder_name = os.getenv("GOOGLE_DRIVE_PHOTO_FOLDER_NAME")
-
-    assert google_drive_folder_name is not None, (
-        "GOOGLE_DRIVE_PHOTO_FOLDER_NAME is not set"
-    )
-    parent_folder_id = find_folder_id(google_drive_folder_name, drive, logger=logger)
-    if parent_folder_id:
+    config = load_config()
+    local_folder = config.output_folder
+    google_drive_folder_name = config.drive_photo_folder_name
+    if catalog is not None:
+        manifest = catalog
+    parent_folder_id = photo_folder_id(drive, manifest, logger=logger)
+    if parent_folder_id and catalog is not None:
+        upload_pending(parent_folder_id, drive, catalog, logger=logger, workers=workers)
+    elif parent_folder_id:
+        # list the name of all subfolders in the local_folder
+        subfolder_names = [
+            name
+            for name in os.listdir(local_folder)
+            if os.path.isdir(os.path.join(local_folder, name))
+        ]
         upload_files(
             folder_id=parent_folder_id,
             drive=drive,
             local_folder=local_folder,
             subfolder_names=subfolder_names,
             logger=logger,
+            workers=workers,
+            manifest=manifest,
         )
     else:
         print(
@@ -222,6 +809,27 @@ def sync_to_google_drive(
     return drive
 
 
+def reconcile_manifest(
+    manifest: UploadManifest, drive: GoogleDrive = None, logger: logging.Logger = None
+) -> dict:
+    """
+    Re-list the Drive photo folder and correct any drift in `manifest`.
+
+    Returns:
+        dict: Counts of "added" and "removed" manifest entries.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if drive is None:
+        drive = authenticate_drive(logger=logger)
+    google_drive_folder_name = load_config().require("drive_photo_folder_name")
+    parent_folder_id = find_folder_id(google_drive_folder_name, drive, logger=logger)
+    if not parent_folder_id:
+        return {"added": 0, "removed": 0}
+    manifest.set_folder_id(f"/{google_drive_folder_name}", parent_folder_id)
+    return manifest.reconcile(drive, parent_folder_id, logger=logger)
+
+
 # %%
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,319 @@
+# event-driven sync: upload new images seconds after they are written
+import datetime
+import os
+import queue
+import threading
+import time
+import logging
+
+from baby_care_ai.blink.bktree import BKTree
+from baby_care_ai.blink.dedup import HASH_ENGINES
+from baby_care_ai.blink.hash_index import HashIndex
+from baby_care_ai.compaction import ORIGINALS_FOLDER
+from baby_care_ai.gooogle_drive.drive_utils import (
+    UPLOAD_WORKERS,
+    photo_folder_id,
+    room_folder_id,
+    upload_many,
+)
+from baby_care_ai.gooogle_drive.manifest import UploadManifest
+from baby_care_ai.storage import camera_name
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+BATCH_WINDOW = 2.0  # seconds to gather notifications into one upload batch
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalSync:
+    """
+    Upload new images as soon as they are reported instead of rescanning folders.
+
+    Collectors (or an optional filesystem watcher) call `notify(path)` for
+    every image they write. A background thread gathers notifications for
+    `batch_window` seconds, checks each image against its camera folder's
+    `HashIndex` (dropping near-duplicates of images already kept today),
+    and uploads the rest with `upload_many`, recording them in the
+    `UploadManifest`; with a `CaptureCatalog` the dedup results are recorded
+    as well. Work is proportional to the number of new files; the
+    periodic full `sync_to_google_drive` pass stays as a safety net for
+    anything missed here. With a `compactor`, the images that survive dedup
+    are compacted before upload and their originals deleted once uploaded.
+    Each image is claimed in the manifest from dedup until its upload is
+    recorded. Images the upload queue, the full sync or the dedup job's
+    compaction are working on are left to them. Hash indexes stay open for
+    today's day folders only.
+
+    Example:
+        syncer = IncrementalSync(drive, manifest, logger=logger)
+        syncer.start()
+        for path in collector.collect():
+            syncer.notify(path)
+    """
+
+    def __init__(
+        self,
+        drive,
+        manifest: UploadManifest,
+        workers: int = UPLOAD_WORKERS,
+        dedup_threshold: int = 0,
+        hash_engine: str = "batch",
+        batch_window: float = BATCH_WINDOW,
+        compactor=None,
+        logger: logging.Logger = None,
+    ):
+        self.drive = drive
+        self.manifest = manifest
+        self.workers = workers
+        self.dedup_threshold = dedup_threshold
+        self.hash_name, self.hash_fn = HASH_ENGINES[hash_engine]
+        self.batch_window = batch_window
+        self.compactor = compactor
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue = queue.Queue()
+        self._indexes = {}
+        self._trees = {}  # (folder, day) -> (BKTree, set of the paths in it)
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    def notify(self, path: str) -> None:
+        """Report a newly written image. Safe to call from any thread."""
+        if (
+            path
+            and path.lower().endswith(IMAGE_EXTENSIONS)
+            and os.path.basename(os.path.dirname(path)) != ORIGINALS_FOLDER
+        ):
+            self.queue.put(path)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="incremental-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def watch(self, folder: str) -> bool:
+        """
+        Also pick up images written by other processes via inotify.
+
+        Requires the optional `watchdog` package; without it only `notify`
+        calls are seen.
+
+        Returns:
+            bool: True if the watcher was started.
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            self.logger.info(
+                "watchdog not installed, relying on collector notifications"
+            )
+            return False
+
+        syncer = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_closed(self, event):
+                if not event.is_directory:
+                    syncer.notify(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    syncer.notify(event.dest_path)
+
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), folder, recursive=True)
+        self._observer.start()
+        self.logger.info(f"Watching {folder} for new images")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                batch = {self.queue.get(timeout=0.5)}
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.batch_window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.add(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.process(sorted(batch))
+            except Exception as e:
+                self.logger.error(f"Incremental sync failed: {e}", exc_info=True)
+        for index in self._indexes.values():
+            index.close()
+        self._indexes.clear()
+
+    def _tree(self, folder: str, day: str) -> tuple:
+        """
+        BK-tree of the hashes already kept on `day` in `folder`, seeded from its index.
+
+        Returns:
+            tuple: (BKTree, set of the paths in the tree).
+        """
+        key = (folder, day)
+        if key not in self._trees:
+            self._trees = {k: t for k, t in self._trees.items() if k[1] >= day}
+            tree, kept = BKTree(), set()
+            for path, img_hash in sorted(self._index(folder).entries().items()):
+                if os.path.basename(path).startswith(day) and os.path.exists(path):
+                    tree.add(int(img_hash, 16), path)
+                    kept.add(path)
+            self._trees[key] = (tree, kept)
+        return self._trees[key]
+
+    def _index(self, folder: str) -> HashIndex:
+        if folder not in self._indexes:
+            self._indexes[folder] = HashIndex(folder, hash_name=self.hash_name)
+        return self._indexes[folder]
+
+    def _close_old_indexes(self) -> None:
+        """Close the hash indexes of day folders before today; they reopen if needed."""
+        today = datetime.date.today().strftime("%Y%m%d")
+        for folder in [
+            folder for folder in self._indexes if os.path.basename(folder) != today
+        ]:
+            self._indexes.pop(folder).close()
+
+    def _drop_duplicates(self, folder: str, paths: list) -> list:
+        """Hash new images, delete near-duplicates of today's kept images, return the rest."""
+        index = self._index(folder)
+        for day in {os.path.basename(path)[:8] for path in paths}:
+            self._tree(folder, day)  # seed from the index before adding new hashes
+        hashes, missing = index.lookup(paths, logger=self.logger)
+        computed = self.hash_fn(list(missing), logger=self.logger)
+        index.store(missing, computed)
+        hashes.update(computed)
+
+        unique, removed = [], {}
+        for path in paths:
+            if path not in hashes:
+                continue
+            tree, kept = self._tree(folder, os.path.basename(path)[:8])
+            if path in kept:
+                unique.append(path)  # already kept, e.g. reported twice
+                continue
+            img_hash = int(hashes[path], 16)
+            match = None
+            for _, _, kept_path in tree.search(img_hash, self.dedup_threshold):
+                if os.path.exists(kept_path):
+                    match = kept_path
+                    break
+                kept.discard(kept_path)  # deleted since it was kept
+            if match is not None:
+                os.remove(path)
+                removed[path] = match
+                self.logger.info(f"Removed near-duplicate image: {path}")
+                continue
+            tree.add(img_hash, path)
+            kept.add(path)
+            unique.append(path)
+        if hasattr(self.manifest, "mark_kept"):
+            # So the dedup job does not check these captures again
+            self.manifest.mark_duplicates(removed)
+            self.manifest.mark_kept({path: hashes[path] for path in unique})
+        return unique
+
+    def _compact(self, folder: str, paths: list) -> list:
+        """
+        Compact deduplicated images, keeping the hash index and catalog in step.
+
+        The caller holds the claims on `paths`.
+
+        Returns:
+            list: The paths to upload, after compaction.
+        """
+        done = set()
+        if hasattr(self.manifest, "compacted"):
+            # Already compacted, e.g. the compacted file reported by the watcher
+            done = self.manifest.compacted(paths)
+        compacted = self.compactor.compact([path for path in paths if path not in done])
+        # Index the compacted files under their originals' hashes
+        index = self._index(folder)
+        entries = index.entries()
+        stats = {new: os.stat(new) for old, new in compacted.items() if old in entries}
+        index.store(
+            {new: (st.st_mtime_ns, st.st_size) for new, st in stats.items()},
+            {new: entries[old] for old, new in compacted.items() if new in stats},
+        )
+        if any(old != new for old, new in compacted.items()):
+            # Reseeded from the index on next use, without the old paths
+            self._trees = {k: t for k, t in self._trees.items() if k[0] != folder}
+        if hasattr(self.manifest, "record_compacted"):
+            self.manifest.record_compacted(compacted)
+        paths = [compacted.get(path, path) for path in paths]
+        return [path for path in paths if os.path.exists(path)]
+
+    def process(self, paths: list) -> dict:
+        """
+        Dedup and upload a batch of new images.
+
+        Returns:
+            dict: Local paths mapped to Drive file IDs for the uploads that succeeded.
+        """
+        by_folder = {}
+        for path in paths:
+            if os.path.exists(path):
+                by_folder.setdefault(os.path.dirname(path), []).append(path)
+        if not by_folder:
+            return {}
+
+        parent_id = photo_folder_id(self.drive, self.manifest, logger=self.logger)
+        if not parent_id:
+            self.logger.error("Photo folder not found in Google Drive, skipping upload")
+            return {}
+
+        jobs, rooms, claimed = [], {}, []
+        try:
+            for folder, folder_paths in by_folder.items():
+                room = camera_name(folder_paths[0])
+                # Claimed first, so no other job uploads them after this check
+                folder_paths = self.manifest.claim(folder_paths)
+                claimed += folder_paths
+                uploaded = self.manifest.uploaded_names(room)
+                fresh = [p for p in folder_paths if os.path.basename(p) not in uploaded]
+                if not fresh:
+                    continue
+                subfolder_id = room_folder_id(
+                    self.drive, parent_id, room, self.manifest, logger=self.logger
+                )
+                unique = self._drop_duplicates(folder, fresh)
+                if self.compactor is not None:
+                    unique = self._compact(folder, unique)
+                    # Compacted images can have new names, claimed as well
+                    renamed = self.manifest.claim([p for p in unique if p not in fresh])
+                    claimed += renamed
+                    unique = [p for p in unique if p in fresh or p in renamed]
+                for path in unique:
+                    jobs.append((path, subfolder_id))
+                    rooms[path] = room
+
+            if not jobs:
+                return {}
+            uploaded = upload_many(
+                self.drive, jobs, workers=self.workers, logger=self.logger
+            )
+            self.manifest.record_uploads(
+                [(rooms[path], path, drive_id) for path, drive_id in uploaded.items()]
+            )
+        finally:
+            self.manifest.release(claimed)
+            self._close_old_indexes()
+        if self.compactor is not None:
+            self.compactor.discard_originals(list(uploaded))
+        return uploaded
@@ -0,0 +1,238 @@
+# local record of what has been uploaded, so sync does not list Drive every run
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+MANIFEST_FILENAME = ".upload_manifest.sqlite"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+RECONCILE_PAGE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def file_md5(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """MD5 of a file, comparable with Drive's `md5Checksum`."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadManifest:
+    """
+    Persistent manifest of uploaded files and Drive folder IDs.
+
+    Records each uploaded file's room, name, size, MD5 and Drive ID, plus the
+    IDs of the Drive folders they live in, in `.upload_manifest.sqlite` under
+    the output folder. Sync then only needs a local set difference;
+    `reconcile` periodically re-lists Drive (paginated) to catch drift such
+    as files deleted or added remotely.
+
+    Jobs that change or upload a file first `claim` its path, so two jobs
+    sharing the manifest never work on the same file at once. Claims are
+    held in memory only.
+
+    Example:
+        manifest = UploadManifest(output_folder)
+        sync_to_google_drive(drive, manifest=manifest)
+    """
+
+    def __init__(self, folder: str):
+        self.path = os.path.join(folder, MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._claims = set()  # paths a job is working on right now
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        # Small frequent commits: WAL avoids rewriting a rollback journal
+        # and an fsync for each of them
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "room TEXT, name TEXT, size INTEGER, md5 TEXT, drive_id TEXT, "
+                "uploaded_at REAL, PRIMARY KEY (room, name))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS folders (key TEXT PRIMARY KEY, drive_id TEXT)"
+            )
+
+    def uploaded_names(self, room: str) -> set:
+        """Names of every file recorded as uploaded for `room`."""
+        with self._lock:
+            rows = self.conn.execute("SELECT name FROM uploads WHERE room = ?", (room,))
+            return {name for (name,) in rows}
+
+    def is_uploaded(self, room: str, name: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM uploads WHERE room = ? AND name = ?", (room, name)
+            ).fetchone()
+        return row is not None
+
+    def record_uploads(self, uploads: list, checksums: dict = None) -> None:
+        """
+        Record finished uploads.
+
+        Args:
+            uploads (list): (room, local path, Drive ID) tuples.
+            checksums (dict): Optional local paths mapped to MD5s already known,
+                so those files are not read again.
+        """
+        now = time.time()
+        checksums = checksums or {}
+        rows = [
+            (
+                room,
+                os.path.basename(path),
+                os.path.getsize(path),
+                checksums.get(path) or file_md5(path),
+                drive_id,
+                now,
+            )
+            for room, path, drive_id in uploads
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def claim(self, paths: list) -> list:
+        """
+        Claim files for the calling job until it calls `release`.
+
+        Returns:
+            list: The paths in `paths` no other job had claimed, in order.
+                The caller must leave the others alone.
+        """
+        with self._lock:
+            free = [path for path in dict.fromkeys(paths) if path not in self._claims]
+            self._claims.update(free)
+        return free
+
+    def release(self, paths: list) -> None:
+        with self._lock:
+            self._claims.difference_update(paths)
+
+    def folder_id(self, key: str) -> str:
+        """Cached Drive folder ID for `key`, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT drive_id FROM folders WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_folder_id(self, key: str, drive_id: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?)", (key, drive_id)
+            )
+
+    def reconcile(
+        self,
+        drive,
+        parent_folder_id: str,
+        page_size: int = RECONCILE_PAGE_SIZE,
+        logger: logging.Logger = None,
+    ) -> dict:
+        """
+        Bring the manifest in line with what is actually in Drive.
+
+        Lists every room folder under `parent_folder_id` page by page, adds
+        remote files missing from the manifest, and drops entries (and cached
+        room folder IDs) that no longer exist remotely so they are uploaded again.
+        Entries recorded after a room's listing started, and files a job has
+        claimed, are never dropped: their uploads may have finished after the
+        listing was taken.
+
+        Args:
+            drive: An authenticated Google Drive instance.
+            parent_folder_id: The ID of the photo folder in Google Drive.
+            page_size: Files requested per listing page.
+
+        Returns:
+            dict: Counts of "added" and "removed" manifest entries.
+        """
+        if logger is None:
+            logger = logging.getLogger(__name__)
+        rooms = {}
+        started = time.time()
+        query = (
+            f"'{parent_folder_id}' in parents and mimeType='{FOLDER_MIME_TYPE}' "
+            "and trashed=false"
+        )
+        for page in drive.ListFile({"q": query, "maxResults": page_size}):
+            for folder in page:
+                rooms[folder["title"]] = folder["id"]
+
+        added = removed = 0
+        now = time.time()
+        for room, room_id in rooms.items():
+            listed_at = time.time()
+            remote = {}
+            query = f"'{room_id}' in parents and trashed=false"
+            for page in drive.ListFile({"q": query, "maxResults": page_size}):
+                for item in page:
+                    remote[item["title"]] = item
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO folders VALUES (?, ?)", (room, room_id)
+                )
+                local = {
+                    name: (drive_id, uploaded_at)
+                    for name, drive_id, uploaded_at in self.conn.execute(
+                        "SELECT name, drive_id, uploaded_at FROM uploads WHERE room = ?",
+                        (room,),
+                    )
+                }
+                claimed = {os.path.basename(path) for path in self._claims}
+                missing = [
+                    (
+                        room,
+                        name,
+                        int(item.get("fileSize") or 0),
+                        item.get("md5Checksum"),
+                        item["id"],
+                        now,
+                    )
+                    for name, item in remote.items()
+                    if local.get(name, (None,))[0] != item["id"]
+                ]
+                gone = [
+                    (room, name)
+                    for name, (_, uploaded_at) in local.items()
+                    if name not in remote
+                    and name not in claimed
+                    and (uploaded_at or 0) < listed_at
+                ]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?)", missing
+                )
+                self.conn.executemany(
+                    "DELETE FROM uploads WHERE room = ? AND name = ?", gone
+                )
+            added += len(missing)
+            removed += len(gone)
+
+        with self._lock, self.conn:
+            stale_rooms = [
+                (key,)
+                for (key,) in self.conn.execute("SELECT key FROM folders")
+                if not key.startswith("/") and key not in rooms
+            ]
+            self.conn.executemany("DELETE FROM folders WHERE key = ?", stale_rooms)
+            self.conn.executemany(
+                "DELETE FROM uploads WHERE room = ? AND uploaded_at < ?",
+                [(key, started) for (key,) in stale_rooms],
+            )
+        logger.info(
+            f"Reconciled manifest with Drive: {len(rooms)} folders, "
+            f"{added} entries added, {removed} removed"
+        )
+        return {"added": added, "removed": removed}
+
+    def close(self) -> None:
+        self.conn.close()
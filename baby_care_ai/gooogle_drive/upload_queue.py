@@ -0,0 +1,338 @@
+# durable upload queue: survives Drive outages and restarts, drains at a set rate
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+
+from baby_care_ai import metrics
+from baby_care_ai.gooogle_drive.drive_utils import (
+    RateLimiter,
+    is_permanent_error,
+    photo_folder_id,
+    room_folder_id,
+    upload_file,
+)
+
+QUEUE_FILENAME = ".upload_queue.sqlite"
+MEMORY_SIZE = (
+    256  # queued items (with their bytes) held in memory; the rest spill to disk
+)
+DRAIN_RATE = 5.0  # uploads per second once Drive is reachable
+RETRY_BASE = 5.0  # seconds before the first retry after a failed upload
+RETRY_MAX = 300.0
+MAX_ATTEMPTS = 20  # failed uploads of one item before it is dead-lettered (over an hour at RETRY_MAX)
+
+logger = logging.getLogger(__name__)
+
+
+class DurableUploadQueue:
+    """
+    FIFO of files waiting for Drive, journaled in SQLite.
+
+    Every `put` is written to `.upload_queue.sqlite` first, so nothing is
+    lost if Drive is down for hours or the process restarts. Up to
+    `memory_size` items, with their bytes when the caller has them, are also
+    kept in memory; anything beyond that spills to disk only and is read
+    back from the journal (and the file) when the queue reaches it.
+
+    A worker thread uploads from the head of the queue at no more than
+    `drain_rate` files per second. When an upload fails (network down,
+    expired auth, retries inside `upload_file` exhausted) the item stays
+    at the head and the whole queue waits with exponential backoff, so an
+    outage costs one probe per backoff interval instead of one failure per
+    file. Finished uploads are recorded in `manifest`. The head item is
+    claimed in `manifest` while it uploads; while another job holds it, the
+    queue waits for that job instead of uploading the file a second time.
+
+    An item that keeps failing must not hold up the queue forever. After
+    `max_attempts` failed uploads, or at once when Drive rejects it for
+    good (`is_permanent_error`, e.g. a 400), it is moved to the
+    `dead_letters` table. Dead-lettered files are not queued again until
+    `retry_dead_letters` is called.
+
+    Example:
+        queue = DurableUploadQueue(output_folder, drive, manifest=catalog)
+        queue.start()
+        queue.put_many(catalog.pending_uploads(kept_only=True))
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        drive,
+        manifest=None,
+        memory_size: int = MEMORY_SIZE,
+        drain_rate: float = DRAIN_RATE,
+        retry_base: float = RETRY_BASE,
+        retry_max: float = RETRY_MAX,
+        max_attempts: int = MAX_ATTEMPTS,
+        logger: logging.Logger = None,
+    ):
+        self.path = os.path.join(folder, QUEUE_FILENAME)
+        self.drive = drive
+        self.manifest = manifest
+        self.memory_size = memory_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger(__name__)
+        self.limiter = RateLimiter(min_interval=1.0 / drain_rate if drain_rate else 0)
+        self.stats = {"uploaded": 0, "failures": 0, "spilled": 0, "dead_lettered": 0}
+        self.failures = 0  # consecutive failed attempts
+        self.resume_at = 0.0
+        self._memory = deque()  # (id, room, path, data)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._parent_id = None
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, room TEXT, path TEXT UNIQUE, "
+                "attempts INTEGER DEFAULT 0, last_error TEXT, enqueued_at REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS queue_room ON queue (room)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letters ("
+                "path TEXT PRIMARY KEY, room TEXT, attempts INTEGER, last_error TEXT, failed_at REAL)"
+            )
+        self._size = self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def put(self, room: str, path: str, data: bytes = None) -> None:
+        """Queue one file; `data` saves reading it back if it stays in memory."""
+        self.put_many([(room, path)], {path: data} if data is not None else None)
+
+    def put_many(self, items: list, data: dict = None) -> None:
+        """
+        Queue several files; files already queued or dead-lettered are ignored.
+
+        Args:
+            items (list): (room, path) tuples.
+            data (dict): Optional paths mapped to their bytes.
+        """
+        data = data or {}
+        now = time.time()
+        with self._lock:
+            added = []
+            with self.conn:
+                for room, path in items:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO queue (room, path, enqueued_at) "
+                        "SELECT ?, ?, ? WHERE NOT EXISTS "
+                        "(SELECT 1 FROM dead_letters WHERE path = ?)",
+                        (room, path, now, path),
+                    )
+                    if cursor.rowcount:
+                        added.append((cursor.lastrowid, room, path))
+            for row_id, room, path in added:
+                # New items join memory only while nothing has spilled, so the
+                # in-memory items are always the head of the journal
+                if self._size == len(self._memory) and self._size < self.memory_size:
+                    self._memory.append((row_id, room, path, data.get(path)))
+                else:
+                    self.stats["spilled"] += 1
+                    metrics.counter(
+                        "upload_queue_spilled_total", "Queued uploads spilled to disk"
+                    ).inc()
+                self._size += 1
+        if added:
+            self._wake.set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def queued_names(self, room: str) -> set:
+        """File names still waiting to be uploaded for `room`."""
+        with self._lock:
+            rows = self.conn.execute("SELECT path FROM queue WHERE room = ?", (room,))
+            return {os.path.basename(path) for (path,) in rows}
+
+    def dead_letters(self) -> list:
+        """(room, path, attempts, last error) of every dead-lettered file, oldest first."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT room, path, attempts, last_error FROM dead_letters ORDER BY failed_at"
+            ).fetchall()
+
+    def retry_dead_letters(self) -> int:
+        """
+        Queue every dead-lettered file again, e.g. once the cause is fixed.
+
+        Returns:
+            int: Number of files queued again.
+        """
+        with self._lock, self.conn:
+            items = self.conn.execute("SELECT room, path FROM dead_letters").fetchall()
+            self.conn.execute("DELETE FROM dead_letters")
+        self.put_many(items)
+        return len(items)
+
+    def _refill(self) -> None:
+        """Load the next items from the journal once memory has drained."""
+        with self._lock:
+            if self._memory:
+                return
+            rows = self.conn.execute(
+                "SELECT id, room, path FROM queue ORDER BY id LIMIT ?",
+                (self.memory_size,),
+            ).fetchall()
+            self._memory.extend(
+                (row_id, room, path, None) for row_id, room, path in rows
+            )
+
+    def _remove(self, row_id: int) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM queue WHERE id = ?", (row_id,))
+            if self._memory and self._memory[0][0] == row_id:
+                self._memory.popleft()
+            self._size -= 1
+
+    def _dead_letter(self, row_id: int, room: str, path: str, error: Exception) -> None:
+        with self._lock, self.conn:
+            (attempts,) = self.conn.execute(
+                "SELECT attempts FROM queue WHERE id = ?", (row_id,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO dead_letters (path, room, attempts, last_error, failed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, room, attempts + 1, str(error), time.time()),
+            )
+        self._remove(row_id)
+        self.stats["dead_lettered"] += 1
+        metrics.counter(
+            "upload_queue_dead_letters_total", "Queued uploads given up on"
+        ).inc()
+        self.logger.error(
+            f"Giving up on uploading {path} after {attempts + 1} attempts: {error}"
+        )
+
+    def _fail(self, row_id: int, room: str, path: str, error: Exception) -> bool:
+        """
+        Record a failed upload of the head item.
+
+        Returns:
+            bool: True if the item was dead-lettered and the next one can be
+                tried at once, False if the queue is paused.
+        """
+        if is_permanent_error(error):
+            self._dead_letter(row_id, room, path, error)
+            return True
+        with self._lock:
+            (attempts,) = self.conn.execute(
+                "SELECT attempts FROM queue WHERE id = ?", (row_id,)
+            ).fetchone()
+        if attempts + 1 >= self.max_attempts:
+            self._dead_letter(row_id, room, path, error)
+            return True
+        self.failures += 1
+        self.stats["failures"] += 1
+        metrics.counter("upload_queue_failures_total", "Failed queued uploads").inc()
+        delay = min(self.retry_max, self.retry_base * 2 ** (self.failures - 1))
+        self.resume_at = time.monotonic() + delay
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE queue SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (str(error), row_id),
+            )
+        self.logger.warning(
+            f"Upload queue paused for {delay:.1f}s after failure {self.failures} ({error})"
+        )
+        return False
+
+    def _upload(self, room: str, path: str, data: bytes) -> str:
+        if not self._parent_id:
+            self._parent_id = photo_folder_id(
+                self.drive, self.manifest, logger=self.logger
+            )
+            if not self._parent_id:
+                raise RuntimeError("Photo folder not found in Google Drive")
+        folder_id = room_folder_id(
+            self.drive, self._parent_id, room, self.manifest, logger=self.logger
+        )
+        return upload_file(
+            self.drive,
+            path,
+            folder_id,
+            limiter=self.limiter,
+            logger=self.logger,
+            data=data,
+        )
+
+    def drain_once(self) -> bool:
+        """
+        Try to upload the item at the head of the queue.
+
+        Returns:
+            bool: False if the queue is empty or paused after a failure.
+                An item that was dead-lettered returns True: the next one
+                is tried without waiting.
+        """
+        if time.monotonic() < self.resume_at:
+            return False
+        self._refill()
+        with self._lock:
+            if not self._memory:
+                return False
+            row_id, room, path, data = self._memory[0]
+        name = os.path.basename(path)
+        if not os.path.exists(path):
+            self.logger.warning(f"Dropping {path} from the upload queue: file is gone")
+            self._remove(row_id)
+            return True
+        if self.manifest is not None and not self.manifest.claim([path]):
+            return False  # another job is uploading it; retried on the next wake-up
+        try:
+            if self.manifest is not None and self.manifest.is_uploaded(room, name):
+                self._remove(row_id)
+                return True
+            try:
+                drive_id = self._upload(room, path, data)
+            except Exception as e:
+                return self._fail(row_id, room, path, e)
+            if self.manifest is not None:
+                checksums = (
+                    {path: hashlib.md5(data).hexdigest()} if data is not None else None
+                )
+                self.manifest.record_uploads([(room, path, drive_id)], checksums)
+        finally:
+            if self.manifest is not None:
+                self.manifest.release([path])
+        self._remove(row_id)
+        if self.failures:
+            self.logger.info(
+                f"Drive reachable again, draining {len(self)} queued uploads"
+            )
+        self.failures = 0
+        self.stats["uploaded"] += 1
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.drain_once():
+                continue
+            paused_for = self.resume_at - time.monotonic()
+            self._wake.wait(timeout=paused_for if paused_for > 0 else 1.0)
+            self._wake.clear()
+
+    def start(self) -> None:
+        metrics.gauge(
+            "queue_depth", "Items waiting in each in-process queue"
+        ).set_function(self.__len__, queue="upload_backlog")
+        self._thread = threading.Thread(
+            target=self._run, name="upload-queue", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.conn.close()
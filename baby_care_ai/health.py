@@ -0,0 +1,166 @@
+# device health: per-camera circuit breakers with exponential cool-off and probes
+import threading
+import time
+import logging
+
+from baby_care_ai import metrics
+
+FAILURE_THRESHOLD = 3  # consecutive failures that open a device's circuit
+COOLOFF = 60.0  # seconds a circuit stays open the first time
+MAX_COOLOFF = 30 * 60.0  # cap for the doubling cool-off
+CAPTURE_DEADLINE = 30.0  # seconds allowed per device per capture, retries included
+
+CLOSED = "closed"  # healthy: captured every cycle
+OPEN = "open"  # failing: skipped until its cool-off ends
+HALF_OPEN = "half_open"  # cool-off over: one probe capture decides
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+
+class HealthRegistry:
+    """
+    Track every capture device's health and skip the ones that keep failing.
+
+    Devices are keyed like the cluster's camera keys, `blink:<name>` and
+    `rpi:<device number>`. After `failure_threshold` consecutive failures
+    (errors or missed deadlines) a device's circuit opens and `allow`
+    returns False for a cool-off that starts at `cooloff` seconds and
+    doubles every time the circuit opens again, up to `max_cooloff`. Once
+    the cool-off is over the circuit is half-open: the next cycle sends one
+    probe capture, which closes the circuit on success or reopens it on
+    failure. So a dead Pi costs one probe per cool-off instead of a
+    connect timeout every cycle.
+
+    `status` returns a snapshot for the metrics server's `/health` page.
+
+    Example:
+        health = HealthRegistry()
+        pool = RPiCapturePool(health=health)
+        collector = BlinkCollector(health=health)
+        health.status()["rpi:1"]["state"]
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooloff: float = COOLOFF,
+        max_cooloff: float = MAX_COOLOFF,
+        clock=time.monotonic,
+        logger: logging.Logger = None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooloff = cooloff
+        self.max_cooloff = max_cooloff
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def _device(self, device: str) -> dict:
+        state = self._devices.get(device)
+        if state is None:
+            state = self._devices[device] = {
+                "state": CLOSED,
+                "failures": 0,  # consecutive
+                "opened": 0,  # times the circuit opened since the last success
+                "retry_at": None,
+                "probing": False,
+                "last_error": None,
+                "last_success": None,
+                "last_latency": None,
+            }
+        return state
+
+    def _set_state(self, device: str, state: dict, new_state: str) -> None:
+        state["state"] = new_state
+        metrics.gauge("device_health_state", "0 closed, 1 half-open, 2 open").set(
+            STATE_VALUES[new_state], device=device
+        )
+
+    def allow(self, device: str) -> bool:
+        """
+        Whether to capture `device` this cycle.
+
+        A half-open device is allowed once, as the probe; it is not allowed
+        again until that probe is recorded.
+        """
+        with self._lock:
+            state = self._device(device)
+            if state["state"] == CLOSED:
+                return True
+            if state["state"] == OPEN and self.clock() >= state["retry_at"]:
+                self._set_state(device, state, HALF_OPEN)
+                state["probing"] = False
+            if state["state"] == HALF_OPEN and not state["probing"]:
+                state["probing"] = True
+                self.logger.info(f"Probing {device} after its cool-off")
+                return True
+        metrics.counter(
+            "captures_skipped_total", "Captures skipped by an open circuit"
+        ).inc(device=device)
+        return False
+
+    def filter(self, devices) -> list:
+        """The devices in `devices` that `allow` lets through, in order."""
+        return [device for device in devices if self.allow(device)]
+
+    def record_success(self, device: str, latency: float = None) -> None:
+        with self._lock:
+            state = self._device(device)
+            if state["state"] != CLOSED:
+                self.logger.info(f"{device} recovered, closing its circuit")
+                self._set_state(device, state, CLOSED)
+            state.update(
+                failures=0,
+                opened=0,
+                retry_at=None,
+                probing=False,
+                last_success=time.time(),
+                last_latency=latency,
+            )
+
+    def record_failure(self, device: str, error: str = None) -> None:
+        with self._lock:
+            state = self._device(device)
+            state["failures"] += 1
+            state["last_error"] = error
+            state["probing"] = False
+            if state["state"] == HALF_OPEN or (
+                state["state"] == CLOSED and state["failures"] >= self.failure_threshold
+            ):
+                cooloff = min(self.max_cooloff, self.cooloff * 2 ** state["opened"])
+                state["opened"] += 1
+                state["retry_at"] = self.clock() + cooloff
+                self._set_state(device, state, OPEN)
+                metrics.counter("circuit_opens_total", "Device circuits opened").inc(
+                    device=device
+                )
+                self.logger.warning(
+                    f"{device} failed {state['failures']} times in a row ({error}), "
+                    f"skipping it for {cooloff:.0f}s"
+                )
+
+    def state(self, device: str) -> str:
+        with self._lock:
+            return self._device(device)["state"]
+
+    def status(self) -> dict:
+        """Every device's state, consecutive failures, last error and seconds until its next probe."""
+        now = self.clock()
+        with self._lock:
+            return {
+                device: {
+                    "state": state["state"],
+                    "failures": state["failures"],
+                    "last_error": state["last_error"],
+                    "last_success": state["last_success"],
+                    "last_latency": state["last_latency"],
+                    "retry_in": (
+                        round(max(0.0, state["retry_at"] - now), 1)
+                        if state["state"] == OPEN
+                        else None
+                    ),
+                }
+                for device, state in sorted(self._devices.items())
+            }
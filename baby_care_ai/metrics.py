@@ -0,0 +1,307 @@
+# in-process metrics: counters, gauges, histograms, timing spans, Prometheus/JSON export
+import bisect
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+NAMESPACE = "baby_care"  # prefix of every exported metric name
+# Seconds; spans range from sub-millisecond hashing to multi-minute Drive syncs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+logger = logging.getLogger(__name__)
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        """(label key, value) pairs."""
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(Counter):
+    """A value that goes up and down, set directly or read from a callback on export."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str = ""):
+        super().__init__(name, help)
+        self._functions = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, func, **labels) -> None:
+        """Report `func()` at export time, e.g. the length of a queue."""
+        with self._lock:
+            self._functions[_key(labels)] = func
+
+    def samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            try:
+                values[key] = func()
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} callback failed: {e}")
+        return list(values.items())
+
+
+class Histogram:
+    """Observations counted into fixed buckets, with their count and sum, per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [per-bucket counts (last is +Inf), count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def samples(self) -> list:
+        """(label key, {"buckets": cumulative counts by bound, "count", "sum"}) pairs."""
+        with self._lock:
+            items = [
+                (key, list(counts), count, total)
+                for key, (counts, count, total) in self._values.items()
+            ]
+        samples = []
+        for key, counts, count, total in items:
+            cumulative, running = {}, 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                cumulative[bound] = running
+            samples.append((key, {"buckets": cumulative, "count": count, "sum": total}))
+        return samples
+
+
+class Registry:
+    """
+    Named metrics for the whole process.
+
+    Metrics are created on first use, so instrumented code only names them:
+    `REGISTRY.counter("captures_total").inc(camera="nursery")`. Updates are a
+    dict lookup under a per-metric lock, cheap enough to leave on in the
+    capture and upload hot paths.
+    """
+
+    def __init__(self, namespace: str = NAMESPACE):
+        self.namespace = namespace
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is a {metric.kind}, not a {cls.kind}")
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(
+        self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Time the enclosed block into the `<name>_seconds` histogram.
+
+        The duration is recorded whether or not the block raises; failures
+        are also counted in `<name>_errors_total`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.counter(f"{name}_errors_total", f"Failed {name} spans").inc(**labels)
+            raise
+        finally:
+            self.histogram(f"{name}_seconds", f"Duration of {name}").observe(
+                time.perf_counter() - start, **labels
+            )
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in sorted(list(self._metrics.values()), key=lambda m: m.name):
+            name = self._full_name(metric.name)
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in metric.samples():
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                for bound, count in value["buckets"].items():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(
+                        f"{name}_bucket{_format_labels(key, (('le', le),))} {count}"
+                    )
+                lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Every metric as plain JSON-serialisable data."""
+        metrics = {}
+        for metric in sorted(list(self._metrics.values()), key=lambda m: m.name):
+            samples = []
+            for key, value in metric.samples():
+                sample = {"labels": dict(key)}
+                if metric.kind == "histogram":
+                    sample.update(
+                        count=value["count"],
+                        sum=value["sum"],
+                        buckets={
+                            ("+Inf" if bound == float("inf") else str(bound)): count
+                            for bound, count in value["buckets"].items()
+                        },
+                    )
+                else:
+                    sample["value"] = value
+                samples.append(sample)
+            metrics[self._full_name(metric.name)] = {
+                "type": metric.kind,
+                "help": metric.help,
+                "samples": samples,
+            }
+        return {"timestamp": time.time(), "metrics": metrics}
+
+    def write_snapshot(self, path: str) -> None:
+        """Write `snapshot()` to `path` atomically, so readers never see a partial file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+span = REGISTRY.span
+
+
+def _handler_class(registry: Registry, pages: dict = None):
+    from http.server import BaseHTTPRequestHandler
+
+    pages = dict(pages or {})
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                body = registry.render_prometheus().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(registry.snapshot()).encode()
+                content_type = "application/json"
+            elif path in pages:
+                body = json.dumps(pages[path]()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood automation.log
+
+    return MetricsHandler
+
+
+def serve(
+    port: int,
+    host: str = "127.0.0.1",
+    registry: Registry = REGISTRY,
+    logger: logging.Logger = None,
+    pages: dict = None,
+):
+    """
+    Serve `/metrics` (Prometheus text) and `/metrics.json` from a daemon thread.
+
+    `pages` maps extra paths to functions returning JSON-serializable data,
+    e.g. `{"/health": health.status}`. Binds to localhost by default; call
+    `shutdown()` on the returned `ThreadingHTTPServer` to stop it.
+    """
+    from http.server import ThreadingHTTPServer
+
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    server = ThreadingHTTPServer((host, port), _handler_class(registry, pages))
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -1 +1,268 @@
+"""
+Embedding-based semantic dedup (CPU only).
+
+The embedding model is loaded lazily, exactly once per process, and kept
+warm for later calls. If torchvision is installed a pretrained
+MobileNetV3-Small is used as the feature extractor; otherwise a
+deterministic fallback extractor (a 16x16 grayscale thumbnail plus a
+coarse colour histogram) is used so that dedup still works without the
+heavy optional dependency.
+
+Embeddings for one folder are written to a memory-mapped float32 matrix
+next to the images, and near-duplicates are found with a random-hyperplane
+LSH index over cosine similarity, verifying each candidate exactly.
+"""
 # load vision embedding model for deduplication
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_THRESHOLD = 0.97  # cosine similarity at or above which images are duplicates
+EMBEDDINGS_FILENAME = ".embeddings.npy"
+LSH_TABLES = 8
+LSH_BITS = 12
+
+logger = logging.getLogger(__name__)
+
+_model = None
+_model_lock = threading.Lock()
+
+
+class FallbackExtractor:
+    """Deterministic feature extractor: grayscale thumbnail plus colour histogram."""
+
+    name = "fallback"
+    dim = 16 * 16 + 4 * 4 * 4
+    parameter_bytes = 0
+
+    def __call__(self, images: list) -> np.ndarray:
+        features = np.empty((len(images), self.dim), dtype=np.float32)
+        for i, img in enumerate(images):
+            gray = np.asarray(img.convert("L").resize((16, 16)), dtype=np.float32)
+            gray = (gray - gray.mean()).ravel()
+            rgb = np.asarray(img.convert("RGB").resize((64, 64))) // 64
+            bins = (rgb[..., 0] * 16 + rgb[..., 1] * 4 + rgb[..., 2]).ravel()
+            histogram = np.bincount(bins, minlength=64).astype(np.float32)
+            features[i] = np.concatenate([gray / 255.0, histogram / bins.size])
+        return features
+
+
+class TorchvisionExtractor:
+    """MobileNetV3-Small without its classifier head, run on the CPU."""
+
+    name = "mobilenet_v3_small"
+    dim = 576
+
+    def __init__(self):
+        import torch
+        from torchvision.models import MobileNet_V3_Small_Weights, mobilenet_v3_small
+
+        weights = MobileNet_V3_Small_Weights.DEFAULT
+        model = mobilenet_v3_small(weights=weights)
+        model.classifier = torch.nn.Identity()
+        self.model = model.eval()
+        self.preprocess = weights.transforms()
+        self.torch = torch
+        self.parameter_bytes = sum(
+            p.numel() * p.element_size() for p in model.parameters()
+        )
+
+    def __call__(self, images: list) -> np.ndarray:
+        batch = self.torch.stack(
+            [self.preprocess(img.convert("RGB")) for img in images]
+        )
+        with self.torch.inference_mode():
+            return self.model(batch).numpy().astype(np.float32)
+
+
+def load_embedding_model(backend: str = "auto", logger: logging.Logger = None):
+    """
+    Return the process-wide embedding model, loading it on first use.
+
+    Args:
+        backend (str): "auto" tries torchvision and falls back to the deterministic
+            extractor if it is missing or its weights cannot be loaded (e.g. offline);
+            "fallback" always uses the deterministic extractor.
+        logger (logging.Logger): Optional logger for output.
+    """
+    global _model
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    with _model_lock:
+        if _model is not None:
+            return _model
+        if backend == "auto":
+            try:
+                _model = TorchvisionExtractor()
+            except ImportError:
+                logger.info("torchvision not installed, using fallback extractor")
+            except Exception as e:
+                logger.warning(
+                    f"Could not load torchvision model ({e!r}), "
+                    "using fallback extractor"
+                )
+        if _model is None:
+            _model = FallbackExtractor()
+        logger.info(f"Loaded embedding model: {_model.name} ({_model.dim} dims)")
+        return _model
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes, or 0 where it is unknown."""
+    try:
+        import resource
+    except ImportError:  # Unix only
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def embed_images(
+    image_paths: list,
+    output_path: str = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    logger: logging.Logger = None,
+) -> tuple:
+    """
+    Embed images in batches into an L2-normalised float32 matrix.
+
+    Args:
+        image_paths (list): Paths of the images to embed.
+        output_path (str): Optional `.npy` path; the matrix is memory-mapped there
+            instead of held in RAM.
+        batch_size (int): Images decoded and embedded per model call.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        tuple: (matrix with one row per embedded image, list of the embedded paths).
+            Unreadable images are logged and skipped.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    model = load_embedding_model(logger=logger)
+    shape = (len(image_paths), model.dim)
+    if output_path is not None:
+        matrix = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=np.float32, shape=shape
+        )
+    else:
+        matrix = np.empty(shape, dtype=np.float32)
+
+    embedded = []
+    start = time.perf_counter()
+    for offset in range(0, len(image_paths), batch_size):
+        images, paths = [], []
+        for image_path in image_paths[offset : offset + batch_size]:
+            try:
+                with Image.open(image_path) as img:
+                    img.draft("RGB", (224, 224))
+                    images.append(img.copy())
+                paths.append(image_path)
+            except Exception as e:
+                logger.error(f"Error processing {image_path}: {e}")
+        if not images:
+            continue
+        features = model(images)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        matrix[len(embedded) : len(embedded) + len(paths)] = features / np.maximum(
+            norms, 1e-12
+        )
+        embedded.extend(paths)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = _peak_rss()
+    logger.info(
+        f"Embedded {len(embedded)} images in {elapsed:.2f}s "
+        f"({len(embedded) / max(elapsed, 1e-9):.1f} images/s); "
+        f"matrix {matrix.nbytes / 1e6:.1f} MB, "
+        f"model {model.parameter_bytes / 1e6:.1f} MB"
+        + (f", peak RSS {peak_rss / 1e6:.0f} MB" if peak_rss else "")
+    )
+    return matrix[: len(embedded)], embedded
+
+
+class CosineLSH:
+    """
+    Approximate nearest-neighbour index for unit vectors (random-hyperplane LSH).
+
+    Each of `tables` hash tables buckets a vector by the signs of its dot
+    products with `bits` random hyperplanes; vectors with high cosine
+    similarity share a bucket in at least one table with high probability.
+    """
+
+    def __init__(
+        self, dim: int, tables: int = LSH_TABLES, bits: int = LSH_BITS, seed: int = 0
+    ):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((tables, bits, dim)).astype(np.float32)
+        self.weights = 1 << np.arange(bits)
+        self.buckets = [{} for _ in range(tables)]
+        self.vectors = []
+
+    def _keys(self, vector: np.ndarray) -> list:
+        signs = (self.planes @ vector) > 0
+        return [int(k) for k in signs @ self.weights]
+
+    def add(self, vector: np.ndarray) -> None:
+        item = len(self.vectors)
+        self.vectors.append(vector)
+        for table, key in zip(self.buckets, self._keys(vector)):
+            table.setdefault(key, []).append(item)
+
+    def find_within(self, vector: np.ndarray, threshold: float):
+        """Return the index of a stored vector with cosine >= `threshold`, or None."""
+        candidates = set()
+        for table, key in zip(self.buckets, self._keys(vector)):
+            candidates.update(table.get(key, ()))
+        for item in candidates:
+            if float(self.vectors[item] @ vector) >= threshold:
+                return item
+        return None
+
+
+def find_embedding_duplicates(
+    image_paths: list,
+    threshold: float = EMBEDDING_THRESHOLD,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    logger: logging.Logger = None,
+) -> list:
+    """
+    Greedily mark images whose embedding is within `threshold` cosine similarity
+    of an earlier kept image.
+
+    Args:
+        image_paths (list): Paths of one folder's images, in capture order.
+        threshold (float): Cosine similarity at or above which two images are
+            duplicates.
+        batch_size (int): Images embedded per model call.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        list: Paths of the duplicate images.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if not image_paths:
+        return []
+    output_path = os.path.join(os.path.dirname(image_paths[0]), EMBEDDINGS_FILENAME)
+    try:
+        matrix, embedded = embed_images(
+            image_paths, output_path=output_path, batch_size=batch_size, logger=logger
+        )
+        index = CosineLSH(matrix.shape[1])
+        duplicates = []
+        for image_path, vector in zip(embedded, matrix):
+            if index.find_within(vector, threshold) is not None:
+                duplicates.append(image_path)
+            else:
+                index.add(np.array(vector))
+        del matrix
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    return duplicates
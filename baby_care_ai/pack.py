@@ -0,0 +1,357 @@
+# append-only image packs: one container per camera-day, with a sidecar offset index
+import mmap
+import os
+import struct
+import threading
+import logging
+
+from baby_care_ai import metrics
+from baby_care_ai.storage import camera_folders, day_folders, image_files
+
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"  # sidecar next to the pack: <day>.pack.idx
+MAGIC = b"BCAIPAK1"  # file header
+RECORD_MARK = b"IMG1"
+# record header: mark, name length, data length; followed by the name and the data
+RECORD = struct.Struct("<4sHI")
+
+logger = logging.getLogger(__name__)
+
+_pack_locks = {}
+_pack_locks_guard = threading.Lock()
+
+
+def pack_lock(path: str) -> threading.Lock:
+    """
+    The lock that serialises appending to a pack with uploading it.
+
+    `pack_captures` holds it while it appends and `upload_packs` while it
+    uploads and records the pack, so nothing is appended to a pack during
+    its upload, and once it is recorded, every image in its index is on
+    Drive.
+    """
+    with _pack_locks_guard:
+        return _pack_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def pack_path(folder: str) -> str:
+    """The pack of a day folder: <camera>/<YYYYMMDD>/<YYYYMMDD>.pack."""
+    return os.path.join(
+        folder, os.path.basename(os.path.normpath(folder)) + PACK_SUFFIX
+    )
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def scan_pack(path: str, start: int = len(MAGIC)) -> tuple:
+    """
+    Rebuild a pack's index by walking its record headers.
+
+    Used when the sidecar is missing or behind the pack, e.g. after a crash
+    between writing a record and indexing it.
+
+    Args:
+        path (str): The pack file.
+        start (int): Offset of the first record to read.
+
+    Returns:
+        tuple: ({name: (data offset, data size)}, offset just past the last
+            complete record). A torn record at the end is not included.
+    """
+    entries = {}
+    end = start
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an image pack")
+        f.seek(start)
+        while end + RECORD.size <= size:
+            mark, name_len, data_len = RECORD.unpack(f.read(RECORD.size))
+            data_offset = end + RECORD.size + name_len
+            if mark != RECORD_MARK or data_offset + data_len > size:
+                break
+            entries[f.read(name_len).decode()] = (data_offset, data_len)
+            f.seek(data_len, os.SEEK_CUR)
+            end = data_offset + data_len
+    return entries, end
+
+
+def read_index(path: str) -> dict:
+    """
+    The {name: (offset, size)} index of a pack, from its sidecar.
+
+    Falls back to `scan_pack` for records the sidecar does not cover, so a
+    pack copied without its sidecar is still readable. Sidecar entries that
+    end past the pack are dropped: the pack is only fsynced on close, so
+    after a power cut the sidecar can list records that never reached disk.
+    """
+    entries = {}
+    pack_size = os.path.getsize(path)
+    if os.path.exists(index_path(path)):
+        with open(index_path(path)) as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 3:
+                    offset, size = int(parts[1]), int(parts[2])
+                    if offset + size <= pack_size:
+                        entries[parts[0]] = (offset, size)
+    indexed_end = max(
+        (offset + size for offset, size in entries.values()), default=len(MAGIC)
+    )
+    if indexed_end < pack_size:
+        scanned, _ = scan_pack(path, indexed_end)
+        entries.update(scanned)
+    return entries
+
+
+def packed_names(folder: str) -> set:
+    """Names of the images in a day folder's pack (empty if it has none)."""
+    path = pack_path(folder)
+    return set(read_index(path)) if os.path.exists(path) else set()
+
+
+class PackWriter:
+    """
+    Append images to a camera-day pack.
+
+    Each image is written as a small header, its name and its bytes, and
+    its data offset and size are appended to the `.idx` sidecar. Nothing
+    is ever rewritten: reopening a pack repairs it by indexing records the
+    sidecar missed, forgetting sidecar entries past the end of the pack and
+    truncating a torn record at the end.
+
+    Example:
+        with PackWriter(pack_path(day_folder)) as pack:
+            pack.add_files(image_files(camera_folder, day))
+    """
+
+    def __init__(self, path: str, logger: logging.Logger = None):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        if not os.path.exists(path) or os.path.getsize(path) < len(MAGIC):
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+            open(index_path(path), "w").close()
+        self.entries = read_index(path)
+        self.end = max(
+            (offset + size for offset, size in self.entries.values()),
+            default=len(MAGIC),
+        )
+        self._repair()
+        self._pack = open(path, "ab")
+        self._index = open(index_path(path), "a")
+
+    def _repair(self) -> None:
+        size = os.path.getsize(self.path)
+        if size > self.end:
+            self.logger.warning(f"Truncating torn record at the end of {self.path}")
+            os.truncate(self.path, self.end)
+        # Rewrite the sidecar if the scan found records it was missing, or
+        # it listed records past the end of the pack
+        with open(index_path(self.path)) as f:
+            indexed = sum(1 for _ in f)
+        if indexed != len(self.entries):
+            with open(index_path(self.path), "w") as f:
+                for name, (offset, length) in self.entries.items():
+                    f.write(f"{name}\t{offset}\t{length}\n")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, name: str, data: bytes) -> tuple:
+        """
+        Append one image; a name already in the pack is skipped.
+
+        Returns:
+            tuple: (data offset, data size) of the image in the pack.
+        """
+        if name in self.entries:
+            return self.entries[name]
+        encoded = name.encode()
+        self._pack.write(
+            RECORD.pack(RECORD_MARK, len(encoded), len(data)) + encoded + data
+        )
+        self._pack.flush()
+        offset = self.end + RECORD.size + len(encoded)
+        self.entries[name] = (offset, len(data))
+        self.end = offset + len(data)
+        self._index.write(f"{name}\t{offset}\t{len(data)}\n")
+        self._index.flush()
+        return self.entries[name]
+
+    def add_files(self, paths: list) -> int:
+        """
+        Append the images at `paths` that are not in the pack yet, in name order.
+
+        Returns:
+            int: Number of images appended.
+        """
+        added = 0
+        for path in sorted(paths, key=os.path.basename):
+            name = os.path.basename(path)
+            if name in self.entries:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                self.logger.error(f"Cannot pack {path}: {e}")
+                continue
+            self.append(name, data)
+            added += 1
+        return added
+
+    def close(self) -> None:
+        os.fsync(self._pack.fileno())
+        self._pack.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PackReader:
+    """
+    Read images out of a pack without extracting it.
+
+    The pack is memory-mapped and `read` slices the mapping at the offset
+    from the index, so opening a pack costs one index read and each image
+    costs one copy of its own bytes.
+
+    Example:
+        with PackReader(pack_path(day_folder)) as pack:
+            for name in pack.names():
+                data = pack.read(name)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = read_index(path)
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def names(self) -> list:
+        """Image names in the order they were packed."""
+        return sorted(self.entries, key=lambda name: self.entries[name][0])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def read(self, name: str) -> bytes:
+        """
+        The bytes of one image.
+
+        Raises:
+            KeyError: If `name` is not in the pack.
+        """
+        offset, size = self.entries[name]
+        return self._mmap[offset : offset + size]
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def pack_day(folder: str, paths: list = None, logger: logging.Logger = None) -> int:
+    """
+    Append a day folder's images to its pack.
+
+    Args:
+        folder (str): A <camera>/<YYYYMMDD> day folder.
+        paths (list): The images to pack, e.g. the captures that survived
+            dedup. Defaults to every image in the folder.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        int: Number of images appended.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if paths is None:
+        paths = image_files(os.path.dirname(folder), os.path.basename(folder))
+    with PackWriter(pack_path(folder), logger=logger) as pack:
+        added = pack.add_files(paths)
+        total = len(pack)
+    metrics.counter("packed_images_total", "Images appended to day packs").inc(added)
+    if added:
+        logger.info(
+            f"Packed {added} images into {pack_path(folder)} ({total} in total)"
+        )
+    return added
+
+
+def pack_captures(
+    root: str,
+    manifest=None,
+    catalog=None,
+    logger: logging.Logger = None,
+) -> int:
+    """
+    Append new images to the pack of every day folder whose pack is not uploaded yet.
+
+    A pack never changes once it is on Drive, so days whose pack the
+    manifest records are left alone. The check and the appends run under
+    the pack's `pack_lock`, so they cannot interleave with its upload.
+
+    Args:
+        root (str): The output folder holding one folder per camera.
+        manifest (UploadManifest): Optional upload records.
+        catalog (CaptureCatalog): When given, day folders come from the
+            catalog, which also serves as the manifest, and only the captures
+            dedup kept are packed.
+        logger (logging.Logger): Optional logger for output.
+
+    Returns:
+        int: Number of images appended.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if catalog is not None:
+        manifest = catalog
+        partitions = [(room, day) for day, room, _ in catalog.partitions()]
+    else:
+        partitions = [
+            (os.path.basename(camera_folder), day)
+            for camera_folder in camera_folders(root)
+            for day in day_folders(camera_folder)
+        ]
+    added = 0
+    uploaded = {}
+    for room, day in partitions:
+        folder = os.path.join(root, room, day)
+        if not os.path.isdir(folder):
+            continue
+        if manifest is not None:
+            if room not in uploaded:
+                uploaded[room] = manifest.uploaded_names(room)
+            if os.path.basename(pack_path(folder)) in uploaded[room]:
+                continue
+        paths = catalog.kept_paths(room, day) if catalog is not None else None
+        if paths == []:
+            continue
+        path = pack_path(folder)
+        with pack_lock(path):
+            # The pack may have been uploaded since the names were read
+            if manifest is not None and manifest.is_uploaded(
+                room, os.path.basename(path)
+            ):
+                continue
+            added += pack_day(folder, paths, logger=logger)
+    return added
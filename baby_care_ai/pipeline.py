@@ -0,0 +1,285 @@
+# streaming capture pipeline: hash and dedup frames in memory, write once, upload
+import datetime
+import hashlib
+import os
+import queue
+import threading
+import logging
+from io import BytesIO
+
+from baby_care_ai import metrics
+from baby_care_ai.blink.bktree import BKTree
+from baby_care_ai.gooogle_drive.drive_utils import (
+    UPLOAD_WORKERS,
+    RateLimiter,
+    photo_folder_id,
+    room_folder_id,
+    upload_file,
+)
+from baby_care_ai.config import load_config
+from baby_care_ai.storage import DAY_LENGTH, camera_folder_name, capture_path
+
+QUEUE_SIZE = 32  # frames held in memory per stage before producers block
+RECORD_BATCH = 64  # catalog rows written per transaction while frames keep coming
+
+logger = logging.getLogger(__name__)
+
+
+def frame_hash(data: bytes) -> str:
+    """
+    Average hash of an in-memory JPEG, as 16 hex digits.
+
+    Uses the same draft-mode decode as `batch_hash.batch_average_hashes`, so
+    the hashes are comparable with those the "batch" dedup engine stores.
+    """
+    from baby_care_ai.blink.batch_hash import hash_thumbnails, load_thumbnails
+
+    thumbnails = load_thumbnails(BytesIO(data), kinds=("average",))
+    stacked = {"average": thumbnails["average"][None]}
+    return f"{int(hash_thumbnails(stacked)['average'][0]):016x}"
+
+
+class CapturePipeline:
+    """
+    Collect -> hash -> dedup -> write -> upload without re-reading images from disk.
+
+    Collectors `submit` the JPEG bytes they receive. A hashing thread hashes
+    each frame in memory and drops it if it matches an image already kept
+    for that camera today; unique frames are written once and passed, bytes
+    included, to the upload threads, which send them to Drive from memory.
+    Both queues are bounded, so a slow disk or Drive blocks `submit` instead
+    of letting frames pile up in memory.
+
+    With a `catalog`, kept frames are recorded with their hash (so the
+    dedup job has nothing left to hash) and uploads are recorded as they
+    finish. Without a `drive`, images are only written and the sync job
+    uploads them. With a `rate` (an `AdaptiveCaptureRate`), every frame's
+    hash is also reported to it to schedule that camera's next capture.
+
+    Example:
+        pipeline = CapturePipeline(drive, catalog=catalog)
+        pipeline.start()
+        pipeline.collect_blink(blink_collector)
+        pipeline.collect_rpi(rpi_pool)
+        pipeline.stop()
+    """
+
+    def __init__(
+        self,
+        drive=None,
+        catalog=None,
+        output_folder: str = None,
+        threshold: int = 0,
+        queue_size: int = QUEUE_SIZE,
+        upload_workers: int = UPLOAD_WORKERS,
+        rate=None,
+        logger: logging.Logger = None,
+    ):
+        self.drive = drive
+        self.catalog = catalog
+        self.output_folder = output_folder or load_config().require("output_folder")
+        self.threshold = threshold
+        self.upload_workers = upload_workers if drive is not None else 0
+        self.rate = rate
+        self.logger = logger or logging.getLogger(__name__)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.uploads = queue.Queue(maxsize=queue_size)
+        self.limiter = RateLimiter()
+        self.stats = {
+            "received": 0,
+            "duplicates": 0,
+            "written": 0,
+            "uploaded": 0,
+            "failed": 0,
+        }
+        self._seen = {}  # (camera, day) -> set or BKTree of kept hashes
+        self._threads = []
+        self._lock = threading.Lock()
+        self._folder_lock = threading.Lock()  # one thread creates each Drive folder
+
+    def start(self) -> None:
+        depth = metrics.gauge("queue_depth", "Items waiting in each in-process queue")
+        depth.set_function(self.frames.qsize, queue="pipeline_frames")
+        depth.set_function(self.uploads.qsize, queue="pipeline_uploads")
+        self._threads = [
+            threading.Thread(target=self._hash_loop, name="pipeline-hash", daemon=True)
+        ]
+        self._threads += [
+            threading.Thread(
+                target=self._upload_loop, name=f"pipeline-upload-{i}", daemon=True
+            )
+            for i in range(self.upload_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Drain both queues and stop the worker threads."""
+        self.frames.put(None)
+        self._threads[0].join()
+        for _ in range(self.upload_workers):
+            self.uploads.put(None)
+        for thread in self._threads[1:]:
+            thread.join()
+        self.logger.info(f"Pipeline stopped: {self.stats}")
+
+    def submit(self, camera: str, data: bytes, timestamp: str = None) -> None:
+        """Queue one frame; blocks while the pipeline is full."""
+        if timestamp is None:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.frames.put((camera, timestamp, data))
+
+    def collect_blink(self, collector, camera_names: list = None) -> int:
+        """Capture Blink cameras (default all) into the pipeline. Returns the number of frames."""
+        frames = collector.collect(camera_names, in_memory=True)
+        for camera, timestamp, data in frames:
+            self.submit(camera, data, timestamp)
+        return len(frames)
+
+    def collect_rpi(self, pool, devices: list = None) -> int:
+        """Capture pooled Pi cameras (default all) into the pipeline. Returns the number of frames."""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        count = 0
+        for device_num, result in pool.capture_all(
+            in_memory=True, devices=devices
+        ).items():
+            if result.get("data"):
+                name = camera_folder_name(pool.devices[device_num]["name"])
+                self.submit(name, result["data"], timestamp)
+                count += 1
+        return count
+
+    def _kept(self, camera: str, day: str):
+        key = (camera, day)
+        if key not in self._seen:
+            # A new day starts a new dedup window
+            self._seen = {k: v for k, v in self._seen.items() if k[1] == day}
+            kept = (
+                self.catalog.kept_hashes(camera, day)
+                if self.catalog is not None
+                else {}
+            )
+            if self.threshold <= 0:
+                self._seen[key] = {int(h, 16) for h in kept.values()}
+            else:
+                tree = BKTree()
+                for path, h in kept.items():
+                    tree.add(int(h, 16), path)
+                self._seen[key] = tree
+        return self._seen[key]
+
+    def _is_duplicate(self, camera: str, day: str, img_hash: int, path: str) -> bool:
+        kept = self._kept(camera, day)
+        if self.threshold <= 0:
+            if img_hash in kept:
+                return True
+            kept.add(img_hash)
+            return False
+        if kept.find_within(img_hash, self.threshold) is not None:
+            return True
+        kept.add(img_hash, path)
+        return False
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+        metrics.counter(
+            "pipeline_frames_total", "Frames through the capture pipeline"
+        ).inc(outcome=key)
+
+    def _hash_loop(self) -> None:
+        kept = {}  # catalog records, written in one transaction per burst
+        while True:
+            item = self.frames.get()
+            if item is None:
+                self._record_kept(kept)
+                return
+            self._process_frame(*item, kept)
+            if len(kept) >= RECORD_BATCH or self.frames.empty():
+                self._record_kept(kept)
+
+    def _record_kept(self, kept: dict) -> None:
+        if kept and self.catalog is not None:
+            self.catalog.record_captures(list(kept), hashes=kept)
+        kept.clear()
+
+    def _process_frame(
+        self, camera: str, timestamp: str, data: bytes, kept: dict
+    ) -> None:
+        self._count("received")
+        try:
+            with metrics.span("pipeline_hash"):
+                hex_hash = frame_hash(data)
+        except Exception as e:
+            self.logger.error(f"Cannot decode frame from {camera}: {e}")
+            hex_hash = None
+        if self.rate is not None:
+            self.rate.observe(camera, hex_hash)
+        day = timestamp[:DAY_LENGTH]
+        path = os.path.join(self.output_folder, camera, day, f"{timestamp}.jpg")
+        if hex_hash is not None and self._is_duplicate(
+            camera, day, int(hex_hash, 16), path
+        ):
+            self._count("duplicates")
+            self.logger.info(f"Dropped duplicate frame from {camera} at {timestamp}")
+            return
+        try:
+            path = capture_path(self.output_folder, camera, timestamp)
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            self.logger.error(f"Cannot write {path}: {e}")
+            return
+        self._count("written")
+        kept[path] = hex_hash
+        if self.upload_workers:
+            self.uploads.put((camera, path, data))
+
+    def _upload_loop(self) -> None:
+        parent_id = None
+        done, checksums = [], {}
+        while True:
+            item = self.uploads.get()
+            if item is None:
+                self._record_uploads(done, checksums)
+                return
+            camera, path, data = item
+            if self.catalog is not None and not self.catalog.claim([path]):
+                continue  # the upload queue got to it first
+            try:
+                with self._folder_lock:
+                    if not parent_id:
+                        parent_id = photo_folder_id(
+                            self.drive, self.catalog, logger=self.logger
+                        )
+                    folder_id = room_folder_id(
+                        self.drive, parent_id, camera, self.catalog, logger=self.logger
+                    )
+                drive_id = upload_file(
+                    self.drive,
+                    path,
+                    folder_id,
+                    limiter=self.limiter,
+                    logger=self.logger,
+                    data=data,
+                )
+            except Exception as e:
+                # Left pending in the catalog for the sync job to retry
+                self._count("failed")
+                self.logger.error(f"Failed to upload {path}: {e}")
+                if self.catalog is not None:
+                    self.catalog.release([path])
+                continue
+            self._count("uploaded")
+            done.append((camera, path, drive_id))
+            checksums[path] = hashlib.md5(data).hexdigest()
+            if len(done) >= RECORD_BATCH or self.uploads.empty():
+                self._record_uploads(done, checksums)
+
+    def _record_uploads(self, done: list, checksums: dict) -> None:
+        if done and self.catalog is not None:
+            self.catalog.record_uploads(list(done), checksums)
+            # Claimed in _upload_loop until recorded
+            self.catalog.release([path for _, path, _ in done])
+        done.clear()
+        checksums.clear()
@@ -0,0 +1,183 @@
+# retention: expire whole day folders instead of walking and parsing every file
+import os
+import shutil
+import datetime
+import logging
+from baby_care_ai import metrics
+from baby_care_ai.pack import pack_path, packed_names
+
+from baby_care_ai.storage import (
+    IMAGE_EXTENSIONS,
+    camera_folders,
+    day_folders,
+    migrate_flat_layout,
+)
+
+KEEP_DAYS = 1  # days kept locally, including today
+DAY_FORMAT = "%Y%m%d"
+
+logger = logging.getLogger(__name__)
+
+
+def _folder_bytes(folder: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+def _expire_day(
+    folder: str,
+    room: str,
+    manifest=None,
+    upload_queue=None,
+    logger: logging.Logger = None,
+) -> tuple:
+    """
+    Remove one day folder, or only its uploaded images if some are still pending.
+
+    Returns:
+        tuple: (removed image count, names of the pending images kept, bytes freed)
+    """
+    names = [
+        entry.name
+        for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    pending = set()
+    if manifest is not None:
+        uploaded = manifest.uploaded_names(room)
+        if os.path.basename(pack_path(folder)) in uploaded:
+            # Images inside the day's uploaded pack are on Drive too
+            uploaded |= packed_names(folder)
+        pending = set(names) - uploaded
+    if upload_queue is not None:
+        pending |= upload_queue.queued_names(room).intersection(names)
+    if not pending:
+        freed = _folder_bytes(folder)
+        shutil.rmtree(folder)
+        logger.info(f"Expired {folder} ({len(names)} images)")
+        return len(names), pending, freed
+
+    freed = 0
+    for name in names:
+        if name not in pending:
+            path = os.path.join(folder, name)
+            freed += os.path.getsize(path)
+            os.remove(path)
+    logger.warning(f"Kept {len(pending)} images in {folder} until they are uploaded")
+    return len(names) - len(pending), pending, freed
+
+
+def enforce_retention(
+    image_dir: str,
+    keep_days: int = KEEP_DAYS,
+    manifest=None,
+    max_bytes: int = None,
+    today: datetime.date = None,
+    catalog=None,
+    upload_queue=None,
+    logger: logging.Logger = None,
+) -> dict:
+    """
+    Apply the local retention policies to a date-partitioned image folder.
+
+    Only the camera and day folder names are listed, so a run that has
+    nothing to expire costs a few `scandir` calls however many images are
+    stored. Expiring a day removes its folder in one `rmtree`.
+
+    Policies:
+        keep_days: Day folders older than this many days (today counts as
+            one) are expired.
+        manifest: When given, images not yet recorded as uploaded in this
+            `UploadManifest` are never removed; their day folder is kept
+            with only the pending images left in it.
+        max_bytes: When given, further day folders are expired oldest first
+            until total usage is at or below this cap. Pending images are
+            still kept, so usage can stay above the cap until they upload.
+
+    Args:
+        image_dir (str): The output folder holding one folder per camera.
+        catalog (CaptureCatalog, optional): When given, day folders and their
+            sizes come from the catalog instead of the filesystem, it also
+            serves as the manifest, and expired captures are dropped from it.
+        upload_queue (DurableUploadQueue, optional): Images still queued for
+            upload are never removed, whatever the manifest says.
+        today (datetime.date, optional): Override for the current date.
+        logger (logging.Logger, optional): Logger for logging messages.
+
+    Returns:
+        dict: Counts of "expired_days", "removed", "pending" and "freed_bytes".
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    if today is None:
+        today = datetime.date.today()
+    # YYYYMMDD names sort like dates, so no per-name parsing is needed
+    cutoff = (today - datetime.timedelta(days=max(keep_days, 1) - 1)).strftime(
+        DAY_FORMAT
+    )
+    partitions = []
+    sizes = {}
+    if catalog is not None:
+        manifest = catalog
+        for day, room, size in catalog.partitions():
+            folder = os.path.join(image_dir, room, day)
+            partitions.append((day, room, folder))
+            sizes[folder] = size
+    else:
+        migrate_flat_layout(image_dir, logger=logger)
+        for camera_folder in camera_folders(image_dir):
+            room = os.path.basename(camera_folder)
+            for day in day_folders(camera_folder):
+                partitions.append((day, room, os.path.join(camera_folder, day)))
+        partitions.sort()
+
+    stats = {"expired_days": 0, "removed": 0, "pending": 0, "freed_bytes": 0}
+
+    def expire(day, room, folder):
+        if not os.path.isdir(folder):
+            pending, removed, freed = set(), 0, 0
+        else:
+            removed, pending, freed = _expire_day(
+                folder, room, manifest, upload_queue, logger
+            )
+        if catalog is not None:
+            catalog.forget_day(room, day, keep=pending)
+        stats["expired_days"] += 1
+        stats["removed"] += removed
+        stats["pending"] += len(pending)
+        stats["freed_bytes"] += freed
+        return freed
+
+    remaining = []
+    for day, room, folder in partitions:
+        if day < cutoff:
+            expire(day, room, folder)
+        else:
+            remaining.append((day, room, folder))
+
+    if max_bytes is not None:
+        total = sum(
+            sizes[folder] if folder in sizes else _folder_bytes(folder)
+            for _, _, folder in remaining
+        )
+        for day, room, folder in remaining:
+            if total <= max_bytes:
+                break
+            total -= expire(day, room, folder)
+        if total > max_bytes:
+            logger.warning(
+                f"Disk usage {total / 2**20:.1f} MiB is still above the "
+                f"{max_bytes / 2**20:.1f} MiB cap"
+            )
+
+    metrics.counter("retention_removed_total", "Images removed by retention").inc(
+        stats["removed"]
+    )
+    metrics.counter("retention_freed_bytes_total", "Bytes freed by retention").inc(
+        stats["freed_bytes"]
+    )
+    logger.info(
+        f"Retention: expired {stats['expired_days']} day folders, removed "
+        f"{stats['removed']} images ({stats['freed_bytes'] / 2**20:.1f} MiB), "
+        f"{stats['pending']} kept until uploaded"
+    )
+    return stats
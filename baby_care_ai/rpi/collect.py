@@ -1,87 +1,479 @@
-from fabric import Connection, Group
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from io import BytesIO
 import os
-import re
+import time
 from datetime import datetime as dt
 import logging
+from baby_care_ai import metrics
+from baby_care_ai.config import load_config
+from baby_care_ai.health import CAPTURE_DEADLINE
+from baby_care_ai.storage import camera_folder_name, capture_path
 
-load_dotenv()
-output_folder = os.getenv("OUTPUT_FOLDER")
+CONNECT_TIMEOUT = 10  # seconds for the SSH handshake with an unreachable Pi
 
 
 def load_rpi_configs():
-    rpi_configs = {}
-    for key in os.environ.keys():
-        if key.startswith("RPI_DEVICE_"):
-            parts = key.split("_")
-            device_num = parts[2]
-            param = "_".join(parts[3:])
-            if device_num not in rpi_configs:
-                rpi_configs[device_num] = {}
-            rpi_configs[device_num][param] = os.environ[key]
-    return rpi_configs
+    return {
+        device_num: dict(config)
+        for device_num, config in load_config().rpi_devices.items()
+    }
 
 
 def get_connection(host, user, password, logger=None):
+    # fabric (and paramiko) load only once a Pi is actually contacted
+    from fabric import Connection
+
     # set up logger if logger is None
     if logger is None:
         logger = logging.getLogger(__name__)
 
-    conn = Connection(host=host, user=user, connect_kwargs={"password": password})
+    conn = Connection(
+        host=host,
+        user=user,
+        connect_timeout=CONNECT_TIMEOUT,
+        connect_kwargs={"password": password},
+    )
     logger.info(f"Established connection to {host} as {user}")
     return conn
 
 
-def get_pi_image(
-    conn, name, rpi_local_file_path, rpicam_configs="", is_noir=False, logger=None
-):
+NOIR_TUNING_FILE = "/usr/share/libcamera/ipa/rpi/vc4/imx219_noir.json"
+JPEG_MAGIC = b"\xff\xd8"
+
+
+def rpicam_command(output, rpicam_configs="", is_noir=False) -> str:
+    """Build the `rpicam-still` command line; `output="-"` writes the JPEG to stdout."""
+    if is_noir:
+        return (
+            f"rpicam-still -o {output} --tuning-file {NOIR_TUNING_FILE} "
+            f"{rpicam_configs}"
+        )
+    return f"rpicam-still -o {output} {rpicam_configs}"
+
+
+def pi_image_path(name) -> str:
+    """Build a timestamped local image path for a Pi camera, creating its day folder."""
+    output_folder = load_config().require("output_folder")
     # Create output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.mkdir(output_folder)
+    timestamp = dt.now().strftime("%Y%m%d_%H%M%S")
+    return capture_path(output_folder, camera_folder_name(name), timestamp)
+
+
+def stream_pi_image(conn, rpicam_configs="", is_noir=False) -> bytes:
+    """
+    Capture with `rpicam-still -o -` and read the JPEG straight off the SSH channel.
+
+    No file is written on the Pi, and the image arrives in the same round trip
+    as the capture command.
+
+    Returns:
+        bytes: The JPEG image.
+    """
+    conn.open()
+    _, stdout, stderr = conn.client.exec_command(
+        rpicam_command("-", rpicam_configs, is_noir)
+    )
+    data = stdout.read()
+    status = stdout.channel.recv_exit_status()
+    if status != 0:
+        message = stderr.read().decode(errors="replace").strip()
+        raise RuntimeError(f"rpicam-still exited with status {status}: {message}")
+    if not data.startswith(JPEG_MAGIC):
+        raise ValueError(f"rpicam-still did not stream a JPEG ({len(data)} bytes)")
+    return data
+
+
+def capture_pi_bytes(
+    conn,
+    rpi_local_file_path,
+    rpicam_configs="",
+    is_noir=False,
+    stream=True,
+    logger=None,
+) -> bytes:
+    """
+    Capture an image on the Pi into memory, raising on any failure.
+
+    Streams over the SSH channel when `stream` is set and falls back to the
+    write-then-SFTP path (into a buffer) if streaming fails.
+
+    Returns:
+        bytes: The JPEG image.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    host = getattr(conn, "host", None)
+    if stream:
+        try:
+            with metrics.span("rpi_stream", host=host):
+                return stream_pi_image(
+                    conn, rpicam_configs=rpicam_configs, is_noir=is_noir
+                )
+        except Exception as e:
+            logger.warning(f"Streaming capture failed ({e}), falling back to SFTP")
+    with metrics.span("rpi_ssh", host=host):
+        conn.run(rpicam_command(rpi_local_file_path, rpicam_configs, is_noir))
+    buffer = BytesIO()
+    with metrics.span("rpi_sftp", host=host):
+        conn.get(rpi_local_file_path, local=buffer)
+    return buffer.getvalue()
+
+
+def capture_pi_image(
+    conn,
+    name,
+    rpi_local_file_path,
+    rpicam_configs="",
+    is_noir=False,
+    logger=None,
+    stream=False,
+) -> str:
+    """
+    Capture an image on the Pi and save it locally, raising on any failure.
+
+    With `stream` set the JPEG is read off the SSH channel and written once,
+    locally; otherwise it is written to `rpi_local_file_path` on the Pi and
+    fetched with SFTP.
+
+    Returns:
+        str: The local path of the saved image.
+    """
+    # set up logger if logger is None
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    local_image_path = pi_image_path(name)
+    if stream:
+        data = capture_pi_bytes(
+            conn,
+            rpi_local_file_path,
+            rpicam_configs=rpicam_configs,
+            is_noir=is_noir,
+            logger=logger,
+        )
+        with open(local_image_path, "wb") as f:
+            f.write(data)
+    else:
+        host = getattr(conn, "host", None)
+        with metrics.span("rpi_ssh", host=host):
+            conn.run(rpicam_command(rpi_local_file_path, rpicam_configs, is_noir))
+        with metrics.span("rpi_sftp", host=host):
+            conn.get(rpi_local_file_path, local=local_image_path)
+    logger.info(f"Image saved to {local_image_path}")
+    return local_image_path
+
+
+def get_pi_image(
+    conn,
+    name,
+    rpi_local_file_path,
+    rpicam_configs="",
+    is_noir=False,
+    logger=None,
+    close_connection=True,
+    stream=False,
+):
     # set up logger if logger is None
     if logger is None:
         logger = logging.getLogger(__name__)
-    processed_name = re.sub(r"_+", "_", name.lower().replace(" ", "_"))
-    timestamp = dt.now().strftime("%Y%m%d_%H%M%S")
-    camera_folder = os.path.join(output_folder, processed_name)
-    if not os.path.exists(camera_folder):
-        logger.info(f"Creating folder {camera_folder}")
-        os.mkdir(camera_folder)
-    local_image_path = os.path.join(camera_folder, f"{timestamp}.jpg")
     try:
-        if is_noir:
-            conn.run(
-                f"rpicam-still -o {rpi_local_file_path} --tuning-file /usr/share/libcamera/ipa/rpi/vc4/imx219_noir.json {rpicam_configs}"
-            )
-        else:
-            conn.run(f"rpicam-still -o {rpi_local_file_path} {rpicam_configs}")
-        conn.get(rpi_local_file_path, local=local_image_path)
-        logger.info(f"Image saved to {local_image_path}")
+        return capture_pi_image(
+            conn,
+            name,
+            rpi_local_file_path,
+            rpicam_configs=rpicam_configs,
+            is_noir=is_noir,
+            logger=logger,
+            stream=stream,
+        )
     except Exception as e:
         logger.error(f"Error: {e}")
     finally:
-        conn.close()
+        if close_connection:
+            conn.close()
 
 
-def rpi_images(logger=None):
+def device_settings(device_num, config) -> dict:
+    """
+    Resolve one `RPI_DEVICE_<n>_*` config block into capture settings.
+
+    Args:
+        device_num (str): The device number from the environment variable name.
+        config (dict): The raw parameters returned by `load_rpi_configs`.
+
+    Returns:
+        dict: host, user, password, name, is_noir, rpicam_configs and
+            rpi_local_file_path.
+    """
+    return {
+        "host": config.get("HOST"),
+        "user": config.get("USER_NAME"),
+        "password": config.get("PASSWORD"),
+        "name": config.get("NAME", f"rpi_device_{device_num}"),
+        "is_noir": config.get("IS_NOIR", "false").lower() == "true",
+        "rpicam_configs": config.get("RPICAM_CONFIG", ""),
+        "rpi_local_file_path": config.get("LOCAL_FILE_PATH", "/tmp/image.jpg"),
+    }
+
+
+class RPiCapturePool:
+    """
+    Keeps one authenticated SSH connection per Pi alive across capture cycles.
+
+    All devices are captured at once on a thread pool (each connection is only
+    ever used by one thread at a time). A device whose capture fails has its
+    connection dropped and reopened once before the failure is reported.
+    With `stream` set, images are read straight off the SSH channel instead of
+    being written to the Pi's SD card and fetched with SFTP. Saved images are
+    recorded in `catalog` (a `CaptureCatalog`) when given.
+
+    A cycle waits at most `deadline` seconds for any device: a Pi that has
+    not answered by then is reported as failed while the others' results
+    are returned, and it is not captured again until that capture
+    finishes. With a `health` registry (`HealthRegistry`), results are
+    recorded under `rpi:<device number>` and devices with an open circuit
+    are skipped (and left out of the results).
+
+    Example:
+        pool = RPiCapturePool(logger=logger)
+        results = pool.capture_all()
+        pool.close()
+    """
+
+    def __init__(
+        self,
+        rpi_configs: dict = None,
+        max_workers: int = None,
+        connection_factory=None,
+        stream: bool = False,
+        catalog=None,
+        health=None,
+        deadline: float = CAPTURE_DEADLINE,
+        logger: logging.Logger = None,
+    ):
+        if rpi_configs is None:
+            rpi_configs = load_rpi_configs()
+        self.logger = logger or logging.getLogger(__name__)
+        self.devices = {
+            device_num: device_settings(device_num, config)
+            for device_num, config in rpi_configs.items()
+        }
+        self.connection_factory = connection_factory or get_connection
+        self.stream = stream
+        self.catalog = catalog
+        self.health = health
+        self.deadline = deadline
+        self.connections = {}
+        self._inflight = {}  # device number -> future of a capture past its deadline
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, len(self.devices)),
+            thread_name_prefix="rpi-capture",
+        )
+
+    def _connection(self, device_num):
+        conn = self.connections.get(device_num)
+        if conn is None:
+            settings = self.devices[device_num]
+            conn = self.connection_factory(
+                settings["host"],
+                settings["user"],
+                settings["password"],
+                logger=self.logger,
+            )
+            self.connections[device_num] = conn
+        return conn
+
+    def _drop(self, device_num):
+        conn = self.connections.pop(device_num, None)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _capture(self, device_num, in_memory=False) -> dict:
+        settings = self.devices[device_num]
+        start = time.perf_counter()
+        error = None
+        for attempt in range(2):
+            try:
+                conn = self._connection(device_num)
+                if in_memory:
+                    data = capture_pi_bytes(
+                        conn,
+                        settings["rpi_local_file_path"],
+                        rpicam_configs=settings["rpicam_configs"],
+                        is_noir=settings["is_noir"],
+                        stream=self.stream,
+                        logger=self.logger,
+                    )
+                    return {
+                        "path": None,
+                        "data": data,
+                        "latency": time.perf_counter() - start,
+                    }
+                path = capture_pi_image(
+                    conn,
+                    settings["name"],
+                    settings["rpi_local_file_path"],
+                    rpicam_configs=settings["rpicam_configs"],
+                    is_noir=settings["is_noir"],
+                    logger=self.logger,
+                    stream=self.stream,
+                )
+                return {"path": path, "latency": time.perf_counter() - start}
+            except Exception as e:
+                error = e
+                self.logger.warning(
+                    f"Capture from {settings['host']} failed "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                self._drop(device_num)
+        return {
+            "path": None,
+            "latency": time.perf_counter() - start,
+            "error": str(error),
+        }
+
+    def capture_all(self, in_memory: bool = False, devices: list = None) -> dict:
+        """
+        Trigger a capture on every device at once.
+
+        Args:
+            in_memory (bool): Return the JPEG bytes under "data" instead of
+                writing a file.
+            devices (list): Device numbers to capture. Defaults to all devices.
+
+        Returns:
+            dict: Device numbers mapped to {"path", "latency"} (plus "data" in
+                memory, "error" on failure).
+                Devices skipped by an open circuit are left out.
+        """
+        candidates = list(self.devices if devices is None else devices)
+        if self.health is not None:
+            allowed = set(
+                self.health.filter(f"rpi:{device_num}" for device_num in candidates)
+            )
+            candidates = [d for d in candidates if f"rpi:{d}" in allowed]
+        results = {}
+        for device_num in candidates:
+            inflight = self._inflight.get(device_num)
+            if inflight is not None and not inflight.done():
+                results[device_num] = {
+                    "path": None,
+                    "latency": 0.0,
+                    "error": "previous capture still running",
+                }
+        candidates = [
+            device_num for device_num in candidates if device_num not in results
+        ]
+        start = time.perf_counter()
+        futures = {
+            device_num: self.executor.submit(self._capture, device_num, in_memory)
+            for device_num in candidates
+        }
+        wait(futures.values(), timeout=self.deadline)
+        for device_num, future in futures.items():
+            if future.done():
+                results[device_num] = future.result()
+                continue
+            # A running capture thread cannot be interrupted; keep the device
+            # out until it returns
+            if not future.cancel():
+                self._inflight[device_num] = future
+                future.add_done_callback(partial(self._late_result, device_num))
+            results[device_num] = {
+                "path": None,
+                "latency": time.perf_counter() - start,
+                "error": f"no result within the {self.deadline:.0f}s deadline",
+            }
+        for device_num, result in results.items():
+            name = self.devices[device_num]["name"]
+            metrics.histogram(
+                "rpi_capture_seconds", "Pi capture latency, retries included"
+            ).observe(result["latency"], camera=name)
+            if "error" in result:
+                metrics.counter("capture_failures_total", "Failed captures").inc(
+                    source="rpi", camera=name
+                )
+                self.logger.error(
+                    f"{name}: capture failed after {result['latency']:.2f}s: "
+                    f"{result['error']}"
+                )
+                if self.health is not None:
+                    self.health.record_failure(f"rpi:{device_num}", result["error"])
+            else:
+                metrics.counter("captures_total", "Images captured").inc(
+                    source="rpi", camera=name
+                )
+                self.logger.info(f"{name}: captured in {result['latency']:.2f}s")
+                if self.health is not None:
+                    self.health.record_success(f"rpi:{device_num}", result["latency"])
+        if self.catalog is not None:
+            self.catalog.record_captures(
+                [result["path"] for result in results.values() if result.get("path")]
+            )
+        return results
+
+    def _late_result(self, device_num: str, future) -> None:
+        """
+        Keep an image that arrived after its deadline; it is still a valid capture.
+
+        A frame captured in memory has no caller left to take it, so it is
+        dropped, logged and counted.
+        """
+        result = future.result()
+        name = self.devices[device_num]["name"]
+        if result.get("path"):
+            if self.catalog is not None:
+                self.catalog.record_captures([result["path"]])
+            self.logger.info(
+                f"Late capture after {result['latency']:.2f}s: {result['path']}"
+            )
+        elif result.get("data") is not None:
+            metrics.counter(
+                "late_frames_dropped_total",
+                "In-memory frames that missed their deadline",
+            ).inc(source="rpi", camera=name)
+            self.logger.warning(
+                f"{name}: dropped an in-memory frame that arrived after "
+                f"{result['latency']:.2f}s, past the deadline"
+            )
+
+    def close(self) -> None:
+        """Close every pooled connection and stop the worker threads."""
+        for device_num in list(self.connections):
+            self._drop(device_num)
+        self.executor.shutdown(wait=True)
+
+
+def rpi_images(logger=None, pool: RPiCapturePool = None, devices: list = None):
     if logger is None:
         logger = logging.getLogger(__name__)
+    if pool is not None:
+        count = len(pool.devices) if devices is None else len(devices)
+        logger.info(f"Capturing from {count} pooled RPi devices")
+        return pool.capture_all(devices=devices)
+
     rpi_configs = load_rpi_configs()
     logger.info(f"Found {len(rpi_configs)} RPi devices")
 
     for device_num, config in rpi_configs.items():
-        host = config.get("HOST")
+        settings = device_settings(device_num, config)
+        host = settings["host"]
         logger.info(f"Connecting to RPi device {device_num} at {host}")
-        user = config.get("USER_NAME")
+        user = settings["user"]
         logger.info(f"Using user {user}")
-        password = config.get("PASSWORD")
-        name = config.get("NAME", f"rpi_device_{device_num}")
+        password = settings["password"]
+        name = settings["name"]
         logger.info(f"Using name {name}")
-        is_noir = config.get("IS_NOIR", "false").lower() == "true"
+        is_noir = settings["is_noir"]
         logger.info(f"Using is_noir {is_noir}")
-        rpicam_configs = config.get("RPICAM_CONFIG", "")
+        rpicam_configs = settings["rpicam_configs"]
         logger.info(f"Using rpicam_configs {rpicam_configs}")
-        rpi_local_file_path = config.get("LOCAL_FILE_PATH", "/tmp/image.jpg")
+        rpi_local_file_path = settings["rpi_local_file_path"]
         logger.info(f"Using rpi_local_file_path {rpi_local_file_path}")
         conn = get_connection(host, user, password, logger=logger)
         get_pi_image(
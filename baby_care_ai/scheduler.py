@@ -0,0 +1,191 @@
+# asyncio scheduler for independent recurring jobs
+import asyncio
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from baby_care_ai import metrics
+
+MISSED_POLICIES = ("skip", "coalesce")
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A recurring job and its run statistics.
+
+    Args:
+        name: Name used in logs and thread names.
+        func: Blocking callable run in the job's own single-thread executor,
+            so a job always runs on the same thread and never overlaps itself.
+        interval: Seconds between scheduled runs. Runs are anchored to a fixed
+            grid (start + k * interval), so a slow run does not shift later ones.
+        jitter: Up to this many seconds are added at random to each run time.
+        missed_policy: What to do when a run is due while the previous one is
+            still going, or when slots were missed entirely:
+            "skip" drops the missed runs and waits for the next slot;
+            "coalesce" runs once as soon as possible, then resumes the cadence
+            at the next slot.
+        run_immediately: Run once at start-up instead of after one interval.
+        lock: Optional lock held for every run. Jobs sharing a lock never run
+            at the same time, e.g. jobs that rewrite the same day folders.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func,
+        interval: float,
+        jitter: float = 0.0,
+        missed_policy: str = "skip",
+        run_immediately: bool = True,
+        lock: threading.Lock = None,
+    ):
+        if missed_policy not in MISSED_POLICIES:
+            raise ValueError(f"Unknown missed-run policy: {missed_policy}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.missed_policy = missed_policy
+        self.run_immediately = run_immediately
+        self.lock = lock
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.last_duration = None
+
+    def run(self) -> None:
+        """Run the job's function once, holding its lock if it has one."""
+        if self.lock is None:
+            self.func()
+            return
+        with self.lock:
+            self.func()
+
+
+class Scheduler:
+    """
+    Runs independent recurring jobs on one asyncio event loop.
+
+    Each job sleeps until its next slot, runs its blocking function in its
+    own executor thread and is never run concurrently with itself. Because
+    every job has its own timeline, a slow Drive sync no longer delays the
+    next capture.
+
+    Example:
+        scheduler = Scheduler(logger=logger)
+        scheduler.add_job("collect-blink", collect_blink, 180, jitter=5)
+        scheduler.add_job("sync", sync, 1800, missed_policy="coalesce")
+        scheduler.run()
+    """
+
+    def __init__(self, logger: logging.Logger = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.jobs = {}
+        self._stop = None
+        self._loop = None
+
+    def add_job(self, name: str, func, interval: float, **kwargs) -> Job:
+        """Register a job; keyword arguments are passed to `Job`."""
+        job = Job(name, func, interval, **kwargs)
+        self.jobs[name] = job
+        return job
+
+    async def _execute(self, job: Job) -> None:
+        start = time.perf_counter()
+        try:
+            await self._loop.run_in_executor(job.executor, job.run)
+            job.runs += 1
+        except Exception as e:
+            job.failures += 1
+            metrics.counter("job_failures_total", "Scheduled runs that raised").inc(
+                job=job.name
+            )
+            self.logger.error(f"Error in job {job.name}: {e}", exc_info=True)
+        finally:
+            job.last_duration = time.perf_counter() - start
+            metrics.histogram("job_seconds", "Duration of scheduled runs").observe(
+                job.last_duration, job=job.name
+            )
+            self.logger.info(f"Job {job.name} finished in {job.last_duration:.1f}s")
+
+    def _advance(self, job: Job, next_run: float) -> tuple:
+        """
+        Move to the next slot after a run, applying the missed-run policy.
+
+        Returns:
+            tuple: (the next slot on the grid after now, True if a missed run
+                is made up at once before that slot).
+        """
+        next_run += job.interval
+        now = self._loop.time()
+        if next_run > now:
+            return next_run, False
+        missed = int((now - next_run) // job.interval) + 1
+        job.missed += missed
+        metrics.counter("job_missed_total", "Scheduled runs missed").inc(
+            missed, job=job.name
+        )
+        if job.missed_policy == "coalesce":
+            self.logger.warning(
+                f"Job {job.name} missed {missed} run(s), running once now"
+            )
+            return next_run + missed * job.interval, True
+        self.logger.warning(f"Job {job.name} still running, skipped {missed} run(s)")
+        return next_run + missed * job.interval, False
+
+    async def _wait(self, delay: float) -> bool:
+        """Sleep for `delay` seconds; return True if the scheduler was stopped meanwhile."""
+        if self._stop.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._stop.wait(), delay)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _job_loop(self, job: Job) -> None:
+        next_run = self._loop.time()
+        if not job.run_immediately:
+            next_run += job.interval
+        catch_up = False
+        while True:
+            delay = 0.0
+            if not catch_up:
+                delay = next_run + random.uniform(0, job.jitter) - self._loop.time()
+            if await self._wait(max(0.0, delay)):
+                break
+            # Awaiting the run here is what keeps a job from overlapping itself;
+            # slots that pass meanwhile are handled by the missed-run policy.
+            await self._execute(job)
+            # A made-up run does not use up the slot after it
+            next_run, catch_up = self._advance(
+                job, next_run - job.interval if catch_up else next_run
+            )
+
+    async def run_async(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for job in self.jobs.values():
+            self.logger.info(
+                f"Scheduling {job.name} every {job.interval}s "
+                f"(jitter {job.jitter}s, missed runs: {job.missed_policy})"
+            )
+        try:
+            await asyncio.gather(*(self._job_loop(job) for job in self.jobs.values()))
+        finally:
+            for job in self.jobs.values():
+                job.executor.shutdown(wait=False)
+
+    def run(self) -> None:
+        """Run every job until `stop` is called or the process is interrupted."""
+        asyncio.run(self.run_async())
+
+    def stop(self) -> None:
+        """Stop scheduling new runs; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -0,0 +1,121 @@
+# local image layout: OUTPUT_FOLDER/<camera>/<YYYYMMDD>/<YYYYMMDD_HHMMSS>.jpg
+import os
+import re
+import logging
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+DAY_LENGTH = 8  # "YYYYMMDD"
+
+
+def is_day(name: str) -> bool:
+    """True if `name` looks like a YYYYMMDD day partition or filename prefix."""
+    return len(name) >= DAY_LENGTH and name[:DAY_LENGTH].isdigit()
+
+
+def camera_folder_name(name: str) -> str:
+    """Folder name for a camera: lower case, spaces and repeated underscores collapsed."""
+    return re.sub(r"_+", "_", name.lower().replace(" ", "_"))
+
+
+def capture_path(root: str, camera: str, timestamp: str) -> str:
+    """
+    Build the path for a new capture, creating its day folder if needed.
+
+    Args:
+        root (str): The output folder.
+        camera (str): The processed camera name.
+        timestamp (str): A "%Y%m%d_%H%M%S" timestamp.
+
+    Returns:
+        str: root/camera/YYYYMMDD/timestamp.jpg
+    """
+    folder = os.path.join(root, camera, timestamp[:DAY_LENGTH])
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{timestamp}.jpg")
+
+
+def camera_name(path: str) -> str:
+    """The camera (room) an image belongs to, for both partitioned and flat layouts."""
+    folder = os.path.dirname(path)
+    name = os.path.basename(folder)
+    if len(name) == DAY_LENGTH and name.isdigit():
+        return os.path.basename(os.path.dirname(folder))
+    return name
+
+
+def day_folders(camera_folder: str) -> list:
+    """Sorted day partition names (YYYYMMDD) under a camera folder."""
+    return sorted(
+        entry.name
+        for entry in os.scandir(camera_folder)
+        if entry.is_dir() and len(entry.name) == DAY_LENGTH and entry.name.isdigit()
+    )
+
+
+def _images_in(folder: str) -> list:
+    return [
+        entry.path
+        for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def image_days(camera_folder: str) -> set:
+    """Every day with images under a camera folder, including legacy flat files."""
+    days = set(day_folders(camera_folder))
+    for path in _images_in(camera_folder):
+        name = os.path.basename(path)
+        if is_day(name):
+            days.add(name[:DAY_LENGTH])
+    return days
+
+
+def image_files(camera_folder: str, day: str = None) -> list:
+    """
+    Image paths under a camera folder, optionally for a single day.
+
+    Images written before the date-partitioned layout sit directly in the
+    camera folder; they are included until `migrate_flat_layout` moves them.
+
+    Returns:
+        list: Sorted image paths.
+    """
+    days = day_folders(camera_folder) if day is None else [day]
+    paths = []
+    for name in days:
+        folder = os.path.join(camera_folder, name)
+        if os.path.isdir(folder):
+            paths.extend(_images_in(folder))
+    for path in _images_in(camera_folder):
+        if day is None or os.path.basename(path).startswith(day):
+            paths.append(path)
+    return sorted(paths)
+
+
+def camera_folders(root: str) -> list:
+    """Paths of the camera folders under the output folder."""
+    return sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+
+
+def migrate_flat_layout(root: str, logger: logging.Logger = None) -> int:
+    """
+    Move images saved directly in a camera folder into their day partition.
+
+    Returns:
+        int: Number of images moved.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    moved = 0
+    for camera_folder in camera_folders(root):
+        for path in _images_in(camera_folder):
+            name = os.path.basename(path)
+            if not is_day(name):
+                continue
+            folder = os.path.join(camera_folder, name[:DAY_LENGTH])
+            os.makedirs(folder, exist_ok=True)
+            os.replace(path, os.path.join(folder, name))
+            moved += 1
+    if moved:
+        logger.info(f"Moved {moved} images into day folders under {root}")
+    return moved
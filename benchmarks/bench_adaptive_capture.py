@@ -0,0 +1,232 @@
+"""
+Fixed vs adaptive capture schedule over a simulated day.
+
+Each camera watches a scene that stays still (a sleeping baby: the same
+frame plus a bit or two of sensor noise) except during random activity
+windows, when every frame differs. The fixed schedule captures every
+camera every `FIXED_INTERVAL` seconds, as `COLLECT_INTERVAL` does; the
+adaptive schedule runs a collection tick every minimum interval and
+captures only what `AdaptiveCaptureRate.claim_due` returns, on a virtual
+clock. Reported per schedule: captures (snapshot API calls / SSH sessions),
+bytes written, activity windows caught and how soon, and captures during
+activity. At the default maximum interval (the fixed interval) no window
+the fixed schedule catches is lost, and activity is covered sooner and
+more densely. A longer maximum (opt-in) trades the shortest windows for far
+fewer captures; windows longer than that maximum are still always caught.
+
+A short live check then drives `RPiCapturePool` with fake Pis through the
+same rate in files mode, hashing the saved captures.
+
+    python benchmarks/bench_adaptive_capture.py
+"""
+
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_adaptive_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+
+from fakes import FakeConnection, synthetic_frames  # noqa: E402
+from baby_care_ai.adaptive import MAX_INTERVAL, AdaptiveCaptureRate  # noqa: E402
+from baby_care_ai.rpi.collect import RPiCapturePool  # noqa: E402
+from baby_care_ai.storage import camera_folder_name  # noqa: E402
+
+CAMERAS = 8
+DAY = 24 * 60 * 60
+FIXED_INTERVAL = 180  # the fixed COLLECT_INTERVAL
+MIN_INTERVAL = 60
+LONG_MAX_INTERVAL = 600  # an opt-in CAPTURE_MAX_INTERVAL that saves more calls
+JITTER = 5.0
+ACTIVITY_WINDOWS = 12  # per camera per day
+ACTIVITY_MINUTES = (3, 20)
+FRAME_BYTES = 250_000  # a typical 1080p capture
+logger = logging.getLogger("bench_adaptive_capture")
+
+
+class Scene:
+    """Hashes a camera would produce over a day: still, except inside activity windows."""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.windows = sorted(
+            (start, start + self.rng.uniform(*ACTIVITY_MINUTES) * 60)
+            for start in (self.rng.uniform(0, DAY) for _ in range(ACTIVITY_WINDOWS))
+        )
+        self.still = self.rng.getrandbits(64)
+
+    def active(self, t: float):
+        return next((w for w in self.windows if w[0] <= t < w[1]), None)
+
+    def hash_at(self, t: float) -> str:
+        if self.active(t) is not None:
+            value = self.rng.getrandbits(64)
+            self.still = value  # the baby settles in a new position
+        else:
+            value = self.still
+            for _ in range(self.rng.randint(0, 2)):
+                value ^= 1 << self.rng.randrange(64)
+        return f"{value:016x}"
+
+
+def summarize(
+    scenes: list, captures: dict, max_interval: float = FIXED_INTERVAL
+) -> dict:
+    """Coverage of the activity windows by each camera's capture times."""
+    caught, delays, active, missed_long = 0, [], 0, 0
+    total = sum(len(times) for times in captures.values())
+    for camera, scene in enumerate(scenes):
+        times = captures[camera]
+        for start, end in scene.windows:
+            inside = [t for t in times if start <= t < end]
+            active += len(inside)
+            if inside:
+                caught += 1
+                delays.append(inside[0] - start)
+            elif end - start > max_interval + MIN_INTERVAL + JITTER:
+                missed_long += 1
+    return {
+        "captures": total,
+        "bytes": total * FRAME_BYTES,
+        "caught": caught,
+        "windows": ACTIVITY_WINDOWS * len(scenes),
+        "delay": statistics.median(delays) if delays else float("nan"),
+        "active": active,
+        "missed_long": missed_long,
+    }
+
+
+def fixed_schedule() -> dict:
+    scenes = [Scene(c) for c in range(CAMERAS)]
+    rng = random.Random(0)
+    captures = {c: [] for c in range(CAMERAS)}
+    t = 0.0
+    while t < DAY:
+        for c in range(CAMERAS):
+            scenes[c].hash_at(t)
+            captures[c].append(t)
+        t += FIXED_INTERVAL + rng.uniform(0, JITTER)
+    return summarize(scenes, captures)
+
+
+def adaptive_schedule(max_interval: float) -> tuple:
+    scenes = [Scene(c) for c in range(CAMERAS)]
+    rng = random.Random(0)
+    clock = [0.0]
+    rate = AdaptiveCaptureRate(
+        MIN_INTERVAL, max_interval, clock=lambda: clock[0], logger=logger
+    )
+    captures = {c: [] for c in range(CAMERAS)}
+    names = [f"camera_{c}" for c in range(CAMERAS)]
+    intervals = []
+    while clock[0] < DAY:
+        for name in rate.claim_due(names):
+            c = names.index(name)
+            captures[c].append(clock[0])
+            rate.observe(name, scenes[c].hash_at(clock[0]))
+        intervals += [rate.interval(name) for name in names]
+        clock[0] += rate.tick + rng.uniform(0, JITTER)
+    return summarize(scenes, captures, max_interval), statistics.mean(intervals)
+
+
+def live_pool() -> None:
+    """Static Pis back off, a Pi whose scene changes keeps the minimum interval."""
+    frames = synthetic_frames(6, 0.0, (320, 240), seed=11)
+    configs = {
+        str(i): {"HOST": f"10.0.0.{i}", "USER_NAME": "pi", "NAME": f"pi {i}"}
+        for i in range(3)
+    }
+    connections = {}
+
+    def factory(host, user, password, logger=None):
+        connections[host] = FakeConnection(host, 0, 0, 0, payload=frames[0])
+        return connections[host]
+
+    clock = [0.0]
+    rate = AdaptiveCaptureRate(
+        MIN_INTERVAL, LONG_MAX_INTERVAL, clock=lambda: clock[0], logger=logger
+    )
+    pool = RPiCapturePool(
+        configs, connection_factory=factory, stream=True, logger=logger
+    )
+    folders = {camera_folder_name(s["name"]): num for num, s in pool.devices.items()}
+    captured = {num: 0 for num in pool.devices}
+    try:
+        for tick in range(30):
+            if "10.0.0.0" in connections:  # pi 0 sees a new scene every frame
+                connections["10.0.0.0"].payload = frames[tick % len(frames)]
+            devices = [folders[f] for f in rate.claim_due(folders)]
+            if devices:
+                results = pool.capture_all(devices=devices)
+                assert set(results) == set(devices)
+                for num in devices:
+                    captured[num] += 1
+                rate.observe_paths(
+                    [r["path"] for r in results.values() if r.get("path")]
+                )
+            clock[0] += rate.tick
+    finally:
+        pool.close()
+    print(
+        f"\nLive pool, 30 ticks: captures per Pi {captured}; intervals "
+        f"{ {f: rate.interval(f) for f in folders} }"
+    )
+    assert captured["0"] == 30, "the changing scene must be captured every tick"
+    assert captured["1"] < 15 and captured["2"] < 15, "static scenes must back off"
+    assert rate.interval("pi_1") == LONG_MAX_INTERVAL
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    fixed = fixed_schedule()
+    default, default_interval = adaptive_schedule(MAX_INTERVAL)
+    adaptive, mean_interval = adaptive_schedule(LONG_MAX_INTERVAL)
+    print(
+        f"{CAMERAS} cameras, one day, {ACTIVITY_WINDOWS} activity windows of "
+        f"{ACTIVITY_MINUTES[0]}-{ACTIVITY_MINUTES[1]} min per camera"
+    )
+    print(
+        f"{'schedule':<22} {'captures':>9} {'GiB':>6} {'windows caught':>15} "
+        f"{'median delay':>13} {'active captures':>16}"
+    )
+    for label, r in (
+        (f"fixed {FIXED_INTERVAL}s", fixed),
+        (f"adaptive {MIN_INTERVAL}-{MAX_INTERVAL}s", default),
+        (f"adaptive {MIN_INTERVAL}-{LONG_MAX_INTERVAL}s", adaptive),
+    ):
+        print(
+            f"{label:<22} {r['captures']:>9} {r['bytes'] / 2**30:>6.2f} "
+            f"{r['caught']:>7}/{r['windows']:<7} {r['delay']:>12.0f}s {r['active']:>16}"
+        )
+    print(
+        f"mean adaptive interval: {default_interval:.0f}s at the default maximum, "
+        f"{mean_interval:.0f}s at {LONG_MAX_INTERVAL}s"
+    )
+    # The default maximum is the fixed interval: coverage never drops below it
+    assert MAX_INTERVAL == FIXED_INTERVAL
+    assert default["caught"] == default["windows"], (
+        "lost activity at the default maximum"
+    )
+    assert default["caught"] >= fixed["caught"] and default["delay"] <= fixed["delay"]
+    assert adaptive["captures"] < 0.6 * fixed["captures"], (
+        "adaptive capture did not save calls"
+    )
+    assert adaptive["active"] > fixed["active"], "activity is covered less densely"
+    # Activity shorter than the maximum interval can fall between two
+    # captures of a still scene; anything longer must always be caught
+    assert adaptive["missed_long"] == 0, (
+        "missed activity longer than the maximum interval"
+    )
+    live_pool()
+    shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
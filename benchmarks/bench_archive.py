@@ -0,0 +1,316 @@
+"""
+Per-file vs packed sync of finished days: wall time, Drive API calls, reads.
+
+Writes a few days of kept captures for several cameras and uploads them to
+a `FakeDrive` twice: one Drive file per capture through `upload_pending`,
+and one pack plus index per camera-day through `pack_captures` and
+`upload_packs`. Every frame is then read back out of the packs through
+`PackReader` and compared with the capture on disk, random reads are timed
+against opening each file, retention must expire the packed days without
+keeping anything back, and a pack with a torn record and a stale index, or
+cut short by a power cut while its index was not, must be repaired when it
+is reopened. Captures kept while their day's pack is uploading must not be
+appended to it, and retention must keep them.
+
+    python benchmarks/bench_archive.py
+"""
+
+import datetime
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_archive_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from fakes import FakeDrive  # noqa: E402
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.gooogle_drive.drive_utils import upload_packs, upload_pending  # noqa: E402
+from baby_care_ai.pack import (  # noqa: E402
+    PackReader,
+    PackWriter,
+    index_path,
+    pack_captures,
+    pack_lock,
+    pack_path,
+    packed_names,
+)
+from baby_care_ai.retention import enforce_retention  # noqa: E402
+from baby_care_ai.storage import capture_path  # noqa: E402
+
+CAMERAS = 4
+DAYS = ["20260101", "20260102"]
+FRAMES = 150  # kept captures per camera-day
+FRAME_BYTES = 60_000
+LATENCY = 0.05
+WORKERS = 4
+READS = 2000
+logger = logging.getLogger("bench_archive")
+
+
+def populate(root: str) -> list:
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    rng = random.Random(3)
+    paths = []
+    for c in range(CAMERAS):
+        for day in DAYS:
+            for i in range(FRAMES):
+                path = capture_path(
+                    root, f"camera_{c}", f"{day}_{i * 60 // 3600:02d}{i % 60:02d}00"
+                )
+                with open(path, "wb") as f:
+                    f.write(rng.randbytes(FRAME_BYTES))
+                paths.append(path)
+    return paths
+
+
+def catalog_of(root: str, paths: list) -> CaptureCatalog:
+    """A catalog where dedup has already kept every capture."""
+    catalog = CaptureCatalog(root)
+    catalog.record_captures(
+        paths, hashes={path: f"{i:016x}" for i, path in enumerate(paths)}
+    )
+    return catalog
+
+
+def per_file(root: str, paths: list) -> dict:
+    catalog = catalog_of(root, paths)
+    drive = FakeDrive(latency=LATENCY)
+    try:
+        start = time.perf_counter()
+        upload_pending("fake-1", drive, catalog, logger=logger, workers=WORKERS)
+        elapsed = time.perf_counter() - start
+        assert not catalog.pending_uploads()
+    finally:
+        catalog.close()
+    return {
+        "seconds": elapsed,
+        "api_calls": drive.api_calls,
+        "files": len(drive.files) - 1,
+        "bytes": drive.bytes_uploaded,
+    }
+
+
+def packed(root: str, paths: list) -> dict:
+    catalog = catalog_of(root, paths)
+    drive = FakeDrive(latency=LATENCY)
+    closed_before = "99999999"  # every day is over
+    try:
+        start = time.perf_counter()
+        added = pack_captures(root, catalog=catalog, logger=logger)
+        packed_at = time.perf_counter()
+        uploaded = upload_packs(
+            "fake-1",
+            drive,
+            root,
+            catalog,
+            closed_before=closed_before,
+            logger=logger,
+            workers=WORKERS,
+        )
+        elapsed = time.perf_counter() - start
+        assert added == len(paths), added
+        assert len(uploaded) == 2 * CAMERAS * len(DAYS), uploaded
+        # Nothing is packed or uploaded twice
+        assert pack_captures(root, catalog=catalog, logger=logger) == 0
+        assert not upload_packs(
+            "fake-1", drive, root, catalog, closed_before=closed_before, logger=logger
+        )
+        result = {
+            "seconds": elapsed,
+            "pack_seconds": packed_at - start,
+            "api_calls": drive.api_calls,
+            "files": len(drive.files) - 1,
+            "bytes": drive.bytes_uploaded,
+        }
+        result["reads"] = check_reads(paths)
+        check_retention(root, catalog)
+    finally:
+        catalog.close()
+    return result
+
+
+def check_reads(paths: list) -> dict:
+    """Every frame read from its pack matches the file; time random reads both ways."""
+    readers = {}
+    try:
+        for path in paths:
+            folder = os.path.dirname(path)
+            if folder not in readers:
+                readers[folder] = PackReader(pack_path(folder))
+            with open(path, "rb") as f:
+                assert readers[folder].read(os.path.basename(path)) == f.read(), path
+        assert sum(len(reader) for reader in readers.values()) == len(paths)
+
+        sample = random.Random(5).choices(paths, k=READS)
+        start = time.perf_counter()
+        for path in sample:
+            readers[os.path.dirname(path)].read(os.path.basename(path))
+        packed_reads = time.perf_counter() - start
+        start = time.perf_counter()
+        for path in sample:
+            with open(path, "rb") as f:
+                f.read()
+        file_reads = time.perf_counter() - start
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return {"packed": READS / packed_reads, "files": READS / file_reads}
+
+
+def check_retention(root: str, catalog: CaptureCatalog) -> None:
+    """Packed days count as uploaded: they expire whole, nothing kept back."""
+    last = datetime.datetime.strptime(DAYS[-1], "%Y%m%d").date()
+    stats = enforce_retention(
+        root,
+        keep_days=1,
+        catalog=catalog,
+        today=last + datetime.timedelta(days=1),
+        logger=logger,
+    )
+    assert stats["pending"] == 0, stats
+    assert stats["expired_days"] == CAMERAS * len(DAYS), stats
+    assert not any(
+        os.listdir(os.path.join(root, f"camera_{c}")) for c in range(CAMERAS)
+    )
+
+
+def check_repair(folder: str) -> None:
+    """A torn last record is truncated and records missing from the index are re-indexed."""
+    os.makedirs(folder, exist_ok=True)
+    path = pack_path(folder)
+    frames = {f"20260101_0000{i:02d}.jpg": os.urandom(1000 + i) for i in range(5)}
+    with PackWriter(path, logger=logger) as pack:
+        for name, data in frames.items():
+            pack.append(name, data)
+    with open(index_path(path)) as f:
+        lines = f.readlines()
+    with open(index_path(path), "w") as f:
+        f.writelines(lines[:2])  # the index lost its last three entries
+    with open(path, "ab") as f:
+        f.write(b"IMG1\x05\x00")  # and a record was cut off mid-header
+    with PackWriter(path, logger=logger) as pack:
+        assert len(pack) == len(frames)
+        pack.append("20260101_000099.jpg", b"after repair")
+    with PackReader(path) as reader:
+        assert reader.names() == sorted(frames) + ["20260101_000099.jpg"]
+        for name, data in frames.items():
+            assert reader.read(name) == data
+        assert reader.read("20260101_000099.jpg") == b"after repair"
+    with open(index_path(path)) as f:
+        assert len(f.readlines()) == len(frames) + 1
+
+
+def check_lost_tail(folder: str) -> None:
+    """After a power cut the sidecar can list records the pack never got; they are dropped."""
+    os.makedirs(folder, exist_ok=True)
+    path = pack_path(folder)
+    frames = {f"20260102_0000{i:02d}.jpg": os.urandom(1000 + i) for i in range(5)}
+    with PackWriter(path, logger=logger) as pack:
+        for name, data in frames.items():
+            pack.append(name, data)
+        kept_end = pack.entries["20260102_000002.jpg"]
+    os.truncate(path, sum(kept_end))  # the last two records never reached disk
+    with PackWriter(path, logger=logger) as pack:
+        assert len(pack) == 3 and pack.end == os.path.getsize(path)
+        for name in ("20260102_000003.jpg", "20260102_000004.jpg"):
+            pack.append(name, frames[name])  # re-packed from the day folder
+    with PackReader(path) as reader:
+        assert reader.names() == sorted(frames)
+        for name, data in frames.items():
+            assert reader.read(name) == data
+    with open(index_path(path)) as f:
+        assert len(f.readlines()) == len(frames)
+
+
+def check_upload_race(root: str) -> None:
+    """Captures kept while their day's pack uploads are not packed, and retention keeps them."""
+    os.makedirs(root)
+    day = DAYS[0]
+    paths = [capture_path(root, "camera_0", f"{day}_0000{i:02d}") for i in range(7)]
+    for path in paths:
+        with open(path, "wb") as f:
+            f.write(os.urandom(1000))
+    catalog = catalog_of(root, paths[:5])
+    try:
+        assert pack_captures(root, catalog=catalog, logger=logger) == 5
+        drive = FakeDrive(latency=0.5)
+        upload = threading.Thread(
+            target=upload_packs,
+            args=("fake-1", drive, root, catalog),
+            kwargs={"closed_before": "99999999", "logger": logger},
+        )
+        upload.start()
+        folder = os.path.dirname(paths[0])
+        while not pack_lock(pack_path(folder)).locked():
+            time.sleep(0.01)
+        # Dedup keeps two late captures while the pack is on its way up
+        catalog.record_captures(
+            paths[5:], hashes={p: f"{i:016x}" for i, p in enumerate(paths[5:])}
+        )
+        assert pack_captures(root, catalog=catalog, logger=logger) == 0
+        assert not upload.is_alive(), "packing must wait for the upload"
+        upload.join()
+        assert packed_names(folder) == {os.path.basename(p) for p in paths[:5]}
+        last = datetime.datetime.strptime(day, "%Y%m%d").date()
+        stats = enforce_retention(
+            root,
+            keep_days=1,
+            catalog=catalog,
+            today=last + datetime.timedelta(days=2),
+            logger=logger,
+        )
+        assert stats["pending"] == 2, stats
+        assert all(os.path.exists(p) for p in paths[5:])
+    finally:
+        catalog.close()
+
+
+def main():
+    logging.getLogger().setLevel(logging.ERROR)
+    root = os.path.join(OUTPUT_FOLDER, "images")
+    try:
+        paths = populate(root)
+        files = per_file(root, paths)
+        paths = populate(root)
+        packs = packed(root, paths)
+        check_repair(os.path.join(OUTPUT_FOLDER, "repair", "camera_0", "20260101"))
+        check_lost_tail(os.path.join(OUTPUT_FOLDER, "repair", "camera_0", "20260102"))
+        check_upload_race(os.path.join(OUTPUT_FOLDER, "race"))
+    finally:
+        shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+
+    print(
+        f"{len(paths)} captures of {FRAME_BYTES // 1000} kB, {CAMERAS} cameras x "
+        f"{len(DAYS)} days, {LATENCY * 1000:.0f} ms per request, {WORKERS} workers"
+    )
+    print(
+        f"{'sync':<9} {'seconds':>8} {'api calls':>10} {'drive files':>12} {'MiB':>6}"
+    )
+    for label, r in (("per-file", files), ("packed", packs)):
+        print(
+            f"{label:<9} {r['seconds']:>8.2f} {r['api_calls']:>10} {r['files']:>12} "
+            f"{r['bytes'] / 2**20:>6.1f}"
+        )
+    print(f"packing took {packs['pack_seconds']:.2f}s of the packed sync")
+    reads = packs["reads"]
+    print(
+        f"random reads/s: {reads['packed']:.0f} from packs, {reads['files']:.0f} from files"
+    )
+    assert packs["api_calls"] * 10 < files["api_calls"], "packing did not cut API calls"
+    assert packs["seconds"] < files["seconds"], "packed sync is slower"
+    assert packs["bytes"] >= files["bytes"], "packs are missing image bytes"
+
+
+if __name__ == "__main__":
+    main()
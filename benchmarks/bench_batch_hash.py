@@ -0,0 +1,71 @@
+"""
+Hashing throughput (images/sec): imagehash against the NumPy batch engine.
+
+Also reports how many hashes from the batch engine differ from imagehash,
+with and without JPEG draft decoding.
+
+    python benchmarks/bench_batch_hash.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import imagehash
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import write_synthetic_jpegs  # noqa: E402
+from baby_care_ai.blink.batch_hash import batch_hashes  # noqa: E402
+from baby_care_ai.blink.bktree import hamming  # noqa: E402
+
+IMAGE_COUNT = 100
+FRAME_SIZE = (1920, 1080)
+REFERENCE = {
+    "average": imagehash.average_hash,
+    "difference": imagehash.dhash,
+    "perceptual": imagehash.phash,
+}
+
+
+def _imagehash(paths, kind):
+    results = {}
+    for path in paths:
+        with Image.open(path) as img:
+            results[path] = int(str(REFERENCE[kind](img)), 16)
+    return results
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="bench_batch_hash_")
+    paths = write_synthetic_jpegs(folder, IMAGE_COUNT, size=FRAME_SIZE)
+    print(f"{IMAGE_COUNT} JPEGs at {FRAME_SIZE[0]}x{FRAME_SIZE[1]}")
+    print(
+        f"{'hash':>11} {'engine':>14} {'images/s':>9} {'mismatches':>11} {'max bits':>9}"
+    )
+    for kind in REFERENCE:
+        start = time.perf_counter()
+        reference = _imagehash(paths, kind)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{kind:>11} {'imagehash':>14} {IMAGE_COUNT / elapsed:>9.1f} {'-':>11} {'-':>9}"
+        )
+        for draft in (False, True):
+            start = time.perf_counter()
+            hashes = batch_hashes(paths, kinds=(kind,), draft=draft)
+            elapsed = time.perf_counter() - start
+            distances = [hamming(hashes[p][kind], reference[p]) for p in paths]
+            mismatches = sum(1 for d in distances if d)
+            engine = "batch+draft" if draft else "batch"
+            print(
+                f"{kind:>11} {engine:>14} {IMAGE_COUNT / elapsed:>9.1f} "
+                f"{mismatches:>11} {max(distances):>9}"
+            )
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Wall-clock time per Blink collection cycle against camera count.
+
+Compares the sequential collector (snap + refresh per camera) with the
+concurrent one (gathered snaps, one refresh, gathered downloads) using
+`FakeBlink` with injected latencies.
+
+    python benchmarks/bench_blink_collect.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_blink_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+
+from fakes import FakeBlink  # noqa: E402
+from baby_care_ai.blink.collect import snap_concurrent, snap_sequential  # noqa: E402
+
+CAMERA_COUNTS = [1, 2, 4, 8, 16]
+SNAP_LATENCY = 0.3
+DOWNLOAD_LATENCY = 0.1
+REFRESH_LATENCY = 0.2
+
+
+def _time_cycle(snap_fn, camera_count, **kwargs):
+    blink = FakeBlink(
+        camera_count=camera_count,
+        snap_latency=SNAP_LATENCY,
+        download_latency=DOWNLOAD_LATENCY,
+        refresh_latency=REFRESH_LATENCY,
+    )
+    start = time.perf_counter()
+    saved = asyncio.run(snap_fn(blink, blink.cameras, **kwargs))
+    elapsed = time.perf_counter() - start
+    assert len(saved) == camera_count
+    return elapsed, blink.refresh_calls
+
+
+def main():
+    print(
+        f"{'cameras':>8} {'sequential (s)':>15} {'concurrent (s)':>15} {'refreshes':>10}"
+    )
+    for count in CAMERA_COUNTS:
+        seq, _ = _time_cycle(snap_sequential, count)
+        conc, refreshes = _time_cycle(snap_concurrent, count, max_concurrency=count)
+        print(f"{count:>8} {seq:>15.2f} {conc:>15.2f} {refreshes:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Pre-upload compaction: bytes saved, encode throughput and upload volume.
+
+Writes camera-sized JPEGs with EXIF, deduplicates them through the capture
+catalog, then compacts them to optimized JPEG and to WebP with
+`compact_captures`, on one process and on a pool. Every compacted capture
+must be smaller and free of EXIF, with its original kept until the fake
+Drive has it; uploads must carry only the compacted bytes, and the
+originals must be gone once the uploads are recorded. The incremental
+syncer is checked the same way with WebP.
+
+    python benchmarks/bench_compaction.py
+"""
+
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_compaction_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from fakes import FakeDrive, capture_name, synthetic_frames  # noqa: E402
+from baby_care_ai.blink.dedup import deduplicate_captures  # noqa: E402
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.compaction import (  # noqa: E402
+    ORIGINALS_FOLDER,
+    Compactor,
+    compact_captures,
+    release_originals,
+)
+from baby_care_ai.gooogle_drive.drive_utils import upload_pending  # noqa: E402
+from baby_care_ai.gooogle_drive.incremental import IncrementalSync  # noqa: E402
+from baby_care_ai.storage import capture_path  # noqa: E402
+
+CAMERAS = 4
+FRAMES = 12  # per camera
+FRAME_SIZE = (1920, 1080)
+CAPTURE_QUALITY = 95  # what the cameras deliver
+MAX_DIMENSION = 1280
+QUALITY = 80
+logger = logging.getLogger("bench_compaction")
+
+
+def camera_frames() -> list:
+    """Full-HD frames re-saved at camera quality with an EXIF block."""
+    from PIL import Image
+
+    frames = []
+    for data in synthetic_frames(FRAMES, 0.0, FRAME_SIZE, seed=7):
+        with Image.open(io.BytesIO(data)) as image:
+            exif = Image.Exif()
+            exif[0x010F] = "FakeCam"  # Make
+            exif[0x0112] = 1  # Orientation
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=CAPTURE_QUALITY, exif=exif)
+            frames.append(buffer.getvalue())
+    return frames
+
+
+def populate(root: str, frames: list) -> list:
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    paths = []
+    for c in range(CAMERAS):
+        for i, data in enumerate(frames):
+            path = capture_path(root, f"camera_{c}", capture_name(i)[:-4])
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def populate_one(root: str, data: bytes, timestamp: str) -> str:
+    path = capture_path(root, "camera_0", timestamp)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def check_compacted(path: str, image_format: str) -> None:
+    from PIL import Image
+
+    with Image.open(path) as image:
+        assert image.format == image_format.upper(), path
+        assert max(image.size) <= MAX_DIMENSION, image.size
+        assert not image.getexif(), f"{path} still has EXIF"
+
+
+def catalog_stage(root: str, frames: list, image_format: str, workers: int) -> dict:
+    paths = populate(root, frames)
+    before = sum(os.path.getsize(path) for path in paths)
+    catalog = CaptureCatalog(root)
+    try:
+        catalog.record_captures(paths)
+        deduplicate_captures(catalog, hash_engine="batch", logger=logger)
+        compactor = Compactor(
+            image_format,
+            quality=QUALITY,
+            max_dimension=MAX_DIMENSION,
+            workers=workers,
+            logger=logger,
+        )
+        start = time.perf_counter()
+        compacted = compact_captures(catalog, compactor, logger=logger)
+        elapsed = time.perf_counter() - start
+
+        assert len(compacted) == len(paths)
+        after = 0
+        for old, new in compacted.items():
+            check_compacted(new, image_format)
+            after += os.path.getsize(new)
+            original = os.path.join(
+                os.path.dirname(old), ORIGINALS_FOLDER, os.path.basename(old)
+            )
+            assert os.path.exists(original), f"original of {new} not kept"
+        assert not catalog.uncompacted(), "compacted captures offered again"
+        assert sorted(path for _, path in catalog.pending_uploads()) == sorted(
+            compacted.values()
+        )
+
+        drive = FakeDrive(latency=0)
+        upload_pending("fake-1", drive, catalog, logger=logger, workers=4)
+        assert drive.bytes_uploaded == after, "uploads are not the compacted bytes"
+        assert not catalog.pending_uploads()
+        freed = release_originals(root, catalog, logger=logger)
+        assert freed == before, f"freed {freed} of {before} original bytes"
+        assert not any(
+            os.listdir(os.path.join(os.path.dirname(path), ORIGINALS_FOLDER))
+            for path in compacted.values()
+        )
+    finally:
+        catalog.close()
+    return {"before": before, "after": after, "seconds": elapsed, "images": len(paths)}
+
+
+def incremental_stage(root: str, frames: list) -> None:
+    paths = populate(root, frames)
+    catalog = CaptureCatalog(root)
+    catalog.record_captures(paths)
+    compactor = Compactor(
+        "webp", quality=QUALITY, max_dimension=MAX_DIMENSION, logger=logger
+    )
+    drive = FakeDrive(latency=0)
+    # `process` is called directly, as the syncer thread would for one batch
+    syncer = IncrementalSync(drive, catalog, compactor=compactor, logger=logger)
+    try:
+        uploaded = syncer.process(paths)
+        assert len(uploaded) == len(paths)
+        assert all(path.endswith(".webp") for path in uploaded)
+        assert not any(os.path.exists(path) for path in paths), (
+            "JPEG captures left behind"
+        )
+        for path in uploaded:
+            assert not os.listdir(os.path.join(os.path.dirname(path), ORIGINALS_FOLDER))
+        assert not catalog.pending_uploads(), (
+            "catalog does not know the compacted names"
+        )
+        # Compacted frames still dedup against what was kept
+        again = populate_one(root, frames[0], capture_name(FRAMES + 1)[:-4])
+        assert not syncer.process([again]) and not os.path.exists(again)
+    finally:
+        catalog.close()
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    root = os.path.join(OUTPUT_FOLDER, "images")
+    frames = camera_frames()
+    pool_workers = max(2, os.cpu_count() or 1)
+    print(
+        f"{CAMERAS * FRAMES} captures of {FRAME_SIZE[0]}x{FRAME_SIZE[1]} at quality "
+        f"{CAPTURE_QUALITY}, compacted to {MAX_DIMENSION}px at quality {QUALITY}"
+    )
+    print(
+        f"{'format':<6} {'workers':>7} {'before (MiB)':>13} {'after (MiB)':>12} "
+        f"{'saved':>6} {'images/s':>9}"
+    )
+    try:
+        for image_format in ("jpeg", "webp"):
+            for workers in (1, pool_workers):
+                r = catalog_stage(root, frames, image_format, workers)
+                saved = 1 - r["after"] / r["before"]
+                print(
+                    f"{image_format:<6} {workers:>7} {r['before'] / 2**20:>13.1f} "
+                    f"{r['after'] / 2**20:>12.1f} {saved:>6.0%} "
+                    f"{r['images'] / r['seconds']:>9.1f}"
+                )
+                assert saved > 0.3, f"{image_format} saved only {saved:.0%}"
+        incremental_stage(root, frames)
+        print("\nIncremental sync uploaded WebP captures and released their originals")
+    finally:
+        shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
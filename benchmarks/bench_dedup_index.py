@@ -0,0 +1,50 @@
+"""
+Dedup run time against files per day, with a cold and a warm `HashIndex`.
+
+A cold run hashes every file; a warm run (the next hourly pass) only stats
+files and reads their hashes back from the index.
+
+    python benchmarks/bench_dedup_index.py
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import write_synthetic_jpegs  # noqa: E402
+from baby_care_ai.blink.dedup import deduplicate_images, find_most_recent_images  # noqa: E402
+from baby_care_ai.blink.hash_index import INDEX_FILENAME  # noqa: E402
+
+FILES_PER_DAY = [100, 500, 2000]
+logger = logging.getLogger("bench_dedup_index")
+
+
+def _run(image_dir, use_index=True):
+    start = time.perf_counter()
+    deduplicate_images(
+        find_most_recent_images(image_dir), logger=logger, use_index=use_index
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'files/day':>10} {'no index (s)':>13} {'cold (s)':>10} {'warm (s)':>10}")
+    for count in FILES_PER_DAY:
+        image_dir = tempfile.mkdtemp(prefix="bench_dedup_")
+        camera = os.path.join(image_dir, "nursery")
+        write_synthetic_jpegs(camera, count)
+        no_index = _run(image_dir, use_index=False)
+        cold = _run(image_dir)
+        warm = _run(image_dir)
+        assert os.path.exists(os.path.join(camera, INDEX_FILENAME))
+        print(f"{count:>10} {no_index:>13.2f} {cold:>10.2f} {warm:>10.2f}")
+        shutil.rmtree(image_dir)
+
+
+if __name__ == "__main__":
+    main()
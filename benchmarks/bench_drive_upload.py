@@ -0,0 +1,66 @@
+"""
+Drive upload throughput (files/sec) against worker count, using `FakeDrive`.
+
+Every request to the fake costs `LATENCY` seconds and requests beyond
+`MAX_RATE` per second are rejected with HTTP 429, so the numbers include
+the retry/backoff and adaptive pacing paths. One large file is
+added to exercise the chunked resumable upload.
+
+    python benchmarks/bench_drive_upload.py
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeDrive  # noqa: E402
+from baby_care_ai.gooogle_drive import drive_utils  # noqa: E402
+
+FILE_COUNT = 120
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+LATENCY = 0.05
+MAX_RATE = 60
+
+logger = logging.getLogger("bench_drive_upload")
+drive_utils.BACKOFF_BASE = 0.2  # retries must outlast the fake's one-second rate window
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="bench_drive_")
+    room = os.path.join(folder, "nursery")
+    os.makedirs(room)
+    for i in range(FILE_COUNT):
+        with open(os.path.join(room, f"20260101_{i:06d}.jpg"), "wb") as f:
+            f.write(os.urandom(64 * 1024))
+    with open(os.path.join(room, "20260101_999999.jpg"), "wb") as f:
+        f.write(
+            os.urandom(drive_utils.RESUMABLE_THRESHOLD + drive_utils.UPLOAD_CHUNK_SIZE)
+        )
+
+    logging.basicConfig(level=logging.ERROR)
+    print(f"{'workers':>8} {'files/s':>8} {'api calls':>10} {'uploaded':>9}")
+    for workers in WORKER_COUNTS:
+        drive = FakeDrive(latency=LATENCY, max_rate=MAX_RATE)
+        parent_id = drive_utils.find_folder_id("BabyCarePhotos", drive, logger=logger)
+        start = time.perf_counter()
+        drive_utils.upload_files(
+            parent_id, drive=drive, local_folder=folder, logger=logger, workers=workers
+        )
+        elapsed = time.perf_counter() - start
+        uploaded = sum(
+            1 for f in drive.files.values() if f.get("title", "").endswith(".jpg")
+        )
+        assert uploaded == FILE_COUNT + 1, uploaded
+        print(
+            f"{workers:>8} {uploaded / elapsed:>8.1f} {drive.api_calls:>10} {uploaded:>9}"
+        )
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
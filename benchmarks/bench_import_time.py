@@ -0,0 +1,169 @@
+"""
+Import cost of each entry point, measured with `python -X importtime`.
+
+Every module is imported in a fresh interpreter `--repeat` times and the
+median and best cumulative import times are reported, along with the
+heavyweight third-party packages the import pulled in. Importing a package
+module must not load any of `HEAVY_PACKAGES`; those belong to the first call
+that needs them. With `--compare`, a best import time more than `--tolerance`
+and more than `--floor` seconds slower than the baseline's also counts as a
+regression, and either kind exits with status 1.
+
+    python benchmarks/bench_import_time.py --output import_times.json
+    python benchmarks/bench_import_time.py --compare benchmarks/import_baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = (
+    "baby_care_ai.automation_logic",
+    "baby_care_ai.blink.collect",
+    "baby_care_ai.blink.dedup",
+    "baby_care_ai.rpi.collect",
+    "baby_care_ai.gooogle_drive.drive_utils",
+    "baby_care_ai.pipeline",
+    "baby_care_ai.catalog",
+)
+HEAVY_PACKAGES = (
+    "aiohttp",
+    "blinkpy",
+    "PIL",
+    "imagehash",
+    "numpy",
+    "scipy",
+    "pydrive2",
+    "googleapiclient",
+    "fabric",
+    "paramiko",
+)
+REPEAT = 5
+TOLERANCE = 0.5  # import times are noisy; only flag large slowdowns
+FLOOR = 0.020  # a few ms of scheduler jitter is a large share of a small import
+# Measured in a child process: print the heavy packages that ended up loaded
+PROBE = (
+    "import json, sys, {module}; "
+    "print(json.dumps(sorted(p for p in {heavy!r} if p in sys.modules)))"
+)
+
+
+def import_time(module: str) -> tuple:
+    """(cumulative import seconds, heavy packages loaded) for one fresh import."""
+    # A clean environment: no .env values or variables change what gets imported
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": ROOT}
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROBE.format(module=module, heavy=HEAVY_PACKAGES),
+        ],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=env,
+        check=True,
+    )
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:"):
+            continue
+        _, total, name = (
+            part.strip() for part in line[len("import time:") :].split("|")
+        )
+        if name == module:
+            cumulative = int(total)
+    return cumulative / 1e6, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(modules: list, repeat: int) -> dict:
+    results = {}
+    print(f"{'module':<40} {'median (ms)':>12} {'min (ms)':>9}  heavy packages loaded")
+    for module in modules:
+        samples = [import_time(module) for _ in range(repeat)]
+        times = [t for t, _ in samples]
+        heavy = samples[-1][1]
+        results[module] = {
+            "median": statistics.median(times),
+            "min": min(times),
+            "heavy": heavy,
+        }
+        print(
+            f"{module:<40} {statistics.median(times) * 1000:>12.1f} {min(times) * 1000:>9.1f}  "
+            f"{', '.join(heavy) or '-'}"
+        )
+    return {"python": sys.version.split()[0], "results": results}
+
+
+def check(
+    report: dict,
+    baseline: dict = None,
+    tolerance: float = TOLERANCE,
+    floor: float = FLOOR,
+) -> list:
+    """
+    Return a description of every regression.
+
+    Import times are compared by their best run, the one least disturbed by
+    the rest of the machine, and a slowdown only counts if it exceeds both
+    the relative `tolerance` and the absolute `floor` in seconds.
+    """
+    problems = [
+        f"{module} imports {', '.join(result['heavy'])}"
+        for module, result in report["results"].items()
+        if result["heavy"]
+    ]
+    if baseline is not None:
+        for module, result in report["results"].items():
+            base = baseline["results"].get(module)
+            if not base:
+                continue
+            slower = result["min"] - base["min"]
+            if slower > base["min"] * tolerance and slower > floor:
+                problems.append(
+                    f"{module} imports in {result['min'] * 1000:.1f} ms at best, "
+                    f"baseline {base['min'] * 1000:.1f} ms"
+                )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--floor",
+        type=float,
+        default=FLOOR,
+        help="ignore slowdowns smaller than this many seconds",
+    )
+    args = parser.parse_args()
+
+    report = run(args.modules, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nReport written to {args.output}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance, args.floor)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cost of the metrics hot path, and an end-to-end scrape of an instrumented cycle.
+
+Times counter increments, histogram observations and spans per call, then
+runs one concurrent Blink collection and one pipeline pass against the
+fakes with the metrics HTTP endpoint up, and checks that `/metrics` and the
+JSON snapshot report captures, refresh time, hashing and uploads.
+
+    python benchmarks/bench_metrics.py
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_metrics_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from fakes import FakeBlink, FakeDrive, write_synthetic_jpegs  # noqa: E402
+from baby_care_ai import metrics  # noqa: E402
+from baby_care_ai.blink.collect import snap_concurrent  # noqa: E402
+from baby_care_ai.pipeline import CapturePipeline  # noqa: E402
+
+CALLS = 200_000
+MAX_SPAN_COST = 20e-6  # seconds per span; a capture cycle takes seconds
+
+
+def per_call(func, calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def hot_path_costs():
+    registry = metrics.Registry()
+    counter = registry.counter("bench_total")
+    histogram = registry.histogram("bench_seconds")
+
+    def span():
+        with registry.span("bench_span", camera="nursery"):
+            pass
+
+    costs = {
+        "empty loop": per_call(lambda: None),
+        "counter.inc": per_call(lambda: counter.inc(camera="nursery")),
+        "histogram.observe": per_call(
+            lambda: histogram.observe(0.01, camera="nursery")
+        ),
+        "span": per_call(span),
+    }
+    print(f"{'operation':<20} {'ns/call':>9}")
+    for name, cost in costs.items():
+        print(f"{name:<20} {cost * 1e9:>9.0f}")
+    assert costs["span"] < MAX_SPAN_COST, "span overhead too high to leave on"
+
+
+def instrumented_cycle():
+    blink = FakeBlink(
+        camera_count=4, snap_latency=0.05, download_latency=0.02, refresh_latency=0.1
+    )
+    saved = asyncio.run(snap_concurrent(blink, blink.cameras))
+    assert len(saved) == 4
+
+    source = tempfile.mkdtemp(prefix="bench_metrics_frames_")
+    pipeline = CapturePipeline(FakeDrive(latency=0), output_folder=OUTPUT_FOLDER)
+    pipeline.start()
+    for path in write_synthetic_jpegs(source, 20, 0.25, seed=3):
+        with open(path, "rb") as f:
+            pipeline.submit("nursery", f.read(), os.path.basename(path)[:-4])
+    pipeline.stop()
+    shutil.rmtree(source)
+
+
+def main():
+    hot_path_costs()
+
+    server = metrics.serve(0)
+    instrumented_cycle()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    text = urllib.request.urlopen(f"{url}/metrics").read().decode()
+    snapshot = json.loads(urllib.request.urlopen(f"{url}/metrics.json").read())
+    server.shutdown()
+    for name in (
+        'baby_care_captures_total{camera="Camera 0",source="blink"} 1',
+        "baby_care_blink_refresh_seconds_count 1",
+        'baby_care_blink_snapshot_seconds_bucket{camera="Camera 3",le="+Inf"} 1',
+        'baby_care_pipeline_frames_total{outcome="received"} 20',
+        "baby_care_drive_uploads_total",
+        'baby_care_queue_depth{queue="pipeline_frames"} 0',
+    ):
+        assert name in text, f"{name} missing from /metrics"
+    assert (
+        snapshot["metrics"]["baby_care_pipeline_hash_seconds"]["samples"][0]["count"]
+        == 20
+    )
+
+    path = os.path.join(OUTPUT_FOLDER, "metrics.json")
+    metrics.REGISTRY.write_snapshot(path)
+    with open(path) as f:
+        assert "baby_care_drive_upload_seconds" in json.load(f)["metrics"]
+    print(
+        f"\n/metrics served {len(text.splitlines())} lines; JSON snapshot written to {path}"
+    )
+    shutil.rmtree(OUTPUT_FOLDER)
+
+
+if __name__ == "__main__":
+    main()
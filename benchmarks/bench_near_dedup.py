@@ -0,0 +1,84 @@
+"""
+Near-duplicate search: BK-tree against a brute-force reference.
+
+Generates clusters of 64-bit hashes (a base hash plus a few flipped bits,
+like frames of a sleeping baby under slightly changing light), checks that
+`find_duplicates` marks exactly the same images as a brute-force greedy
+scan, and reports how both scale with the number of images.
+
+    python benchmarks/bench_near_dedup.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baby_care_ai.blink.bktree import BKTree, hamming  # noqa: E402
+from baby_care_ai.blink.dedup import find_duplicates  # noqa: E402
+
+IMAGE_COUNTS = [1000, 5000, 10000]
+THRESHOLDS = [0, 2, 4, 6]
+CLUSTER_SIZE = 20
+
+
+def synthetic_hashes(count, seed=0):
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        base = rng.getrandbits(64)
+        for _ in range(CLUSTER_SIZE):
+            value = base
+            for _ in range(rng.randint(0, 4)):
+                value ^= 1 << rng.randrange(64)
+            hashes.append((f"{len(hashes):06d}.jpg", value))
+    return hashes[:count]
+
+
+def brute_force(hashes, threshold):
+    kept, duplicates = [], []
+    for path, value in hashes:
+        if any(hamming(value, other) <= threshold for other in kept):
+            duplicates.append(path)
+        else:
+            kept.append(value)
+    return duplicates
+
+
+def check_search(seed=1):
+    rng = random.Random(seed)
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    tree = BKTree()
+    for value in values:
+        tree.add(value, value)
+    for _ in range(200):
+        query = rng.choice(values) ^ (1 << rng.randrange(64))
+        for threshold in (0, 3, 10):
+            expected = sorted(v for v in values if hamming(v, query) <= threshold)
+            assert sorted(v for _, v, _ in tree.search(query, threshold)) == expected
+
+
+def main():
+    check_search()
+    print(
+        f"{'images':>7} {'threshold':>9} {'removed':>8} {'brute (s)':>10} {'bk-tree (s)':>12}"
+    )
+    for count in IMAGE_COUNTS:
+        hashes = synthetic_hashes(count)
+        for threshold in THRESHOLDS:
+            start = time.perf_counter()
+            expected = brute_force(hashes, threshold)
+            brute = time.perf_counter() - start
+            start = time.perf_counter()
+            actual = find_duplicates(hashes, threshold)
+            tree = time.perf_counter() - start
+            assert actual == expected, (count, threshold)
+            print(
+                f"{count:>7} {threshold:>9} {len(actual):>8} {brute:>10.3f} {tree:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
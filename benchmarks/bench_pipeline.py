@@ -0,0 +1,112 @@
+"""
+Disk I/O and time per capture cycle: file hand-offs vs the in-memory pipeline.
+
+File mode writes every frame, lets the dedup job read and decode it again,
+then has the sync job read it a third time to upload. `CapturePipeline`
+hashes the bytes it was handed, drops duplicates before writing, writes
+each unique frame once and uploads from memory. Bytes moved through
+read()/write() calls come from /proc/self/io (rchar/wchar), so they include
+SQLite traffic too.
+
+    python benchmarks/bench_pipeline.py
+"""
+
+import glob
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeDrive, write_synthetic_jpegs  # noqa: E402
+
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from baby_care_ai.blink.dedup import deduplicate_captures  # noqa: E402
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.gooogle_drive.drive_utils import upload_pending  # noqa: E402
+from baby_care_ai.pipeline import CapturePipeline  # noqa: E402
+from baby_care_ai.storage import capture_path  # noqa: E402
+
+CAMERAS = 4
+FRAMES_PER_CAMERA = 150
+DUPLICATE_RATE = 0.3
+logger = logging.getLogger("bench_pipeline")
+
+
+def io_counters():
+    with open("/proc/self/io") as f:
+        counters = dict(line.split(": ") for line in f.read().splitlines())
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def make_frames():
+    """(camera, timestamp, bytes) for every frame, generated outside the measurement."""
+    source = tempfile.mkdtemp(prefix="bench_frames_")
+    frames = []
+    for c in range(CAMERAS):
+        for path in write_synthetic_jpegs(
+            os.path.join(source, str(c)), FRAMES_PER_CAMERA, DUPLICATE_RATE, seed=c
+        ):
+            with open(path, "rb") as f:
+                frames.append((f"camera_{c}", os.path.basename(path)[:-4], f.read()))
+    shutil.rmtree(source)
+    return frames
+
+
+def run_files(root, frames, drive):
+    catalog = CaptureCatalog(root)
+    for camera, timestamp, data in frames:
+        path = capture_path(root, camera, timestamp)
+        with open(path, "wb") as f:
+            f.write(data)
+        catalog.record_captures([path])
+    deduplicate_captures(catalog, hash_engine="batch", logger=logger)
+    upload_pending("fake-1", drive, catalog, logger=logger)
+    catalog.close()
+
+
+def run_pipeline(root, frames, drive):
+    catalog = CaptureCatalog(root)
+    pipeline = CapturePipeline(
+        drive, catalog=catalog, output_folder=root, logger=logger
+    )
+    pipeline.start()
+    for camera, timestamp, data in frames:
+        pipeline.submit(camera, data, timestamp)
+    pipeline.stop()
+    catalog.close()
+    return pipeline.stats
+
+
+def main():
+    frames = make_frames()
+    total = sum(len(data) for _, _, data in frames)
+    print(
+        f"{len(frames)} frames from {CAMERAS} cameras, {total / 2**20:.1f} MiB, "
+        f"{DUPLICATE_RATE:.0%} duplicates\n"
+    )
+    print(
+        f"{'mode':<10} {'time (s)':>9} {'read MiB':>9} {'written MiB':>12} {'files kept':>11}"
+    )
+    for name, run in (("files", run_files), ("pipeline", run_pipeline)):
+        root = tempfile.mkdtemp(prefix="bench_pipeline_")
+        drive = FakeDrive(latency=0)
+        read0, written0 = io_counters()
+        start = time.perf_counter()
+        run(root, frames, drive)
+        elapsed = time.perf_counter() - start
+        read1, written1 = io_counters()
+        kept = len(glob.glob(os.path.join(root, "*", "*", "*.jpg")))
+        print(
+            f"{name:<10} {elapsed:>9.2f} {(read1 - read0) / 2**20:>9.1f} "
+            f"{(written1 - written0) / 2**20:>12.1f} {kept:>11}"
+        )
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Retention run time on a 100k-image tree: per-file cleanup vs day folders.
+
+The legacy cleanup walks every file, parses its date with `strptime` and
+removes expired images one at a time, on every sync even when nothing has
+expired. `enforce_retention` lists camera and day folders only and expires
+a day with one `rmtree`.
+
+    python benchmarks/bench_retention.py
+"""
+
+import datetime
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baby_care_ai.retention import enforce_retention  # noqa: E402
+
+CAMERAS = 10
+DAYS = 10
+FILES_PER_DAY = 1000  # CAMERAS * DAYS * FILES_PER_DAY = 100k images
+TODAY = datetime.date(2026, 1, DAYS)
+logger = logging.getLogger("bench_retention")
+
+
+class UploadedEverything:
+    """Manifest stand-in that reports every image as uploaded."""
+
+    def __init__(self, names):
+        self.names = names
+
+    def uploaded_names(self, room):
+        return self.names
+
+
+def build_tree(root, partitioned):
+    names = set()
+    for c in range(CAMERAS):
+        for d in range(1, DAYS + 1):
+            day = f"202601{d:02d}"
+            folder = os.path.join(root, f"camera_{c}")
+            if partitioned:
+                folder = os.path.join(folder, day)
+            os.makedirs(folder, exist_ok=True)
+            for i in range(FILES_PER_DAY):
+                name = f"{day}_{i // 3600:02d}{i // 60 % 60:02d}{i % 60:02d}.jpg"
+                names.add(name)
+                with open(os.path.join(folder, name), "wb") as f:
+                    f.write(b"\xff\xd8")
+    return names
+
+
+def legacy_cleanup(image_dir, today):
+    """The cleanup step `automation_logic.main` ran before `enforce_retention`."""
+    for root, dirs, files in os.walk(image_dir):
+        for file in files:
+            if file.endswith(".jpg"):
+                date_str = file[:8]
+                try:
+                    file_date = datetime.datetime.strptime(date_str, "%Y%m%d").date()
+                    if file_date < today:
+                        os.remove(os.path.join(root, file))
+                except ValueError:
+                    pass
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    total = CAMERAS * DAYS * FILES_PER_DAY
+    print(f"{total} images, {CAMERAS} cameras x {DAYS} days; keeping 1 day\n")
+    print(f"{'':<22} {'expire 9 days (s)':>18} {'nothing to do (s)':>18}")
+
+    root = tempfile.mkdtemp(prefix="bench_retention_")
+    build_tree(root, partitioned=False)
+    expire = timed(lambda: legacy_cleanup(root, TODAY))
+    idle = timed(lambda: legacy_cleanup(root, TODAY))
+    print(f"{'os.walk + strptime':<22} {expire:>18.3f} {idle:>18.3f}")
+    shutil.rmtree(root)
+
+    root = tempfile.mkdtemp(prefix="bench_retention_")
+    manifest = UploadedEverything(build_tree(root, partitioned=True))
+    run = lambda: enforce_retention(
+        root, keep_days=1, manifest=manifest, today=TODAY, logger=logger
+    )  # noqa: E731
+    expire = timed(run)
+    idle = timed(run)
+    print(f"{'day folders':<22} {expire:>18.3f} {idle:>18.3f}")
+    remaining = sum(len(files) for _, _, files in os.walk(root))
+    assert remaining == CAMERAS * FILES_PER_DAY, remaining
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
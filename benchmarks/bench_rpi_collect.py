@@ -0,0 +1,92 @@
+"""
+Capture latency across Raspberry Pi devices using `FakeConnection`.
+
+Compares one-connection-per-capture serial collection with the pooled
+`RPiCapturePool` (write-then-SFTP and streamed over the SSH channel), and
+checks that a failed device is reconnected.
+
+    python benchmarks/bench_rpi_collect.py
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_rpi_")
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+
+from fakes import FakeConnection  # noqa: E402
+from baby_care_ai.rpi import collect  # noqa: E402
+
+DEVICE_COUNTS = [1, 2, 4, 8]
+CYCLES = 3
+logger = logging.getLogger("bench_rpi")
+
+
+def _configs(count):
+    return {
+        str(i): {"HOST": f"10.0.0.{i}", "USER_NAME": "pi", "NAME": f"pi {i}"}
+        for i in range(1, count + 1)
+    }
+
+
+def _serial_cycle(configs):
+    for device_num, config in configs.items():
+        settings = collect.device_settings(device_num, config)
+        conn = FakeConnection(settings["host"])
+        collect.get_pi_image(conn, settings["name"], settings["rpi_local_file_path"])
+
+
+def _factory(host, user, password, logger=None):
+    return FakeConnection(host)
+
+
+def check_reconnect():
+    failing = {}
+
+    def factory(host, user, password, logger=None):
+        conn = FakeConnection(host, fail_next=1 if host not in failing else 0)
+        failing[host] = conn
+        return conn
+
+    pool = collect.RPiCapturePool(
+        _configs(2), connection_factory=factory, logger=logger
+    )
+    results = pool.capture_all()
+    pool.close()
+    assert all(r["path"] for r in results.values()), results
+    print("reconnect after failure: ok")
+
+
+def main():
+    print(
+        f"{'devices':>8} {'serial (s/cycle)':>17} {'pooled (s/cycle)':>17} {'streamed (s/cycle)':>19}"
+    )
+    for count in DEVICE_COUNTS:
+        configs = _configs(count)
+        start = time.perf_counter()
+        for _ in range(CYCLES):
+            _serial_cycle(configs)
+        serial = (time.perf_counter() - start) / CYCLES
+
+        timings = []
+        for stream in (False, True):
+            pool = collect.RPiCapturePool(
+                configs, connection_factory=_factory, stream=stream, logger=logger
+            )
+            start = time.perf_counter()
+            for _ in range(CYCLES):
+                results = pool.capture_all()
+                assert all(r["path"] for r in results.values())
+            timings.append((time.perf_counter() - start) / CYCLES)
+            pool.close()
+        print(f"{count:>8} {serial:>17.2f} {timings[0]:>17.2f} {timings[1]:>19.2f}")
+    check_reconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Local stand-ins for the cloud and device backends used by the benchmarks.
+
+Every fake accepts injected latencies so that the benchmarks measure the
+orchestration code in `baby_care_ai` rather than the network.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+
+class FakeBlinkCamera:
+    """Mimics the parts of `blinkpy.camera.BlinkCamera` used by the collectors."""
+
+    def __init__(self, name, snap_latency=0.5, download_latency=0.2, payload=b""):
+        self.name = name
+        self.snap_latency = snap_latency
+        self.download_latency = download_latency
+        self.payload = payload or b"\xff\xd8\xff\xe0fake-jpeg\xff\xd9"
+
+    async def snap_picture(self):
+        await asyncio.sleep(self.snap_latency)
+
+    async def image_to_file(self, path):
+        await asyncio.sleep(self.download_latency)
+        with open(path, "wb") as f:
+            f.write(self.payload)
+
+    async def get_media(self):
+        await asyncio.sleep(self.download_latency)
+        return _FakeMediaResponse(self.payload)
+
+
+class _FakeMediaResponse:
+    status = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def read(self):
+        return self.payload
+
+
+class FakeBlink:
+    """Mimics `blinkpy.blinkpy.Blink` with a fixed set of fake cameras."""
+
+    def __init__(
+        self,
+        camera_count=4,
+        snap_latency=0.5,
+        download_latency=0.2,
+        refresh_latency=1.0,
+    ):
+        self.refresh_latency = refresh_latency
+        self.refresh_calls = 0
+        self.cameras = {
+            f"Camera {i}": FakeBlinkCamera(
+                f"Camera {i}",
+                snap_latency=snap_latency,
+                download_latency=download_latency,
+            )
+            for i in range(camera_count)
+        }
+
+    async def start(self):
+        await asyncio.sleep(self.refresh_latency)
+
+    async def refresh(self, force=False):
+        self.refresh_calls += 1
+        await asyncio.sleep(self.refresh_latency)
+
+
+class _FakeChannel:
+    def __init__(self, status):
+        self.status = status
+
+    def recv_exit_status(self):
+        return self.status
+
+
+class _FakeStream:
+    def __init__(self, data, status=0):
+        self.data = data
+        self.channel = _FakeChannel(status)
+
+    def read(self):
+        return self.data
+
+
+class _FakeSSHClient:
+    """Mimics `paramiko.SSHClient.exec_command` for `rpicam-still -o -`."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def exec_command(self, command, **kwargs):
+        self.conn._before_command()
+        time.sleep(self.conn.capture_latency)
+        return None, _FakeStream(self.conn.payload), _FakeStream(b"")
+
+
+class FakeConnection:
+    """
+    Mimics the parts of `fabric.Connection` used by `baby_care_ai.rpi.collect`.
+
+    `connect_latency` is paid on the first command after (re)opening, like an
+    SSH handshake. `fail_next` makes the next N commands raise, to exercise
+    the reconnect path.
+    """
+
+    def __init__(
+        self,
+        host,
+        connect_latency=0.3,
+        capture_latency=0.5,
+        transfer_latency=0.1,
+        payload=b"",
+        fail_next=0,
+    ):
+        self.host = host
+        self.connect_latency = connect_latency
+        self.capture_latency = capture_latency
+        self.transfer_latency = transfer_latency
+        self.payload = payload or b"\xff\xd8\xff\xe0fake-jpeg\xff\xd9"
+        self.fail_next = fail_next
+        self.is_connected = False
+        self.opens = 0
+        self.remote_files = {}
+        self.client = _FakeSSHClient(self)
+
+    def open(self):
+        if not self.is_connected:
+            time.sleep(self.connect_latency)
+            self.is_connected = True
+            self.opens += 1
+
+    def close(self):
+        self.is_connected = False
+
+    def _before_command(self):
+        self.open()
+        if self.fail_next:
+            self.fail_next -= 1
+            self.close()
+            raise ConnectionError(f"simulated failure on {self.host}")
+
+    def run(self, command, **kwargs):
+        self._before_command()
+        time.sleep(self.capture_latency)
+        self.remote_files[command.split("-o ", 1)[1].split(" ", 1)[0]] = self.payload
+
+    def get(self, remote, local=None):
+        self.open()
+        time.sleep(self.transfer_latency)
+        if hasattr(local, "write"):
+            local.write(self.remote_files[remote])
+            return
+        with open(local, "wb") as f:
+            f.write(self.remote_files[remote])
+
+
+def synthetic_frames(count, duplicate_rate=0.0, size=(320, 240), seed=0):
+    """
+    JPEG bytes for `count` noise frames, as a camera would return them.
+
+    A `duplicate_rate` fraction of the frames repeat the previous frame's
+    bytes exactly, so they hash identically.
+
+    Returns:
+        list: The frames, in capture order.
+    """
+    import io
+    import random
+
+    from PIL import Image
+
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        if not frames or rng.random() >= duplicate_rate:
+            pixels = bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] // 64))
+            img = Image.frombytes("L", (size[0] // 8, size[1] // 8), pixels)
+            buffer = io.BytesIO()
+            img.resize(size).convert("RGB").save(buffer, format="JPEG", quality=85)
+            frames.append(buffer.getvalue())
+        else:
+            frames.append(frames[-1])
+    return frames
+
+
+def capture_name(index, date="20260101"):
+    """File name of the `index`-th capture of a day, one per second from midnight."""
+    hh, rest = divmod(index, 3600)
+    return f"{date}_{hh:02d}{rest // 60:02d}{rest % 60:02d}.jpg"
+
+
+def write_synthetic_jpegs(
+    folder, count, duplicate_rate=0.0, date="20260101", size=(320, 240), seed=0
+):
+    """
+    Write `count` noise JPEGs named like real captures into `folder`.
+
+    See `synthetic_frames` for the duplicate model.
+
+    Returns:
+        list: The written paths, in capture order.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, data in enumerate(synthetic_frames(count, duplicate_rate, size, seed)):
+        path = os.path.join(folder, capture_name(i, date))
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def _http_error(status, reason=""):
+    import json
+
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    content = json.dumps(
+        {"error": {"code": status, "errors": [{"reason": reason}], "message": reason}}
+    ).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+def _api_error(status, reason=""):
+    from pydrive2.files import ApiRequestError
+
+    return ApiRequestError(_http_error(status, reason))
+
+
+class _FakeFileList:
+    def __init__(self, items, page_size):
+        self.items = items
+        self.page_size = page_size
+
+    def GetList(self):
+        return list(self.items)
+
+    def __iter__(self):
+        for start in range(0, max(len(self.items), 1), self.page_size):
+            yield self.items[start : start + self.page_size]
+
+
+class FakeDriveFile(dict):
+    """Mimics `pydrive2.files.GoogleDriveFile` for CreateFile/SetContentFile/Upload."""
+
+    def __init__(self, drive, metadata):
+        super().__init__(metadata)
+        self.drive = drive
+        self.content = None
+
+    def SetContentFile(self, path):
+        self.content = open(path, "rb")
+
+    def Upload(self, param=None):
+        self.drive._request()
+        size = 0
+        if self.content is not None:
+            size = len(self.content.read())  # read it all, as a real upload would
+            self.content.close()
+        self.drive._store(self, size)
+
+
+class _FakeInsertRequest:
+    def __init__(self, drive, body, media_body):
+        self.drive = drive
+        self.body = body
+        self.size = media_body.size()
+        self.chunk_size = media_body.chunksize()
+        self.progress = 0
+
+    def next_chunk(self, http=None, num_retries=0):
+        self.drive._request(http_error=True)
+        self.progress = min(self.size, self.progress + self.chunk_size)
+        if self.progress < self.size:
+            return self.progress / self.size, None
+        return None, self.drive._store(FakeDriveFile(self.drive, self.body), self.size)
+
+
+class _FakeFilesResource:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def insert(self, body=None, media_body=None, **kwargs):
+        return _FakeInsertRequest(self.drive, body, media_body)
+
+
+class _FakeService:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def files(self):
+        return _FakeFilesResource(self.drive)
+
+
+class _FakeAuth:
+    def __init__(self, drive):
+        self.service = _FakeService(drive)
+        self.thread_local = threading.local()
+
+    def Authorize(self):
+        pass
+
+    def Get_Http_Object(self):
+        return object()
+
+
+class FakeDrive:
+    """
+    In-memory stand-in for `pydrive2.drive.GoogleDrive`.
+
+    Understands the `ListFile` queries issued by `drive_utils`, stores
+    metadata only, and counts every API request. Each request sleeps for
+    `latency`; requests beyond `max_rate` per second fail with HTTP 429,
+    and setting `offline` makes every request fail with HTTP 503 to
+    simulate an outage.
+    """
+
+    def __init__(self, latency=0.05, max_rate=0, folders=("BabyCarePhotos",)):
+        self.latency = latency
+        self.max_rate = max_rate
+        self.offline = False
+        self._recent = []
+        self.api_calls = 0
+        self.bytes_uploaded = 0
+        self.files = {}
+        self.auth = _FakeAuth(self)
+        self._lock = threading.Lock()
+        for title in folders:
+            self._store(
+                FakeDriveFile(
+                    self,
+                    {"title": title, "mimeType": "application/vnd.google-apps.folder"},
+                ),
+                0,
+            )
+
+    def _request(self, http_error=False):
+        with self._lock:
+            self.api_calls += 1
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            self._recent.append(now)
+            over_rate = self.max_rate and len(self._recent) > self.max_rate
+        time.sleep(self.latency)
+        status = None
+        if self.offline:
+            status = 503
+        elif over_rate:
+            status = 429
+        if status is not None:
+            reason = "rateLimitExceeded" if status == 429 else "backendError"
+            raise (
+                _http_error(status, reason)
+                if http_error
+                else _api_error(status, reason)
+            )
+
+    def _store(self, drive_file, size):
+        with self._lock:
+            drive_file["id"] = drive_file.get("id") or f"fake-{len(self.files) + 1}"
+            self.files[drive_file["id"]] = drive_file
+            self.bytes_uploaded += size
+        return {"id": drive_file["id"], "title": drive_file.get("title")}
+
+    def CreateFile(self, metadata=None):
+        return FakeDriveFile(self, dict(metadata or {}))
+
+    def ListFile(self, param=None):
+        import re
+
+        self._request()
+        query = (param or {}).get("q", "")
+        parent = re.search(r"'([^']+)' in parents", query)
+        title = re.search(r"title='([^']*)'", query)
+        folders_only = "mimeType='application/vnd.google-apps.folder'" in query
+        items = [
+            f
+            for f in self.files.values()
+            if (parent is None or {"id": parent.group(1)} in f.get("parents", []))
+            and (title is None or f.get("title") == title.group(1))
+            and (
+                not folders_only
+                or f.get("mimeType") == "application/vnd.google-apps.folder"
+            )
+        ]
+        return _FakeFileList(items, (param or {}).get("maxResults", 1000))
@@ -0,0 +1,379 @@
+"""
+Reproducible benchmark suite: per-stage and end-to-end cycle times at 1, 10 and 100 cameras.
+
+Every backend is faked with fixed latencies (`fakes.py`): Blink cameras
+return synthetic JPEG streams with a controlled duplicate rate, Pi cameras
+stream them over a fake SSH channel, and uploads go to an in-memory Drive.
+Each stage runs `--repeat` times on fresh data and the median is reported.
+
+Stages, for N cameras (half Blink, half Pi in the end-to-end cycle):
+    blink_collect   one concurrent snap/refresh/download cycle
+    rpi_collect     one pooled, streamed capture cycle (connections warm)
+    dedup_catalog   `deduplicate_captures` over FRAMES frames per camera
+    dedup_folders   `deduplicate_images` over the same frames, by folder
+    upload_pending  `upload_pending` of the catalog's unique captures
+    upload_files    `upload_files` directory walk of the same tree
+    cycle           collect every camera, then dedup and upload (the
+                    automation loop run back to back)
+
+    python benchmarks/run_suite.py --output report.json
+    python benchmarks/run_suite.py --compare benchmarks/baseline.json
+
+With `--compare`, a stage whose fastest run is more than `--tolerance`
+slower than the baseline's fastest run, and by more than `--floor`
+seconds, is reported as a regression and the exit status is 1. Comparing
+minimums keeps scheduler noise out, and the floor keeps millisecond stages
+from flagging jitter as a large relative change.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="bench_suite_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from fakes import (  # noqa: E402
+    FakeBlink,
+    FakeConnection,
+    FakeDrive,
+    capture_name,
+    synthetic_frames,
+)
+from baby_care_ai.blink.collect import snap_concurrent  # noqa: E402
+from baby_care_ai.blink.dedup import (  # noqa: E402
+    deduplicate_captures,
+    deduplicate_images,
+    find_most_recent_images,
+)
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.gooogle_drive.drive_utils import upload_files, upload_pending  # noqa: E402
+from baby_care_ai.rpi.collect import RPiCapturePool  # noqa: E402
+from baby_care_ai.storage import capture_path  # noqa: E402
+
+CAMERA_COUNTS = (1, 10, 100)
+REPEAT = 3
+TOLERANCE = 0.15  # fraction slower than the baseline that counts as a regression
+NOISE_FLOOR = 0.02  # seconds; smaller slowdowns are never regressions
+FRAMES = 10  # frames per camera for the dedup and upload stages
+DUPLICATE_RATE = 0.3
+FRAME_SIZE = (320, 240)
+# Injected backend latencies, in seconds
+BLINK = {"snap_latency": 0.05, "download_latency": 0.02, "refresh_latency": 0.1}
+SSH = {"connect_latency": 0.05, "capture_latency": 0.1, "transfer_latency": 0.02}
+DRIVE_LATENCY = 0.005
+UPLOAD_WORKERS = 4
+STAGES = (
+    "blink_collect",
+    "rpi_collect",
+    "dedup_catalog",
+    "dedup_folders",
+    "upload_pending",
+    "upload_files",
+    "cycle",
+)
+logger = logging.getLogger("run_suite")
+
+_frames = {}
+
+
+def frames(camera: int) -> list:
+    """The synthetic stream of one camera, generated once per run."""
+    if camera not in _frames:
+        _frames[camera] = synthetic_frames(
+            FRAMES, DUPLICATE_RATE, FRAME_SIZE, seed=camera
+        )
+    return _frames[camera]
+
+
+def fresh_root() -> str:
+    root = os.path.join(OUTPUT_FOLDER, "images")
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    return root
+
+
+def populate(root: str, cameras: int) -> list:
+    """Write every camera's stream into the day-partitioned layout."""
+    paths = []
+    for c in range(cameras):
+        for i, data in enumerate(frames(c)):
+            path = capture_path(root, f"camera_{c}", capture_name(i)[:-4])
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def fake_blink(cameras: int) -> FakeBlink:
+    blink = FakeBlink(camera_count=cameras, **BLINK)
+    for c, camera in enumerate(blink.cameras.values()):
+        camera.payload = frames(c)[0]
+    return blink
+
+
+def rpi_pool(cameras: int, offset: int = 0) -> RPiCapturePool:
+    configs = {
+        str(i): {
+            "HOST": f"10.0.{i // 250}.{i % 250 + 1}",
+            "USER_NAME": "pi",
+            "NAME": f"pi {i}",
+        }
+        for i in range(cameras)
+    }
+
+    def factory(host, user, password, logger=None):
+        a, b = host.split(".")[2:]
+        return FakeConnection(
+            host, payload=frames(offset + int(a) * 250 + int(b) - 1)[0], **SSH
+        )
+
+    pool = RPiCapturePool(
+        configs, connection_factory=factory, stream=True, logger=logger
+    )
+    pool.capture_all(in_memory=True)  # open every connection before timing
+    return pool
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+# Each stage sets up fresh state, then returns the time of the measured part only
+
+
+def stage_blink_collect(cameras: int) -> float:
+    fresh_root()
+    blink = fake_blink(cameras)
+    return timed(
+        lambda: asyncio.run(snap_concurrent(blink, blink.cameras, logger=logger))
+    )
+
+
+def stage_rpi_collect(cameras: int) -> float:
+    fresh_root()
+    pool = rpi_pool(cameras)
+    try:
+        return timed(pool.capture_all)
+    finally:
+        pool.close()
+
+
+def stage_dedup_catalog(cameras: int) -> float:
+    root = fresh_root()
+    catalog = CaptureCatalog(root)
+    catalog.record_captures(populate(root, cameras))
+    try:
+        return timed(
+            lambda: deduplicate_captures(catalog, hash_engine="batch", logger=logger)
+        )
+    finally:
+        catalog.close()
+
+
+def stage_dedup_folders(cameras: int) -> float:
+    root = fresh_root()
+    populate(root, cameras)
+    return timed(
+        lambda: deduplicate_images(
+            find_most_recent_images(root), logger=logger, hash_engine="batch"
+        )
+    )
+
+
+def _deduplicated_catalog(cameras: int):
+    root = fresh_root()
+    catalog = CaptureCatalog(root)
+    catalog.record_captures(populate(root, cameras))
+    deduplicate_captures(catalog, hash_engine="batch", logger=logger)
+    return root, catalog
+
+
+def stage_upload_pending(cameras: int) -> float:
+    _, catalog = _deduplicated_catalog(cameras)
+    drive = FakeDrive(latency=DRIVE_LATENCY)
+    try:
+        return timed(
+            lambda: upload_pending(
+                "fake-1", drive, catalog, logger=logger, workers=UPLOAD_WORKERS
+            )
+        )
+    finally:
+        catalog.close()
+
+
+def stage_upload_files(cameras: int) -> float:
+    root, catalog = _deduplicated_catalog(cameras)
+    drive = FakeDrive(latency=DRIVE_LATENCY)
+    try:
+        return timed(
+            lambda: upload_files(
+                "fake-1",
+                drive,
+                root,
+                logger=logger,
+                workers=UPLOAD_WORKERS,
+                manifest=catalog,
+            )
+        )
+    finally:
+        catalog.close()
+
+
+def stage_cycle(cameras: int) -> float:
+    root = fresh_root()
+    blink_count = (cameras + 1) // 2
+    blink = fake_blink(blink_count)
+    pool = rpi_pool(cameras - blink_count, offset=blink_count)
+    catalog = CaptureCatalog(root)
+    drive = FakeDrive(latency=DRIVE_LATENCY)
+
+    def cycle():
+        saved = asyncio.run(snap_concurrent(blink, blink.cameras, logger=logger))
+        saved += [r["path"] for r in pool.capture_all().values() if r.get("path")]
+        catalog.record_captures(saved)
+        deduplicate_captures(catalog, hash_engine="batch", logger=logger)
+        upload_pending("fake-1", drive, catalog, logger=logger, workers=UPLOAD_WORKERS)
+
+    try:
+        return timed(cycle)
+    finally:
+        pool.close()
+        catalog.close()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(stages: list, camera_counts: list, repeat: int) -> dict:
+    results = {}
+    print(
+        f"{'stage':<16} {'cameras':>8} {'median (s)':>11} {'min (s)':>9} {'ms/camera':>10}"
+    )
+    for stage in stages:
+        func = globals()[f"stage_{stage}"]
+        func(1)  # warm-up: lazy imports and first-use setup are not timed
+        for cameras in camera_counts:
+            runs = [func(cameras) for _ in range(repeat)]
+            median = statistics.median(runs)
+            results[f"{stage}@{cameras}"] = {
+                "stage": stage,
+                "cameras": cameras,
+                "median": median,
+                "min": min(runs),
+                "runs": runs,
+            }
+            print(
+                f"{stage:<16} {cameras:>8} {median:>11.3f} {min(runs):>9.3f} "
+                f"{median / cameras * 1000:>10.1f}"
+            )
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "frames_per_camera": FRAMES,
+            "duplicate_rate": DUPLICATE_RATE,
+            "blink_latency": BLINK,
+            "ssh_latency": SSH,
+            "drive_latency": DRIVE_LATENCY,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    report: dict, baseline: dict, tolerance: float, floor: float = NOISE_FLOOR
+) -> list:
+    """Print the change in fastest run against `baseline`; return the keys that regressed."""
+    regressions = []
+    print(
+        f"\nAgainst baseline {baseline['meta'].get('revision') or '?'} "
+        f"({baseline['meta'].get('created')}), fastest of the repeats:"
+    )
+    print(
+        f"{'stage':<16} {'cameras':>8} {'baseline (s)':>13} {'now (s)':>9} {'change':>8}"
+    )
+    for key, result in report["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        slower = result["min"] - base["min"]
+        change = slower / base["min"] if base["min"] else 0.0
+        flag = ""
+        if change > tolerance and slower > floor:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(
+            f"{result['stage']:<16} {result['cameras']:>8} {base['min']:>13.3f} "
+            f"{result['min']:>9.3f} {change:>+8.0%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cameras", type=int, nargs="+", default=list(CAMERA_COUNTS))
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--floor",
+        type=float,
+        default=NOISE_FLOOR,
+        help="seconds below which a slowdown is ignored",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        report = run(args.stages, args.cameras, args.repeat)
+    finally:
+        shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nReport written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.floor)
+        if regressions:
+            print(
+                f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} "
+                f"and {args.floor * 1000:.0f} ms"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Distributed collection on localhost: sharding, throughput, worker death and rejoin.
+
+A `Coordinator` serves on an ephemeral port and `CollectionWorker`s run in
+separate processes, each with the same fake Pis (every host can reach
+every camera) but only `HOST_CAPACITY` capture threads, standing in for one
+host's network and CPU. The simulation checks that:
+
+- every camera is owned by exactly one worker;
+- frames from all workers land in one output tree and in the catalog;
+- three workers capture more frames per second than one;
+- when a worker is killed, its cameras move to the survivors within the
+  heartbeat timeout, and few of the survivors' cameras change hands;
+- when it comes back under the same ID, it gets the same cameras again.
+
+    python benchmarks/sim_cluster.py
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="sim_cluster_")
+os.environ.setdefault("CONFIG_JSON_PATH", os.path.join(OUTPUT_FOLDER, "blink.json"))
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+
+from fakes import FakeConnection, synthetic_frames  # noqa: E402
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.cluster import CollectionWorker, Coordinator  # noqa: E402
+from baby_care_ai.rpi.collect import RPiCapturePool  # noqa: E402
+from baby_care_ai.storage import camera_folders, image_files  # noqa: E402
+
+CAMERAS = 12
+HOST_CAPACITY = 2  # concurrent captures per worker host
+CAPTURE_LATENCY = 0.3
+HEARTBEAT_INTERVAL = 0.2
+HEARTBEAT_TIMEOUT = 1.0
+RUN_SECONDS = 4.0
+TOKEN = "sim-secret"
+logger = logging.getLogger("sim_cluster")
+
+
+def run_worker(url: str, worker_id: str, frame: bytes) -> None:
+    """Worker process: fake Pis behind a pool with `HOST_CAPACITY` threads."""
+    logging.basicConfig(level=logging.ERROR)
+    configs = {
+        str(i): {"HOST": f"10.0.0.{i + 1}", "USER_NAME": "pi", "NAME": f"pi {i}"}
+        for i in range(CAMERAS)
+    }
+
+    def factory(host, user, password, logger=None):
+        return FakeConnection(host, 0.0, CAPTURE_LATENCY, 0.0, payload=frame)
+
+    pool = RPiCapturePool(
+        configs,
+        max_workers=HOST_CAPACITY,
+        connection_factory=factory,
+        stream=True,
+        logger=logger,
+    )
+    worker = CollectionWorker(
+        url,
+        rpi_pool=pool,
+        worker_id=worker_id,
+        interval=0,
+        heartbeat_interval=HEARTBEAT_INTERVAL,
+        token=TOKEN,
+        logger=logger,
+    )
+    try:
+        worker.run()
+    finally:
+        pool.close()
+
+
+class Cluster:
+    def __init__(self, root: str):
+        self.catalog = CaptureCatalog(root)
+        self.received = 0
+        self.coordinator = Coordinator(
+            port=0,
+            output_folder=root,
+            catalog=self.catalog,
+            sink=self._sink,
+            token=TOKEN,
+            heartbeat_timeout=HEARTBEAT_TIMEOUT,
+            logger=logger,
+        ).start()
+        self.frame = synthetic_frames(1, 0.0, (320, 240), seed=5)[0]
+        self.workers = {}
+        self.context = multiprocessing.get_context("fork")
+
+    def _sink(self, camera, timestamp, data):
+        self.received += 1
+        return self.coordinator.save(camera, timestamp, data)
+
+    def start_worker(self, worker_id: str) -> None:
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.coordinator.url, worker_id, self.frame),
+            daemon=True,
+        )
+        process.start()
+        self.workers[worker_id] = process
+
+    def kill_worker(self, worker_id: str) -> None:
+        process = self.workers.pop(worker_id)
+        process.kill()
+        process.join()
+
+    def assignment(self) -> dict:
+        return {
+            w: s["cameras"] for w, s in self.coordinator.status()["workers"].items()
+        }
+
+    def wait_for(self, workers: set, timeout: float = 10.0) -> dict:
+        """Wait until exactly `workers` are live and every camera is assigned."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            assignment = self.assignment()
+            owned = [c for cameras in assignment.values() for c in cameras]
+            if set(assignment) == workers and len(owned) == CAMERAS:
+                return assignment
+            time.sleep(0.05)
+        raise AssertionError(
+            f"cluster did not settle on {workers}: {self.assignment()}"
+        )
+
+    def rate(self, seconds: float) -> float:
+        start = self.received
+        time.sleep(seconds)
+        return (self.received - start) / seconds
+
+    def close(self) -> None:
+        for worker_id in list(self.workers):
+            self.kill_worker(worker_id)
+        self.coordinator.stop()
+        self.catalog.close()
+
+
+def check_partition(assignment: dict) -> None:
+    owned = [c for cameras in assignment.values() for c in cameras]
+    assert len(owned) == len(set(owned)) == CAMERAS, assignment
+
+
+def main():
+    logging.getLogger().setLevel(logging.ERROR)
+    root = os.path.join(OUTPUT_FOLDER, "images")
+    os.makedirs(root)
+    cluster = Cluster(root)
+    try:
+        cluster.start_worker("host-a")
+        check_partition(cluster.wait_for({"host-a"}))
+        one = cluster.rate(RUN_SECONDS)
+
+        for worker_id in ("host-b", "host-c"):
+            cluster.start_worker(worker_id)
+        before = cluster.wait_for({"host-a", "host-b", "host-c"})
+        check_partition(before)
+        three = cluster.rate(RUN_SECONDS)
+        print(
+            f"{CAMERAS} cameras, {HOST_CAPACITY} captures at a time per host, "
+            f"{CAPTURE_LATENCY}s per capture"
+        )
+        print(f"1 worker:  {one:5.1f} frames/s")
+        print(
+            f"3 workers: {three:5.1f} frames/s  { ({w: len(c) for w, c in before.items()}) }"
+        )
+        assert three > 2 * one, "sharding did not raise throughput"
+
+        killed_at = time.monotonic()
+        cluster.kill_worker("host-b")
+        after = cluster.wait_for({"host-a", "host-c"})
+        moved_in = time.monotonic() - killed_at
+        check_partition(after)
+        shuffled = sum(
+            1
+            for worker_id in ("host-a", "host-c")
+            for c in before[worker_id]
+            if c not in after[worker_id]
+        )
+        survivors = cluster.rate(RUN_SECONDS)
+        print(
+            f"host-b killed: its {len(before['host-b'])} cameras moved in {moved_in:.1f}s "
+            f"({shuffled} more changed hands), {survivors:.1f} frames/s on 2 workers"
+        )
+        assert shuffled <= len(before["host-b"]) // 2, (
+            "rebalancing moved too many cameras"
+        )
+        assert moved_in < HEARTBEAT_TIMEOUT + 2.0
+
+        cluster.start_worker("host-b")
+        rejoined = cluster.wait_for({"host-a", "host-b", "host-c"})
+        assert rejoined == before, "a rejoining worker must get its cameras back"
+        print("host-b rejoined and got the same cameras back")
+    finally:
+        cluster.close()
+
+    # One output tree: every camera's frames under root/<camera>/<day>/, all catalogued
+    saved = [path for folder in camera_folders(root) for path in image_files(folder)]
+    assert len(camera_folders(root)) == CAMERAS
+    catalog = CaptureCatalog(root)
+    try:
+        catalogued = sum(size > 0 for _, _, size in catalog.partitions())
+        assert catalogued == CAMERAS, catalogued
+        assert sorted(path for _, path in catalog.pending_uploads()) == sorted(saved)
+    finally:
+        catalog.close()
+    print(
+        f"{cluster.received} frames received, {len(saved)} saved "
+        f"(one per camera per second) in one tree"
+    )
+    shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
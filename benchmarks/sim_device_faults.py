@@ -0,0 +1,263 @@
+"""
+Capture cycles with a hung and a broken device: deadlines and circuit breakers.
+
+Four fake Pis, two healthy, one that hangs for `HANG` seconds on every
+capture (an unreachable host waiting out its connect timeout) and one whose
+every command fails, are captured cycle after cycle by an `RPiCapturePool`
+with a `HealthRegistry` on a virtual clock. Then three fake Blink cameras,
+one of them with a `snap_picture` that never returns. The simulation
+checks that:
+
+- without a deadline a cycle takes as long as the worst device;
+- with one, a cycle never takes much longer than the deadline, and once
+  the bad devices' circuits open, only as long as the healthy devices;
+- open circuits are probed once per cool-off, and the cool-off doubles
+  each time the probe fails;
+- a device that heals is captured again after its next probe;
+- `/health` on the metrics server reports every device's state.
+
+    python benchmarks/sim_device_faults.py
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_FOLDER = tempfile.mkdtemp(prefix="sim_faults_")
+os.environ["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+
+from fakes import FakeBlink, FakeConnection  # noqa: E402
+from baby_care_ai import metrics  # noqa: E402
+from baby_care_ai.blink.collect import snap_concurrent, snap_sequential  # noqa: E402
+from baby_care_ai.health import CLOSED, OPEN, HealthRegistry  # noqa: E402
+from baby_care_ai.rpi.collect import RPiCapturePool  # noqa: E402
+
+CAPTURE_LATENCY = 0.1
+HANG = 2.0  # seconds the hung Pi takes per capture
+DEADLINE = 0.5
+COOLOFF = 10.0  # virtual seconds
+THRESHOLD = 3
+HEALTHY, HUNG, BROKEN = ("1", "2"), "3", "4"
+logger = logging.getLogger("sim_device_faults")
+
+
+class Clock:
+    """Virtual monotonic clock, so cool-offs pass without waiting for them."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FaultyPis:
+    """Connection factory whose hosts can be broken and healed mid-run."""
+
+    def __init__(self):
+        self.capture_latency = {f"10.0.0.{n}": CAPTURE_LATENCY for n in HEALTHY}
+        self.capture_latency[f"10.0.0.{HUNG}"] = HANG
+        self.capture_latency[f"10.0.0.{BROKEN}"] = CAPTURE_LATENCY
+        self.broken = {f"10.0.0.{BROKEN}"}
+        self.connections = []
+
+    def __call__(self, host, user, password, logger=None):
+        conn = FakeConnection(host, 0.0, self.capture_latency[host], 0.0)
+        if host in self.broken:
+            conn.fail_next = 10**6
+        self.connections.append(conn)
+        return conn
+
+    def heal(self) -> None:
+        self.broken.clear()
+        for host in self.capture_latency:
+            self.capture_latency[host] = CAPTURE_LATENCY
+        for conn in self.connections:
+            conn.capture_latency = CAPTURE_LATENCY
+            conn.fail_next = 0
+
+
+def make_pool(health=None, deadline=None) -> tuple:
+    pis = FaultyPis()
+    configs = {
+        n: {"HOST": f"10.0.0.{n}", "USER_NAME": "pi", "NAME": f"pi {n}"}
+        for n in (*HEALTHY, HUNG, BROKEN)
+    }
+    pool = RPiCapturePool(
+        configs,
+        connection_factory=pis,
+        stream=True,
+        health=health,
+        deadline=deadline,
+        logger=logger,
+    )
+    return pool, pis
+
+
+def cycle(pool) -> tuple:
+    start = time.perf_counter()
+    results = pool.capture_all(in_memory=True)
+    captured = sorted(n for n, r in results.items() if r.get("data"))
+    return time.perf_counter() - start, captured, sorted(results)
+
+
+def check_unbounded() -> float:
+    pool, _ = make_pool()
+    try:
+        latency, captured, _ = cycle(pool)
+    finally:
+        pool.close()
+    assert latency >= HANG, latency
+    assert captured == sorted((*HEALTHY, HUNG)), captured
+    print(f"no deadline, no breaker:  {latency:.2f}s per cycle (waits for the hung Pi)")
+    return latency
+
+
+def check_rpi_breakers() -> HealthRegistry:
+    clock = Clock()
+    health = HealthRegistry(
+        failure_threshold=THRESHOLD, cooloff=COOLOFF, clock=clock, logger=logger
+    )
+    pool, pis = make_pool(health, DEADLINE)
+    hung, broken = f"rpi:{HUNG}", f"rpi:{BROKEN}"
+    try:
+        # Until the circuits open: bounded by the deadline, healthy Pis always captured
+        worst = 0.0
+        for _ in range(THRESHOLD):
+            latency, captured, _ = cycle(pool)
+            worst = max(worst, latency)
+            assert captured == sorted(HEALTHY), captured
+        assert worst < DEADLINE + 0.3, worst
+        assert health.state(hung) == health.state(broken) == OPEN
+
+        # Open circuits: the bad Pis are not even attempted
+        latency, captured, attempted = cycle(pool)
+        assert attempted == sorted(HEALTHY), attempted
+        assert latency < 2 * CAPTURE_LATENCY + 0.1, latency
+        print(
+            f"deadline {DEADLINE}s + breaker: {worst:.2f}s per cycle while failing, "
+            f"{latency:.2f}s once both circuits are open"
+        )
+
+        # One probe per cool-off; a failed probe doubles the cool-off
+        time.sleep(HANG)  # let the hung capture from before return
+        cooloffs = []
+        for expected in (COOLOFF, 2 * COOLOFF, 4 * COOLOFF):
+            retry_in = health.status()[broken]["retry_in"]
+            assert retry_in == expected, (retry_in, expected)
+            cooloffs.append(retry_in)
+            clock.advance(retry_in - 1)
+            assert sorted(cycle(pool)[2]) == sorted(HEALTHY), (
+                "probed before the cool-off ended"
+            )
+            clock.advance(1)
+            _, _, attempted = cycle(pool)
+            assert BROKEN in attempted and HUNG in attempted, attempted
+            assert health.state(broken) == OPEN
+            time.sleep(HANG)
+        print(
+            f"failed probes reopen the circuits for {', '.join(f'{c:.0f}' for c in cooloffs)}s"
+        )
+
+        # Healed devices come back after their next probe
+        pis.heal()
+        clock.advance(health.status()[broken]["retry_in"])
+        _, captured, _ = cycle(pool)
+        assert captured == sorted((*HEALTHY, HUNG, BROKEN)), captured
+        assert {health.state(d) for d in (hung, broken)} == {CLOSED}
+        _, captured, _ = cycle(pool)
+        assert captured == sorted((*HEALTHY, HUNG, BROKEN)), captured
+        print("healed Pis closed their circuits on the next probe")
+    finally:
+        pool.close()
+    return health
+
+
+def check_blink(health: HealthRegistry) -> None:
+    blink = FakeBlink(
+        camera_count=3,
+        snap_latency=CAPTURE_LATENCY,
+        download_latency=0.05,
+        refresh_latency=0.05,
+    )
+    blink.cameras["Camera 2"].snap_latency = 3600  # snap_picture never returns
+    stuck = "blink:Camera 2"
+
+    start = time.perf_counter()
+    saved = asyncio.run(
+        snap_sequential(blink, blink.cameras, timeout=DEADLINE, logger=logger)
+    )
+    sequential = time.perf_counter() - start
+    assert len(saved) == 2 and sequential < 2 * (CAPTURE_LATENCY + 0.2) + DEADLINE + 0.3
+
+    latencies = []
+    for _ in range(THRESHOLD + 1):
+        start = time.perf_counter()
+        frames = asyncio.run(
+            snap_concurrent(
+                blink,
+                blink.cameras,
+                timeout=DEADLINE,
+                logger=logger,
+                in_memory=True,
+                health=health,
+            )
+        )
+        latencies.append(time.perf_counter() - start)
+        assert sorted(camera for camera, _, _ in frames) == ["camera_0", "camera_1"], (
+            frames
+        )
+    assert health.state(stuck) == OPEN
+    assert max(latencies[:THRESHOLD]) < DEADLINE + 0.3, latencies
+    assert latencies[-1] < CAPTURE_LATENCY + 0.2, latencies
+    print(
+        f"hung Blink snap: {sequential:.2f}s sequential cycle, concurrent "
+        f"{max(latencies[:THRESHOLD]):.2f}s until its circuit opened, then {latencies[-1]:.2f}s"
+    )
+
+
+def check_health_page(health: HealthRegistry) -> None:
+    server = metrics.serve(0, pages={"/health": health.status}, logger=logger)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/health"
+        with urllib.request.urlopen(url) as response:
+            page = json.load(response)
+    finally:
+        server.shutdown()
+    assert (
+        page["blink:Camera 2"]["state"] == OPEN and page["rpi:3"]["state"] == CLOSED
+    ), page
+    assert page["blink:Camera 2"]["retry_in"] is not None
+    print(f"/health: { ({device: state['state'] for device, state in page.items()}) }")
+    opens = dict(
+        metrics.counter("circuit_opens_total", "Device circuits opened").samples()
+    )
+    assert opens[(("device", f"rpi:{BROKEN}"),)] == 1 + 3, (
+        opens
+    )  # threshold, then 3 failed probes
+
+
+def main():
+    logging.getLogger().setLevel(logging.CRITICAL)
+    try:
+        check_unbounded()
+        health = check_rpi_breakers()
+        check_blink(health)
+        check_health_page(health)
+    finally:
+        shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Simulated Drive outage against `DurableUploadQueue`.
+
+Takes the fake Drive offline, keeps capturing into the queue well past its
+in-memory bound, runs retention while nothing can be uploaded, restarts the
+queue from its journal, then brings Drive back and checks that the backlog
+drains at the configured rate with every image uploaded exactly once.
+
+    python benchmarks/sim_drive_outage.py
+"""
+
+import datetime
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeDrive, write_synthetic_jpegs  # noqa: E402
+
+os.environ.setdefault("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+
+from baby_care_ai.catalog import CaptureCatalog  # noqa: E402
+from baby_care_ai.gooogle_drive import drive_utils  # noqa: E402
+from baby_care_ai.gooogle_drive.upload_queue import DurableUploadQueue  # noqa: E402
+from baby_care_ai.retention import enforce_retention  # noqa: E402
+from baby_care_ai.storage import capture_path  # noqa: E402
+
+IMAGES = 60
+MEMORY_SIZE = 16
+DRAIN_RATE = 20.0
+OUTAGE = 1.5  # seconds offline while the queue keeps probing
+logger = logging.getLogger("sim_drive_outage")
+
+
+def capture(root, catalog):
+    """Write IMAGES captures dated two days ago, so retention would expire them."""
+    day = (datetime.date.today() - datetime.timedelta(days=2)).strftime("%Y%m%d")
+    source = tempfile.mkdtemp(prefix="sim_frames_")
+    paths = []
+    for i, src in enumerate(write_synthetic_jpegs(source, IMAGES, 0, seed=1)):
+        path = capture_path(root, "nursery", f"{day}_{i:06d}")
+        shutil.move(src, path)
+        paths.append(path)
+    shutil.rmtree(source)
+    catalog.record_captures(paths)
+    return paths
+
+
+def main():
+    # Fail fast inside upload_file; the queue's own backoff handles the outage
+    drive_utils.MAX_RETRIES = 1
+    drive_utils.BACKOFF_BASE = 0.01
+    root = tempfile.mkdtemp(prefix="sim_outage_")
+    drive = FakeDrive(latency=0)
+    catalog = CaptureCatalog(root)
+    paths = capture(root, catalog)
+
+    drive.offline = True
+    queue = DurableUploadQueue(
+        root,
+        drive,
+        manifest=catalog,
+        memory_size=MEMORY_SIZE,
+        drain_rate=DRAIN_RATE,
+        retry_base=0.1,
+        retry_max=0.4,
+        logger=logger,
+    )
+    queue.start()
+    queue.put_many(catalog.pending_uploads())
+    assert queue.stats["spilled"] == IMAGES - MEMORY_SIZE, queue.stats
+    time.sleep(OUTAGE)
+    probes = drive.api_calls
+    print(
+        f"offline for {OUTAGE}s: {len(queue)} queued, {queue.stats['failures']} failed "
+        f"attempts, {probes} API calls, {queue.stats['spilled']} spilled to disk"
+    )
+    assert len(queue) == IMAGES
+    assert queue.stats["uploaded"] == 0
+    assert queue.stats["failures"] < 10, "backoff should limit probes during an outage"
+
+    stats = enforce_retention(
+        root, keep_days=1, catalog=catalog, upload_queue=queue, logger=logger
+    )
+    assert all(os.path.exists(path) for path in paths), (
+        "retention removed queued images"
+    )
+    print(f"retention while offline: {stats}")
+
+    # A restart picks the backlog up from the journal
+    queue.stop()
+    queue = DurableUploadQueue(
+        root,
+        drive,
+        manifest=catalog,
+        memory_size=MEMORY_SIZE,
+        drain_rate=DRAIN_RATE,
+        retry_base=0.1,
+        retry_max=0.4,
+        logger=logger,
+    )
+    assert len(queue) == IMAGES
+    queue.put_many(catalog.pending_uploads())
+    assert len(queue) == IMAGES, "re-queueing pending captures must not duplicate them"
+
+    drive.offline = False
+    start = time.perf_counter()
+    queue.start()
+    while len(queue) and time.perf_counter() - start < 30:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    queue.stop()
+    rate = (IMAGES - 1) / elapsed  # the first upload starts without waiting
+    print(
+        f"back online: drained {IMAGES} uploads in {elapsed:.2f}s ({rate:.1f}/s, "
+        f"limit {DRAIN_RATE:.0f}/s)"
+    )
+    assert len(queue) == 0
+    assert rate <= DRAIN_RATE * 1.1, "drain rate limit exceeded"
+
+    titles = [
+        f["title"]
+        for f in drive.files.values()
+        if f.get("mimeType") != "application/vnd.google-apps.folder"
+    ]
+    assert sorted(titles) == sorted(os.path.basename(p) for p in paths), (
+        "lost or duplicated uploads"
+    )
+    assert not catalog.pending_uploads()
+
+    stats = enforce_retention(root, keep_days=1, catalog=catalog, logger=logger)
+    assert not any(os.path.exists(path) for path in paths)
+    print(f"retention after drain: {stats}")
+    catalog.close()
+    shutil.rmtree(root)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
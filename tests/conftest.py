@@ -0,0 +1,26 @@
+# shared fixtures: an isolated output folder, and the fake backends from benchmarks/
+import os
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+)
+sys.path.insert(0, BENCHMARKS)
+
+
+@pytest.fixture
+def output_folder(tmp_path, monkeypatch):
+    """A fresh OUTPUT_FOLDER, with the process-wide config re-read around the test."""
+    from baby_care_ai.config import load_config
+
+    folder = tmp_path / "images"
+    folder.mkdir()
+    monkeypatch.setenv("OUTPUT_FOLDER", str(folder))
+    monkeypatch.setenv("CONFIG_JSON_PATH", str(tmp_path / "blink.json"))
+    monkeypatch.setenv("GOOGLE_DRIVE_PHOTO_FOLDER_NAME", "BabyCarePhotos")
+    load_config(reload=True)
+    yield str(folder)
+    monkeypatch.undo()
+    load_config(reload=True)
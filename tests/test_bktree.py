@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from baby_care_ai.blink.bktree import BKTree, hamming
+from baby_care_ai.blink.dedup import find_duplicates
+
+
+def clustered_hashes(count: int, seed: int = 0, cluster: int = 20) -> list:
+    """(name, hash) pairs: clusters of a base hash with up to four flipped bits."""
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        base = rng.getrandbits(64)
+        for _ in range(cluster):
+            value = base
+            for _ in range(rng.randint(0, 4)):
+                value ^= 1 << rng.randrange(64)
+            hashes.append((f"{len(hashes):06d}.jpg", value))
+    return hashes[:count]
+
+
+def brute_force(hashes: list, threshold: int) -> list:
+    kept, duplicates = [], []
+    for path, value in hashes:
+        if any(hamming(value, other) <= threshold for other in kept):
+            duplicates.append(path)
+        else:
+            kept.append(value)
+    return duplicates
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(0, 2**64 - 1) == 64
+
+
+@pytest.mark.parametrize("threshold", [0, 1, 3, 10])
+def test_search_matches_brute_force(threshold):
+    rng = random.Random(1)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for value in values:
+        tree.add(value, f"{value:016x}")
+    assert len(tree) == len(values)
+    for _ in range(50):
+        query = rng.choice(values) ^ (1 << rng.randrange(64))
+        matches = tree.search(query, threshold)
+        assert sorted(v for _, v, _ in matches) == sorted(
+            v for v in values if hamming(v, query) <= threshold
+        )
+        assert [d for d, _, _ in matches] == sorted(d for d, _, _ in matches)
+        assert all(payload == f"{v:016x}" for _, v, payload in matches)
+
+
+def test_find_within_on_empty_and_missing():
+    tree = BKTree()
+    assert tree.find_within(123, 5) is None
+    tree.add(0, "a.jpg")
+    assert tree.find_within(0b111, 2) is None
+    assert tree.find_within(0b11, 2) == (2, 0, "a.jpg")
+
+
+@pytest.mark.parametrize("threshold", [0, 2, 4, 6])
+def test_find_duplicates_matches_brute_force(threshold):
+    hashes = clustered_hashes(2000, seed=threshold)
+    assert find_duplicates(hashes, threshold) == brute_force(hashes, threshold)
+
+
+def test_find_duplicates_keeps_the_first_of_a_cluster():
+    hashes = [
+        ("a.jpg", 0b0000),
+        ("b.jpg", 0b0001),
+        ("c.jpg", 0b1111),
+        ("d.jpg", 0b0011),
+    ]
+    assert find_duplicates(hashes, 0) == []
+    assert find_duplicates(hashes, 1) == ["b.jpg"]
+    assert find_duplicates(hashes, 2) == ["b.jpg", "d.jpg"]
@@ -0,0 +1,59 @@
+import asyncio
+
+from fakes import FakeBlink
+
+from baby_care_ai.blink.collect import snap_concurrent
+from baby_care_ai.health import CLOSED, OPEN, HealthRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BrokenRefreshBlink(FakeBlink):
+    """A FakeBlink whose account-wide refresh fails until `broken` is cleared."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.broken = True
+
+    async def refresh(self, force=False):
+        await super().refresh(force)
+        if self.broken:
+            raise ConnectionError("refresh failed")
+
+
+def snap(blink, health) -> list:
+    return asyncio.run(
+        snap_concurrent(
+            blink, blink.cameras, timeout=1.0, in_memory=True, health=health
+        )
+    )
+
+
+def test_refresh_failure_ends_the_probe(output_folder):
+    clock = Clock()
+    health = HealthRegistry(failure_threshold=1, cooloff=10.0, clock=clock)
+    blink = BrokenRefreshBlink(
+        camera_count=2, snap_latency=0.0, download_latency=0.0, refresh_latency=0.0
+    )
+    device = "blink:Camera 0"
+    health.record_failure(device, "earlier failure")
+    assert health.state(device) == OPEN
+
+    clock.now += 10.0
+    assert snap(blink, health) == []
+    # The failed probe reopened the circuit instead of staying in flight
+    assert health.state(device) == OPEN
+    assert health.status()[device]["retry_in"] == 20.0
+    assert "refresh failed" in health.status()["blink:Camera 1"]["last_error"]
+
+    blink.broken = False
+    clock.now += 20.0
+    frames = snap(blink, health)  # the next probe succeeds
+    assert sorted(camera for camera, _, _ in frames) == ["camera_0", "camera_1"]
+    assert health.state(device) == CLOSED
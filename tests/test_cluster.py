@@ -0,0 +1,193 @@
+import threading
+import time
+
+import pytest
+from fakes import FakeConnection
+
+from baby_care_ai.cluster import CollectionWorker, Coordinator, assign_cameras
+from baby_care_ai.rpi.collect import RPiCapturePool
+
+CAMERAS = 6
+HEARTBEAT_INTERVAL = 0.05
+HEARTBEAT_TIMEOUT = 10.0  # virtual seconds on the coordinator's clock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Sink:
+    """Frames the coordinator received, by (camera, timestamp)."""
+
+    def __init__(self):
+        self.frames = []
+        self._lock = threading.Lock()
+
+    def __call__(self, camera, timestamp, data):
+        with self._lock:
+            self.frames.append((camera, timestamp))
+
+
+class FakeBlinkCollector:
+    """Just enough of `BlinkCollector` to be listed; records the threads that list it."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.threads = []
+
+    def camera_names(self):
+        self.threads.append(threading.current_thread().name)
+        return list(self.names)
+
+    def collect(self, camera_names, in_memory=False):
+        return []
+
+
+def fake_pool() -> RPiCapturePool:
+    configs = {
+        str(i): {"HOST": f"10.0.0.{i + 1}", "USER_NAME": "pi", "NAME": f"pi {i}"}
+        for i in range(CAMERAS)
+    }
+
+    def factory(host, user, password, logger=None):
+        return FakeConnection(host, 0.0, 0.01, 0.0)
+
+    return RPiCapturePool(configs, connection_factory=factory, stream=True)
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    clock = Clock()
+    sink = Sink()
+    coordinator = Coordinator(
+        port=0,
+        output_folder=str(tmp_path),
+        sink=sink,
+        token="secret",
+        heartbeat_timeout=HEARTBEAT_TIMEOUT,
+        clock=clock,
+    ).start()
+    workers = []
+
+    def add_worker(worker_id, **kwargs):
+        kwargs.setdefault("rpi_pool", fake_pool())
+        worker = CollectionWorker(
+            coordinator.url,
+            worker_id=worker_id,
+            token="secret",
+            heartbeat_interval=HEARTBEAT_INTERVAL,
+            **kwargs,
+        )
+        worker.start()
+        workers.append(worker)
+        return worker
+
+    yield coordinator, clock, sink, add_worker
+    for worker in workers:
+        worker.stop()
+        if worker.rpi_pool is not None:
+            worker.rpi_pool.close()
+    coordinator.stop()
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def settled(coordinator, workers) -> bool:
+    return all(w.generation == coordinator.generation for w in workers)
+
+
+def test_assign_cameras_is_a_balanced_partition():
+    cameras = [f"rpi:{i}" for i in range(10)]
+    assignment = assign_cameras({"a": cameras, "b": cameras, "c": cameras})
+    assert sorted(c for owned in assignment.values() for c in owned) == cameras
+    assert (
+        max(len(owned) for owned in assignment.values()) <= 4
+    )  # the even share, rounded up
+
+    # A worker only gets cameras it can reach
+    assignment = assign_cameras({"a": cameras, "b": cameras, "c": cameras[:5]})
+    assert sorted(c for owned in assignment.values() for c in owned) == cameras
+    assert set(assignment["c"]) <= set(cameras[:5])
+
+
+def test_workers_share_the_cameras_and_fail_over(cluster):
+    coordinator, clock, sink, add_worker = cluster
+    workers = [add_worker(f"w{i}") for i in range(3)]
+    wait_for(lambda: settled(coordinator, workers))
+    owned = [camera for w in workers for camera in w.assigned]
+    assert sorted(owned) == sorted(f"rpi:{i}" for i in range(CAMERAS))
+
+    assert sum(w.capture_once() for w in workers) == CAMERAS
+    assert sorted(camera for camera, _ in sink.frames) == sorted(
+        f"pi_{i}" for i in range(CAMERAS)
+    )
+
+    # w2 dies; the survivors keep heartbeating through the timeout
+    workers[2].stop()
+    orphaned = set(workers[2].assigned)
+    clock.now += HEARTBEAT_TIMEOUT + 1
+    wait_for(
+        lambda: all(
+            coordinator.status()["workers"][w.worker_id]["last_seen"] < 1
+            for w in workers[:2]
+        )
+    )
+    assert coordinator.reap() == ["w2"]
+    wait_for(lambda: settled(coordinator, workers[:2]))
+    survivors = set(workers[0].assigned) | set(workers[1].assigned)
+    assert orphaned <= survivors and len(survivors) == CAMERAS
+
+    sink.frames.clear()
+    assert sum(w.capture_once() for w in workers[:2]) == CAMERAS
+
+
+def test_forgotten_worker_registers_again_from_the_cached_cameras(cluster):
+    coordinator, _, _, add_worker = cluster
+    blink = FakeBlinkCollector(["Nursery"])
+    worker = add_worker("w0", blink_collector=blink)
+    assert blink.threads == [threading.current_thread().name]
+
+    with coordinator._lock:
+        coordinator.workers.clear()  # e.g. the coordinator restarted
+    wait_for(lambda: coordinator.is_worker("w0"))
+    assert "blink:Nursery" in coordinator.status()["workers"]["w0"]["reachable"]
+    assert blink.threads == [threading.current_thread().name], (
+        "listed from the heartbeat thread"
+    )
+
+    # A camera that appears is registered after the next capture cycle
+    blink.names.append("Hallway")
+    worker.capture_once()
+    wait_for(
+        lambda: "blink:Hallway" in coordinator.status()["workers"]["w0"]["reachable"]
+    )
+
+
+def test_heartbeat_survives_unexpected_errors(cluster):
+    coordinator, _, _, add_worker = cluster
+    worker = add_worker("w0")
+    request = worker._request
+    failures = []
+
+    def flaky(path, *args, **kwargs):
+        if path == "/heartbeat" and len(failures) < 2:
+            failures.append(path)
+            raise ValueError("malformed reply")
+        return request(path, *args, **kwargs)
+
+    worker._request = flaky
+    wait_for(lambda: len(failures) == 2)
+    seen = coordinator.status()["workers"]["w0"]["last_seen"]
+    with coordinator._lock:
+        coordinator.workers["w0"]["seen"] -= 5
+    wait_for(lambda: coordinator.status()["workers"]["w0"]["last_seen"] <= seen)
+    assert worker._heartbeat_thread.is_alive()
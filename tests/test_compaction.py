@@ -0,0 +1,103 @@
+import os
+import threading
+
+import pytest
+from fakes import FakeDrive, synthetic_frames
+
+from baby_care_ai.catalog import CaptureCatalog
+from baby_care_ai.compaction import Compactor, compact_captures, original_path
+from baby_care_ai.gooogle_drive.incremental import IncrementalSync
+from baby_care_ai.storage import capture_path
+
+FRAMES = 6
+
+
+@pytest.fixture
+def captures(output_folder):
+    """Kept JPEG captures in a catalog, with the bytes each was written with."""
+    catalog = CaptureCatalog(output_folder)
+    written = {}
+    for i, data in enumerate(synthetic_frames(FRAMES, 0.0, (640, 480), seed=3)):
+        path = capture_path(output_folder, "camera_0", f"20260101_0000{i:02d}")
+        with open(path, "wb") as f:
+            f.write(data)
+        written[path] = data
+    catalog.record_captures(
+        list(written), hashes={p: f"{i:016x}" for i, p in enumerate(written)}
+    )
+    yield catalog, written
+    catalog.close()
+
+
+def jpeg_compactor() -> Compactor:
+    # JPEG keeps the name, so compacting twice would overwrite the kept original
+    return Compactor("jpeg", quality=60, max_dimension=160)
+
+
+def assert_originals_kept(written: dict) -> None:
+    for path, data in written.items():
+        with open(original_path(path), "rb") as f:
+            assert f.read() == data, f"original of {path} was overwritten"
+        assert os.path.getsize(path) < len(data)
+    folder = os.path.dirname(next(iter(written)))
+    assert not [name for name in os.listdir(folder) if name.endswith(".compact")]
+
+
+def test_concurrent_passes_compact_each_capture_once(captures):
+    catalog, written = captures
+    results = []
+    barrier = threading.Barrier(2)
+
+    def compact():
+        barrier.wait()
+        results.append(compact_captures(catalog, jpeg_compactor()))
+
+    threads = [threading.Thread(target=compact) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(path for result in results for path in result) == sorted(written)
+    assert not catalog.uncompacted()
+    assert_originals_kept(written)
+
+
+def test_syncer_does_not_compact_again(captures):
+    catalog, written = captures
+    compact_captures(catalog, jpeg_compactor())
+    drive = FakeDrive(latency=0)
+    syncer = IncrementalSync(drive, catalog, compactor=jpeg_compactor())
+    # e.g. the watcher reporting the compacted files
+    assert sorted(
+        syncer._compact(os.path.dirname(next(iter(written))), list(written))
+    ) == sorted(written)
+    assert_originals_kept(written)
+
+
+def test_syncer_leaves_claimed_captures_alone(captures):
+    catalog, written = captures
+    paths = sorted(written)
+    claimed = catalog.claim(paths[:2])  # the dedup job is compacting these
+    syncer = IncrementalSync(FakeDrive(latency=0), catalog, compactor=jpeg_compactor())
+    assert sorted(syncer.process(paths)) == paths[2:]
+    catalog.release(claimed)
+    assert sorted(path for _, path in catalog.uncompacted()) == paths[:2]
+    assert compact_captures(catalog, jpeg_compactor()).keys() == set(paths[:2])
+    assert_originals_kept({path: written[path] for path in paths[:2]})
+
+
+def test_captures_kept_without_a_hash_are_compacted(output_folder):
+    # What the dedup job records for the captures the embedding strategy kept
+    catalog = CaptureCatalog(output_folder)
+    try:
+        data = synthetic_frames(1, 0.0, (640, 480), seed=4)[0]
+        path = capture_path(output_folder, "camera_0", "20260101_000000")
+        with open(path, "wb") as f:
+            f.write(data)
+        catalog.record_captures([path], hashes={path: "00000000000000ff"})
+        catalog.mark_kept({path: None})
+        assert catalog.kept_hashes("camera_0", "20260101") == {path: "00000000000000ff"}
+        assert compact_captures(catalog, jpeg_compactor()) == {path: path}
+        assert_originals_kept({path: data})
+    finally:
+        catalog.close()
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+from fakes import synthetic_frames
+
+from baby_care_ai.blink.dedup import deduplicate_captures
+from baby_care_ai.catalog import KEPT, NEW, CaptureCatalog
+from baby_care_ai.storage import capture_path
+
+
+@pytest.fixture
+def catalog(output_folder):
+    catalog = CaptureCatalog(output_folder)
+    yield catalog
+    catalog.close()
+
+
+def status_of(catalog, path: str) -> str:
+    with catalog._lock:
+        return catalog.conn.execute(
+            "SELECT status FROM captures WHERE path = ?", (path,)
+        ).fetchone()[0]
+
+
+def test_claimed_and_uploaded_captures_are_never_removed(output_folder, catalog):
+    data = synthetic_frames(1, 0.0, seed=6)[0]
+    paths = [
+        capture_path(output_folder, "nursery", f"20260101_00000{i}") for i in range(4)
+    ]
+    for path in paths:
+        with open(path, "wb") as f:
+            f.write(data)  # four identical frames
+    catalog.record_captures(paths)
+    catalog.record_uploads([("nursery", paths[2], "drive-2")])  # uploaded before dedup
+    claimed = catalog.claim(paths[1:2])  # e.g. the upload queue uploading it now
+
+    assert deduplicate_captures(catalog) == 2
+    assert [os.path.exists(path) for path in paths] == [False, True, True, False]
+    assert status_of(catalog, paths[1]) == NEW
+    assert status_of(catalog, paths[2]) == KEPT
+
+    catalog.release(claimed)
+    assert deduplicate_captures(catalog) == 1
+    assert not os.path.exists(paths[1])
@@ -0,0 +1,180 @@
+import os
+import socket
+import ssl
+import threading
+
+import httplib2
+import pytest
+from fakes import FakeDrive, _api_error, _http_error
+
+from baby_care_ai import metrics
+from baby_care_ai.gooogle_drive import drive_utils
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(drive_utils, "BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(drive_utils, "BACKOFF_MAX", 0.5)
+
+
+class FlakyDrive(FakeDrive):
+    """A FakeDrive whose first `failures` requests fail with `status`."""
+
+    def __init__(self, failures: int, status: int = 503, **kwargs):
+        super().__init__(latency=0.0, **kwargs)
+        self.failures = failures
+        self.status = status
+
+    def _request(self, http_error=False):
+        super()._request(http_error)
+        with self._lock:
+            if self.failures <= 0:
+                return
+            self.failures -= 1
+        raise _http_error(self.status) if http_error else _api_error(self.status)
+
+
+def retries() -> float:
+    return sum(
+        v
+        for _, v in metrics.counter(
+            "drive_retries_total", "Drive requests retried"
+        ).samples()
+    )
+
+
+def write_files(folder, count: int, size: int = 1024) -> list:
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"20260101_{i:06d}.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (_api_error(429, "rateLimitExceeded"), (True, True)),
+        (_http_error(403, "userRateLimitExceeded"), (True, True)),
+        (_api_error(503, "backendError"), (True, False)),
+        (_http_error(500), (True, False)),
+        (_api_error(404, "notFound"), (False, False)),
+        (_http_error(403, "insufficientPermissions"), (False, False)),
+        (ValueError("bad"), (False, False)),
+        (ConnectionResetError("reset by peer"), (True, False)),
+        (socket.timeout("timed out"), (True, False)),
+        (ssl.SSLError("bad record mac"), (True, False)),
+        (httplib2.ServerNotFoundError("no DNS"), (True, False)),
+        (ssl.SSLCertVerificationError("self-signed"), (False, False)),
+        (FileNotFoundError("gone"), (False, False)),
+    ],
+)
+def test_retry_reason(error, expected):
+    assert drive_utils._retry_reason(error) == expected
+
+
+def test_transient_errors_are_retried(tmp_path):
+    (path,) = write_files(tmp_path, 1)
+    drive = FlakyDrive(failures=2)
+    before = retries()
+    drive_id = drive_utils.upload_file(drive, path, "fake-1")
+    assert drive.files[drive_id]["title"] == os.path.basename(path)
+    assert drive.api_calls == 3
+    assert retries() - before == 2
+
+
+def test_retries_give_up_after_max_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(drive_utils, "MAX_RETRIES", 2)
+    (path,) = write_files(tmp_path, 1)
+    drive = FakeDrive(latency=0.0)
+    drive.offline = True
+    with pytest.raises(Exception) as raised:
+        drive_utils.upload_file(drive, path, "fake-1")
+    assert drive_utils._retry_reason(raised.value) == (True, False)
+    assert drive.api_calls == 3  # the first try and two retries
+
+
+def test_permanent_errors_are_not_retried(tmp_path):
+    (path,) = write_files(tmp_path, 1)
+    drive = FlakyDrive(failures=1, status=404)
+    with pytest.raises(Exception):
+        drive_utils.upload_file(drive, path, "fake-1")
+    assert drive.api_calls == 1
+
+
+def test_upload_recovers_when_drive_comes_back(tmp_path):
+    (path,) = write_files(tmp_path, 1)
+    drive = FakeDrive(latency=0.0)
+    drive.offline = True
+    threading.Timer(0.1, setattr, (drive, "offline", False)).start()
+    drive_id = drive_utils.upload_file(drive, path, "fake-1")
+    assert drive_id in drive.files and drive.api_calls > 1
+
+
+def test_resumable_upload_retries_only_the_failed_chunk(tmp_path):
+    chunk = 256 * 1024
+    (path,) = write_files(tmp_path, 1, size=3 * chunk)
+    drive = FlakyDrive(failures=2)
+    drive_id = drive_utils.upload_file(
+        drive, path, "fake-1", resumable=True, chunk_size=chunk
+    )
+    assert drive.files[drive_id]["title"] == os.path.basename(path)
+    assert drive.api_calls == 3 + 2
+    assert drive.bytes_uploaded == 3 * chunk
+
+
+class DroppingDrive(FakeDrive):
+    """A FakeDrive whose connection drops on the `drop_at`-th chunk request, once."""
+
+    def __init__(self, drop_at: int):
+        super().__init__(latency=0.0)
+        self.drop_at = drop_at
+
+    def _request(self, http_error=False):
+        super()._request(http_error)
+        if self.api_calls == self.drop_at:
+            raise ConnectionResetError("Connection reset by peer")
+
+
+def test_resumable_upload_survives_a_dropped_connection(tmp_path):
+    chunk = 256 * 1024
+    (path,) = write_files(tmp_path, 1, size=3 * chunk)
+    drive = DroppingDrive(drop_at=2)
+    before = retries()
+    drive_id = drive_utils.upload_file(
+        drive, path, "fake-1", resumable=True, chunk_size=chunk
+    )
+    assert drive.files[drive_id]["title"] == os.path.basename(path)
+    assert drive.api_calls == 3 + 1  # only the second chunk was sent again
+    assert drive.bytes_uploaded == 3 * chunk
+    assert retries() - before == 1
+
+
+def test_rate_limited_pool_uploads_everything(tmp_path, monkeypatch):
+    # Retries must outlast the fake's one-second rate window
+    monkeypatch.setattr(drive_utils, "BACKOFF_BASE", 0.2)
+    monkeypatch.setattr(drive_utils, "BACKOFF_MAX", 60.0)
+    paths = write_files(tmp_path, 40)
+    drive = FakeDrive(latency=0.01, max_rate=20)
+    before = retries()
+    uploaded = drive_utils.upload_many(drive, [(p, "fake-1") for p in paths], workers=8)
+    assert sorted(uploaded) == sorted(paths)
+    titles = [
+        f["title"] for f in drive.files.values() if f.get("title", "").endswith(".jpg")
+    ]
+    assert sorted(titles) == sorted(os.path.basename(p) for p in paths)
+    assert retries() > before  # the quota was hit and backed off from
+
+
+def test_rate_limiter_backs_off_and_recovers():
+    limiter = drive_utils.RateLimiter(cooldown=60.0)
+    limiter.throttled()
+    assert limiter.interval == pytest.approx(0.02)
+    limiter.throttled()  # within the cooldown: rejections of in-flight requests count once
+    assert limiter.interval == pytest.approx(0.02)
+    for _ in range(1000):
+        limiter.succeeded()
+    assert limiter.interval == 0.0
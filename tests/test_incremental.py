@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from fakes import FakeDrive, synthetic_frames
+
+from baby_care_ai.blink.bktree import BKTree
+from baby_care_ai.blink.dedup import deduplicate_captures
+from baby_care_ai.catalog import CaptureCatalog
+from baby_care_ai.gooogle_drive.incremental import IncrementalSync
+from baby_care_ai.storage import capture_path
+
+
+@pytest.fixture
+def catalog(output_folder):
+    catalog = CaptureCatalog(output_folder)
+    yield catalog
+    catalog.close()
+
+
+def write_captures(root, catalog, frames: list) -> list:
+    paths = []
+    for i, data in enumerate(frames):
+        path = capture_path(root, "nursery", f"20260101_0000{i:02d}")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    catalog.record_captures(paths)
+    return paths
+
+
+def test_dedup_results_are_recorded_in_the_catalog(output_folder, catalog):
+    frames = synthetic_frames(4, 0.0, seed=7)
+    paths = write_captures(output_folder, catalog, frames + frames[:1])
+    syncer = IncrementalSync(FakeDrive(latency=0), catalog)
+    assert sorted(syncer.process(paths)) == paths[:4]
+    assert not os.path.exists(paths[4])
+    assert set(catalog.kept_hashes("nursery", "20260101")) == set(paths[:4])
+    assert not catalog.new_captures()
+    # The dedup job has nothing left to check
+    assert deduplicate_captures(catalog) == 0
+    assert all(os.path.exists(path) for path in paths[:4])
+
+
+def test_duplicates_of_a_deleted_image_match_another_kept_one(output_folder, catalog):
+    data = synthetic_frames(1, 0.0, seed=8)[0]
+    kept, new = write_captures(output_folder, catalog, [data, data])
+    syncer = IncrementalSync(FakeDrive(latency=0), catalog)
+    syncer.process([kept])
+    img_hash = int(catalog.kept_hashes("nursery", "20260101")[kept], 16)
+    # The tree's first match was kept earlier and deleted since
+    gone = capture_path(output_folder, "nursery", "20260101_000099")
+    tree = BKTree()
+    tree.add(img_hash, gone)
+    tree.add(img_hash, kept)
+    folder = os.path.dirname(kept)
+    syncer._trees[(folder, "20260101")] = (tree, {gone, kept})
+    assert syncer.process([new]) == {}
+    assert not os.path.exists(new)
+    assert syncer._trees[(folder, "20260101")][1] == {kept}
@@ -0,0 +1,63 @@
+import os
+
+from fakes import FakeDrive, FakeDriveFile
+
+from baby_care_ai.gooogle_drive.manifest import FOLDER_MIME_TYPE, UploadManifest
+
+
+class UploadingDrive(FakeDrive):
+    """A FakeDrive that runs `during_listing` while a room folder is listed."""
+
+    def __init__(self):
+        super().__init__(latency=0.0)
+        self.during_listing = None
+
+    def ListFile(self, param=None):
+        listing = super().ListFile(param)
+        if self.during_listing is not None and "mimeType" not in param["q"]:
+            self.during_listing()
+        return listing
+
+
+def write(folder, name: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(100))
+    return path
+
+
+def add_room(drive, parent_id: str, room: str) -> str:
+    folder = {
+        "title": room,
+        "mimeType": FOLDER_MIME_TYPE,
+        "parents": [{"id": parent_id}],
+    }
+    return drive._store(FakeDriveFile(drive, folder), 0)["id"]
+
+
+def test_reconcile_keeps_uploads_recorded_during_the_listing(tmp_path):
+    drive = UploadingDrive()
+    parent_id = next(iter(drive.files))
+    add_room(drive, parent_id, "nursery")
+    manifest = UploadManifest(str(tmp_path))
+    try:
+        gone, claimed, late = (
+            write(tmp_path, f"20260101_00000{i}.jpg") for i in range(3)
+        )
+        manifest.record_uploads([("nursery", gone, "deleted-remotely")])
+        manifest.record_uploads([("nursery", claimed, "being-replaced")])
+        manifest.claim([claimed])  # e.g. an uploader re-uploading it right now
+        # A concurrent upload finishes after the room was listed
+        drive.during_listing = lambda: manifest.record_uploads(
+            [("nursery", late, "fake-9")]
+        )
+
+        counts = manifest.reconcile(drive, parent_id)
+
+        assert counts["removed"] == 1
+        assert manifest.uploaded_names("nursery") == {
+            os.path.basename(claimed),
+            os.path.basename(late),
+        }
+    finally:
+        manifest.close()
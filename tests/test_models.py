@@ -0,0 +1,9 @@
+import sys
+
+from baby_care_ai.models import utils
+
+
+def test_peak_rss_without_resource(monkeypatch):
+    assert utils._peak_rss() > 0
+    monkeypatch.setitem(sys.modules, "resource", None)  # as on Windows
+    assert utils._peak_rss() == 0
@@ -0,0 +1,30 @@
+import os
+
+from fakes import synthetic_frames
+
+from baby_care_ai.blink.dedup import deduplicate_captures
+from baby_care_ai.catalog import CaptureCatalog
+from baby_care_ai.pack import pack_captures, packed_names
+from baby_care_ai.storage import capture_path
+
+
+def test_captures_kept_without_a_hash_are_packed(output_folder):
+    catalog = CaptureCatalog(output_folder)
+    try:
+        readable = capture_path(output_folder, "nursery", "20260101_000000")
+        with open(readable, "wb") as f:
+            f.write(synthetic_frames(1, 0.0, seed=9)[0])
+        unreadable = capture_path(output_folder, "nursery", "20260101_000001")
+        with open(unreadable, "wb") as f:
+            f.write(b"not a jpeg")
+        catalog.record_captures([readable, unreadable])
+        deduplicate_captures(catalog)  # keeps the unreadable capture without a hash
+        assert catalog.kept_paths("nursery", "20260101") == [readable, unreadable]
+
+        assert pack_captures(output_folder, catalog=catalog) == 2
+        assert packed_names(os.path.dirname(readable)) == {
+            os.path.basename(readable),
+            os.path.basename(unreadable),
+        }
+    finally:
+        catalog.close()
@@ -0,0 +1,114 @@
+import os
+import time
+
+from fakes import FakeConnection
+
+from baby_care_ai import metrics
+from baby_care_ai.rpi.collect import RPiCapturePool
+
+CAPTURE_LATENCY = 0.2
+
+
+def configs(count: int) -> dict:
+    return {
+        str(i): {"HOST": f"10.0.0.{i}", "USER_NAME": "pi", "NAME": f"pi {i}"}
+        for i in range(1, count + 1)
+    }
+
+
+class Factory:
+    """Connection factory that remembers every connection it opened, per host."""
+
+    def __init__(self, fail_once: set = (), broken: set = ()):
+        self.fail_once = set(fail_once)  # the first connection's first command fails
+        self.broken = set(broken)  # every command on every connection fails
+        self.connections = {}
+
+    def __call__(self, host, user, password, logger=None):
+        if host in self.broken:
+            fail_next = 10**6
+        elif host in self.fail_once:
+            self.fail_once.discard(host)
+            fail_next = 1
+        else:
+            fail_next = 0
+        conn = FakeConnection(host, 0.0, CAPTURE_LATENCY, 0.0, fail_next=fail_next)
+        self.connections.setdefault(host, []).append(conn)
+        return conn
+
+
+def test_devices_are_captured_in_parallel(output_folder):
+    pool = RPiCapturePool(configs(4), connection_factory=Factory())
+    try:
+        start = time.perf_counter()
+        results = pool.capture_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+    assert sorted(results) == ["1", "2", "3", "4"]
+    assert all(os.path.exists(result["path"]) for result in results.values())
+    assert all(result["path"].startswith(output_folder) for result in results.values())
+    assert elapsed < 2 * CAPTURE_LATENCY  # serial would take 4x
+
+
+def test_connections_are_reused_across_cycles(output_folder):
+    factory = Factory()
+    pool = RPiCapturePool(configs(2), connection_factory=factory, stream=True)
+    try:
+        for _ in range(3):
+            results = pool.capture_all(in_memory=True)
+            assert all(result["data"] for result in results.values())
+    finally:
+        pool.close()
+    assert {host: len(conns) for host, conns in factory.connections.items()} == {
+        "10.0.0.1": 1,
+        "10.0.0.2": 1,
+    }
+    assert all(conns[0].opens == 1 for conns in factory.connections.values())
+
+
+def test_failed_capture_reconnects_once(output_folder):
+    factory = Factory(fail_once={"10.0.0.1"})
+    pool = RPiCapturePool(configs(2), connection_factory=factory)
+    try:
+        results = pool.capture_all()
+    finally:
+        pool.close()
+    assert all(result["path"] for result in results.values()), results
+    assert len(factory.connections["10.0.0.1"]) == 2
+    assert len(factory.connections["10.0.0.2"]) == 1
+
+
+def test_persistent_failure_is_reported_without_blocking_others(output_folder):
+    factory = Factory(broken={"10.0.0.1"})
+    pool = RPiCapturePool(configs(2), connection_factory=factory)
+    try:
+        results = pool.capture_all()
+    finally:
+        pool.close()
+    assert "error" in results["1"] and results["1"]["path"] is None
+    assert results["2"]["path"] and "error" not in results["2"]
+
+
+def test_capture_subset_of_devices(output_folder):
+    pool = RPiCapturePool(configs(3), connection_factory=Factory())
+    try:
+        results = pool.capture_all(devices=["2"])
+    finally:
+        pool.close()
+    assert list(results) == ["2"]
+
+
+def test_late_in_memory_frames_are_counted(output_folder):
+    dropped = metrics.counter(
+        "late_frames_dropped_total", "In-memory frames that missed their deadline"
+    )
+    before = sum(value for _, value in dropped.samples())
+    pool = RPiCapturePool(configs(1), connection_factory=Factory(), deadline=0.05)
+    try:
+        results = pool.capture_all(in_memory=True)
+        assert "deadline" in results["1"]["error"]
+        time.sleep(2 * CAPTURE_LATENCY)  # the capture finishes late
+    finally:
+        pool.close()
+    assert sum(value for _, value in dropped.samples()) - before == 1
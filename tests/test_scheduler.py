@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from baby_care_ai.scheduler import Scheduler
+
+
+class Clock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler()
+    scheduler._loop = Clock()
+    return scheduler
+
+
+def test_on_time_runs_keep_the_grid(scheduler):
+    job = scheduler.add_job("sync", lambda: None, 10, missed_policy="coalesce")
+    scheduler._loop.now = 4.0
+    assert scheduler._advance(job, 0.0) == (10.0, False)
+    assert job.missed == 0
+
+
+@pytest.mark.parametrize("policy, catch_up", [("skip", False), ("coalesce", True)])
+def test_missed_runs_resume_at_the_next_slot(scheduler, policy, catch_up):
+    job = scheduler.add_job("sync", lambda: None, 10, missed_policy=policy)
+    scheduler._loop.now = 35.0
+    assert scheduler._advance(job, 0.0) == (40.0, catch_up)
+    assert job.missed == 3
+
+
+def test_coalesced_run_keeps_the_cadence():
+    runs = []
+    scheduler = Scheduler()
+
+    def slow():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            time.sleep(0.5)  # misses two slots
+        elif len(runs) == 4:
+            scheduler.stop()
+
+    job = scheduler.add_job("slow", slow, 0.2, missed_policy="coalesce")
+    scheduler.run()
+    assert job.missed == 2
+    start = runs[0]
+    # Made up at once after the slow run, then back on the 0.2 s grid
+    assert runs[1] - start == pytest.approx(0.5, abs=0.04)
+    assert runs[2] - start == pytest.approx(0.6, abs=0.04)
+    assert runs[3] - start == pytest.approx(0.8, abs=0.04)
+
+
+def test_jobs_sharing_a_lock_never_overlap():
+    lock = threading.Lock()
+    running = []
+    overlaps = []
+    scheduler = Scheduler()
+
+    def job():
+        running.append(1)
+        overlaps.append(len(running) > 1)
+        time.sleep(0.05)
+        running.pop()
+
+    for name in ("dedup", "sync", "retention"):
+        scheduler.add_job(name, job, 0.05, lock=lock)
+    threading.Timer(0.5, scheduler.stop).start()
+    scheduler.run()
+    assert len(overlaps) >= 3
+    assert not any(overlaps)
@@ -0,0 +1,190 @@
+import datetime
+import os
+
+import pytest
+from fakes import FakeDrive, _api_error
+
+from baby_care_ai.catalog import CaptureCatalog
+from baby_care_ai.gooogle_drive import drive_utils
+from baby_care_ai.gooogle_drive.upload_queue import DurableUploadQueue
+from baby_care_ai.retention import enforce_retention
+from baby_care_ai.storage import capture_path
+
+
+class PickyDrive(FakeDrive):
+    """A FakeDrive that rejects the uploads of some file names with an HTTP status."""
+
+    def __init__(self, reject: dict = None):
+        super().__init__(latency=0.0)
+        self.reject = dict(reject or {})
+
+    def CreateFile(self, metadata=None):
+        drive_file = super().CreateFile(metadata)
+        status = self.reject.get(drive_file.get("title"))
+        if status:
+
+            def upload(param=None):
+                self._request()
+                raise _api_error(status)
+
+            drive_file.Upload = upload
+        return drive_file
+
+
+@pytest.fixture(autouse=True)
+def fail_fast(monkeypatch):
+    # The queue's own backoff handles failures; upload_file gives up at once
+    monkeypatch.setattr(drive_utils, "MAX_RETRIES", 0)
+
+
+@pytest.fixture
+def catalog(output_folder):
+    catalog = CaptureCatalog(output_folder)
+    yield catalog
+    catalog.close()
+
+
+def capture(root, catalog, count: int) -> list:
+    paths = []
+    for i in range(count):
+        path = capture_path(root, "nursery", f"20260101_{i:06d}")
+        with open(path, "wb") as f:
+            f.write(os.urandom(1000))
+        paths.append(path)
+    catalog.record_captures(paths)
+    return paths
+
+
+def make_queue(root, drive, catalog, **kwargs) -> DurableUploadQueue:
+    kwargs.setdefault("drain_rate", 0)
+    kwargs.setdefault("retry_base", 60.0)
+    return DurableUploadQueue(root, drive, manifest=catalog, **kwargs)
+
+
+def drain(queue) -> int:
+    drained = 0
+    while queue.drain_once():
+        drained += 1
+    return drained
+
+
+def uploaded_titles(drive) -> list:
+    return sorted(
+        f["title"]
+        for f in drive.files.values()
+        if f.get("mimeType") != "application/vnd.google-apps.folder"
+    )
+
+
+def test_outage_pauses_the_queue_and_survives_a_restart(output_folder, catalog):
+    paths = capture(output_folder, catalog, 10)
+    drive = FakeDrive(latency=0.0)
+    drive.offline = True
+    queue = make_queue(output_folder, drive, catalog, memory_size=4)
+    queue.put_many(catalog.pending_uploads())
+    assert len(queue) == 10 and queue.stats["spilled"] == 6
+
+    assert not queue.drain_once()
+    calls = drive.api_calls
+    assert not queue.drain_once()  # paused: no second probe before the backoff ends
+    assert drive.api_calls == calls
+    assert queue.stats == {
+        "uploaded": 0,
+        "failures": 1,
+        "spilled": 6,
+        "dead_lettered": 0,
+    }
+
+    stats = enforce_retention(
+        output_folder,
+        keep_days=1,
+        catalog=catalog,
+        upload_queue=queue,
+        today=datetime.date(2026, 1, 3),
+    )
+    assert stats["pending"] == 10 and all(os.path.exists(p) for p in paths)
+
+    queue.stop()
+    queue = make_queue(output_folder, drive, catalog, memory_size=4)
+    queue.put_many(catalog.pending_uploads())
+    assert len(queue) == 10, "re-queueing pending captures must not duplicate them"
+    drive.offline = False
+    assert drain(queue) == 10
+    queue.stop()
+    assert uploaded_titles(drive) == sorted(os.path.basename(p) for p in paths)
+    assert not catalog.pending_uploads()
+
+
+def test_permanent_error_is_dead_lettered_at_once(output_folder, catalog):
+    paths = capture(output_folder, catalog, 4)
+    poison = os.path.basename(paths[0])
+    drive = PickyDrive(reject={poison: 400})
+    queue = make_queue(output_folder, drive, catalog)
+    try:
+        queue.put_many(catalog.pending_uploads())
+        assert drain(queue) == 4
+        assert len(queue) == 0 and queue.failures == 0
+        assert uploaded_titles(drive) == sorted(os.path.basename(p) for p in paths[1:])
+        ((room, path, attempts, error),) = queue.dead_letters()
+        assert (room, path, attempts) == ("nursery", paths[0], 1) and "400" in error
+
+        # The next sync does not queue it again, retrying it by hand does
+        queue.put_many(catalog.pending_uploads())
+        assert len(queue) == 0
+        del drive.reject[poison]
+        assert queue.retry_dead_letters() == 1
+        assert drain(queue) == 1 and not queue.dead_letters()
+    finally:
+        queue.stop()
+    assert not catalog.pending_uploads()
+
+
+def test_item_that_keeps_failing_is_dead_lettered_after_max_attempts(
+    output_folder, catalog
+):
+    paths = capture(output_folder, catalog, 3)
+    drive = PickyDrive(reject={os.path.basename(paths[0]): 503})
+    queue = make_queue(output_folder, drive, catalog, retry_base=0.0, max_attempts=3)
+    try:
+        queue.put_many(catalog.pending_uploads())
+        for _ in range(2):
+            assert not queue.drain_once()  # retryable: the queue pauses and retries
+            assert len(queue) == 3
+        assert drain(queue) == 3
+        assert [row[:3] for row in queue.dead_letters()] == [("nursery", paths[0], 3)]
+        assert queue.stats["dead_lettered"] == 1 and queue.stats["uploaded"] == 2
+    finally:
+        queue.stop()
+
+
+def test_network_errors_are_not_permanent():
+    assert not drive_utils.is_permanent_error(ConnectionError("network is down"))
+    assert not drive_utils.is_permanent_error(_api_error(401))
+    assert not drive_utils.is_permanent_error(_api_error(503))
+    assert drive_utils.is_permanent_error(_api_error(404))
+
+
+def test_files_claimed_by_another_job_are_uploaded_once(output_folder, catalog):
+    paths = capture(output_folder, catalog, 4)
+    drive = PickyDrive()
+    queue = make_queue(output_folder, drive, catalog)
+    try:
+        queue.put_many([("nursery", path) for path in paths])
+        claimed = catalog.claim(paths[:1])  # e.g. the incremental syncer uploading it
+        assert not queue.drain_once()
+        drive_utils.upload_pending("fake-1", drive, catalog)
+        assert uploaded_titles(drive) == [os.path.basename(p) for p in paths[1:]]
+        catalog.release(claimed)
+        assert drain(queue) == len(paths)
+        assert uploaded_titles(drive) == sorted(os.path.basename(p) for p in paths)
+        assert not catalog.pending_uploads()
+    finally:
+        queue.stop()
+
+
+def test_sync_queues_only_captures_dedup_kept(output_folder, catalog):
+    paths = capture(output_folder, catalog, 3)
+    catalog.mark_kept({paths[0]: None})
+    catalog.mark_duplicates({paths[1]: paths[0]})
+    assert catalog.pending_uploads(kept_only=True) == [("nursery", paths[0])]
+    assert catalog.pending_uploads() == [("nursery", paths[0]), ("nursery", paths[2])]